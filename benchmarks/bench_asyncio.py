@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+"""Many concurrent I/O-bound closures with threads versus an asyncio event loop.
+
+Each closure waits for a fixed time, mimicking I/O (polling, subprocesses, transfers).
+The following cases are considered:
+
+- ``threads``: a ``ConcurrentRunner`` with a ``ThreadPoolExecutor``,
+  each closure calling ``time.sleep`` in a worker thread.
+- ``asyncio``: an ``AsyncioRunner``, each closure awaiting ``asyncio.sleep``.
+- ``asyncio-schedule``: the same with ``schedule=True``.
+
+The script reports the wall time, the number of closures per second
+and the largest number of threads seen during the run.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc
+from parman.runners.asyncio import AsyncioRunner
+from parman.runners.concurrent import ConcurrentRunner
+
+CASES = ["threads", "asyncio", "asyncio-schedule"]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'case':>18s} {'wall':>8s} {'rate':>10s} {'threads':>8s}")
+    print(f"{'':>18s} {'[s]':>8s} {'[1/s]':>10s} {'[max]':>8s}")
+    for case in CASES:
+        wall, num_threads = measure(case, args)
+        print(f"{case:>18s} {wall:8.2f} {args.size / wall:10.0f} {num_threads:8d}")
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark I/O-bound closures with threads and asyncio")
+    parser.add_argument("size", nargs="?", default=10000, type=int, help="Number of closures.")
+    parser.add_argument(
+        "--duration", default=0.2, type=float, help="Time each closure waits for I/O."
+    )
+    parser.add_argument(
+        "--workers", default=64, type=int, help="Number of threads for the threads case."
+    )
+    return parser.parse_args()
+
+
+def measure(case: str, args: argparse.Namespace) -> tuple[float, int]:
+    """Run all closures and return the wall time and the maximum number of threads."""
+    if case == "threads":
+        metafunc = MinimalMetaFunc(_wait, _wait_mock)
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+        make_runner = lambda: ConcurrentRunner(executor=executor)  # noqa: E731
+    else:
+        metafunc = MinimalMetaFunc(_async_wait, _wait_mock)
+        make_runner = lambda: AsyncioRunner(schedule=case.endswith("schedule"))  # noqa: E731
+
+    # Sample the number of threads in the background.
+    num_threads = [threading.active_count()]
+    stop = threading.Event()
+
+    def monitor():
+        while not stop.wait(0.01):
+            num_threads[0] = max(num_threads[0], threading.active_count())
+
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        runner = make_runner()
+        for _ in range(args.size):
+            runner(Closure(metafunc, [args.duration]))
+        runner.shutdown()
+    wall = time.perf_counter() - start
+    stop.set()
+    monitor_thread.join()
+    # The monitor thread itself is not counted.
+    return wall, num_threads[0] - 1
+
+
+def _wait(duration: float) -> int:
+    """Mimic a blocking I/O operation."""
+    time.sleep(duration)
+    return 1
+
+
+async def _async_wait(duration: float) -> int:
+    """Mimic an asynchronous I/O operation."""
+    await asyncio.sleep(duration)
+    return 1
+
+
+def _wait_mock(duration: float) -> int:
+    """Mock result of _wait and _async_wait."""
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+"""Memory and executor queue depth of a large parameter sweep, with and without backpressure.
+
+A driver submits many independent closures to a ``ConcurrentRunner`` with a
+``ThreadPoolExecutor``, each with a fresh bytes argument.
+The closures are submitted much faster than they are executed.
+Each case runs in a fresh subprocess, which reports:
+
+- the increase of the peak resident set size (RSS) during the sweep,
+- the largest number of work items seen in the queue of the executor,
+- the wall time of the sweep.
+
+The following cases are considered:
+
+- ``unbounded``: every closure is submitted to the executor immediately.
+- ``max_submitted``: closures are scheduled and at most one per worker is in the executor,
+  so the rest waits in the scheduler.
+- ``max_inflight``: the driver blocks while too many closures are not done yet.
+- ``max_pending_bytes``: as ``max_submitted``, and the driver blocks while the arguments
+  of the closures that are not done yet exceed a size limit.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from threading import Event, Thread
+
+CASES = ["unbounded", "max_submitted", "max_inflight", "max_pending_bytes"]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args)))
+        return
+    print(f"{'case':>18s} {'RSS':>10s} {'queue depth':>12s} {'wall':>8s}")
+    print(f"{'':>18s} {'[MB]':>10s} {'[max]':>12s} {'[s]':>8s}")
+    for case in CASES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                str(args.size),
+                f"--nbytes={args.nbytes}",
+                f"--workers={args.workers}",
+                f"--limit={args.limit}",
+                f"--duration={args.duration}",
+                "--child",
+                case,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        print(
+            f"{case:>18s} {result['rss'] / 1e6:10.1f} "
+            f"{result['queue_depth']:12d} {result['wall']:8.2f}"
+        )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark backpressure in a large sweep")
+    parser.add_argument(
+        "size", nargs="?", default=100000, type=int, help="Number of closures in the sweep."
+    )
+    parser.add_argument(
+        "--nbytes", default=2000, type=int, help="Size of the argument of each closure."
+    )
+    parser.add_argument("--workers", default=4, type=int, help="Number of worker threads.")
+    parser.add_argument(
+        "--limit", default=1000, type=int, help="Number of closures allowed in flight."
+    )
+    parser.add_argument(
+        "--duration", default=0.0001, type=float, help="Time needed by each closure."
+    )
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def measure(case: str, args: argparse.Namespace) -> dict:
+    """Run the sweep and return the RSS increase, the maximum queue depth and the wall time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from parman.closure import Closure
+    from parman.metafunc import MinimalMetaFunc
+    from parman.runners.concurrent import ConcurrentRunner
+
+    options = {}
+    if case == "max_submitted":
+        options = {"schedule": True, "max_submitted": args.workers}
+    elif case == "max_inflight":
+        options = {"max_inflight": args.limit}
+    elif case == "max_pending_bytes":
+        options = {
+            "schedule": True,
+            "max_submitted": args.workers,
+            "max_pending_bytes": args.limit * args.nbytes,
+        }
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    metafunc = MinimalMetaFunc(_work, _work_mock)
+
+    # Sample the queue depth of the executor in the background.
+    queue_depth = [0]
+    stop = Event()
+
+    def monitor():
+        while not stop.wait(0.001):
+            queue_depth[0] = max(queue_depth[0], executor._work_queue.qsize())
+
+    monitor_thread = Thread(target=monitor)
+    monitor_thread.start()
+
+    rss0 = _peak_rss()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        runner = ConcurrentRunner(executor=executor, **options)
+        for _ in range(args.size):
+            runner(Closure(metafunc, [bytes(args.nbytes), args.duration]))
+        runner.shutdown()
+    wall = time.perf_counter() - start
+    stop.set()
+    monitor_thread.join()
+    return {"rss": _peak_rss() - rss0, "queue_depth": queue_depth[0], "wall": wall}
+
+
+def _work(data: bytes, duration: float) -> int:
+    """Mimic a short calculation."""
+    time.sleep(duration)
+    return len(data)
+
+
+def _work_mock(data: bytes, duration: float) -> int:
+    """Mock result of _work."""
+    return 0
+
+
+def _peak_rss() -> int:
+    """Return the peak RSS of the current process in bytes."""
+    # On Linux, ru_maxrss is expressed in kilobytes, on macOS in bytes.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Per-closure overhead of creating and calling closures of very cheap functions.
+
+Three approaches are compared:
+
+- ``direct``: the function is called without a closure, as a reference.
+- ``uncached``: the signature is inspected, the parameter API is derived and
+  the mock function is called for each closure.
+  (This was the implementation of ``Closure.validated_call`` before call plans were cached.)
+- ``cached``: the current ``Closure.validated_call``, which reuses a cached call plan.
+"""
+
+import argparse
+import timeit
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc, validate
+
+
+def add(first: int, second: int = 2) -> int:
+    """Add two numbers."""
+    return first + second
+
+
+def add_mock(first: int, second: int = 2) -> int:
+    """Mock of the add function."""
+    return 0
+
+
+def scale(values: list[float], factor: float) -> list[float]:
+    """Scale a short list of values."""
+    return [value * factor for value in values]
+
+
+def scale_mock(values: list[float], factor: float) -> list[float]:
+    """Mock of the scale function."""
+    return [1.0] * len(values)
+
+
+def make_funcs(metafunc, cargs, ckwargs) -> list:
+    """Return the functions to time: a direct call, an uncached and a cached closure call."""
+    return [
+        lambda: metafunc(*cargs, **ckwargs),
+        lambda: validated_call_uncached(Closure(metafunc, cargs, ckwargs)),
+        lambda: Closure(metafunc, cargs, ckwargs).validated_call(),
+    ]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    cases = {
+        "add": (MinimalMetaFunc(add, add_mock), [1], {"second": 3}),
+        "add (no mock)": (MinimalMetaFunc(add), [1, 3], {}),
+        "scale": (MinimalMetaFunc(scale, scale_mock), [[1.0, 2.0, 3.0]], {"factor": 2.0}),
+    }
+    print(f"{'case':>15s} {'direct':>10s} {'uncached':>10s} {'cached':>10s}")
+    print(f"{'':>15s} {'[µs]':>10s} {'[µs]':>10s} {'[µs]':>10s}")
+    for name, (metafunc, cargs, ckwargs) in cases.items():
+        times = [
+            min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+            for func in make_funcs(metafunc, cargs, ckwargs)
+        ]
+        print(f"{name:>15s}", *(f"{time * 1e6:10.2f}" for time in times))
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark closure overhead")
+    parser.add_argument(
+        "-n", "--number", default=10000, type=int, help="Number of closures per repetition."
+    )
+    parser.add_argument("-r", "--repeat", default=5, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def validated_call_uncached(closure: Closure):
+    """Validate and call a closure, deriving everything from scratch."""
+    signature = closure.metafunc.get_signature()
+    bound_arguments = signature.bind(*closure.args, **closure.kwargs)
+    bound_arguments.apply_defaults()
+    parameters = dict(bound_arguments.arguments)
+    validate("parameters", parameters, closure.get_parameter_api())
+    result = closure.metafunc(*closure.args, **closure.kwargs)
+    validate("result", result, closure.get_result_api())
+    return result
+
+
+if __name__ == "__main__":
+    main()
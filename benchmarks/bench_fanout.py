@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Cost of high fan-out graphs in WaitGraph, e.g. one training result feeding many samplers.
+
+A few dependency futures (the training results) are each waited for by many wait_futures
+(the sampling tasks), which also depend on one private future each.
+The number of callbacks on a shared dependency is reported, together with the time
+to submit all wait_futures and the time to finish the shared dependencies.
+Two approaches are compared:
+
+- ``repeated``: a done callback is added to a dependency for every wait_future.
+  (This was the implementation of ``WaitGraph.submit`` before callbacks were deduplicated.)
+- ``once``: the current ``WaitGraph``, adding one callback per dependency.
+"""
+
+import argparse
+import time
+from concurrent.futures import Future, wait
+
+from parman.waitfuture import NUM_STRIPES, WaitFuture, WaitGraph
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'fanout':>8s} {'method':>10s} {'callbacks':>10s} {'submit':>10s} {'finish':>10s}")
+    print(f"{'':>8s} {'':>10s} {'':>10s} {'[µs/wait]':>10s} {'[µs/wait]':>10s}")
+    for fanout in args.fanouts:
+        for method, graph_class in ("repeated", RepeatedCallbackWaitGraph), ("once", WaitGraph):
+            results = [run(graph_class, fanout, args.shared) for _ in range(args.repeat)]
+            num_callbacks = results[0][0]
+            times = [min(result[i] for result in results) for i in (1, 2)]
+            num = fanout * args.shared
+            print(
+                f"{fanout:8d} {method:>10s} {num_callbacks:10d}",
+                *(f"{t / num * 1e6:10.2f}" for t in times),
+            )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark WaitGraph with high fan-out")
+    parser.add_argument(
+        "fanouts",
+        nargs="*",
+        default=[100, 1000, 10000],
+        type=int,
+        help="Numbers of wait_futures depending on each shared future.",
+    )
+    parser.add_argument(
+        "-s", "--shared", default=10, type=int, help="Number of shared dependencies."
+    )
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def run(graph_class: type, fanout: int, num_shared: int) -> tuple[int, float, float]:
+    """Build and finish a fan-out graph.
+
+    Returns
+    -------
+    num_callbacks
+        The number of callbacks on one shared dependency.
+    time_submit, time_finish
+        The time to submit all wait_futures and to finish all shared dependencies.
+    """
+    wait_graph = graph_class()
+    shared = [Future() for _ in range(num_shared)]
+    private = [Future() for _ in range(fanout * num_shared)]
+    time0 = time.perf_counter()
+    wait_futures = [
+        wait_graph.submit([shared[i % num_shared], private_future])
+        for i, private_future in enumerate(private)
+    ]
+    time1 = time.perf_counter()
+    num_callbacks = len(shared[0]._done_callbacks)
+    for future in private:
+        future.set_result(None)
+    time2 = time.perf_counter()
+    for future in shared:
+        future.set_result(None)
+    wait(wait_futures)
+    time3 = time.perf_counter()
+    return num_callbacks, time1 - time0, time3 - time2
+
+
+class RepeatedCallbackWaitGraph(WaitGraph):
+    """WaitGraph adding a callback to each dependency for every wait_future."""
+
+    def submit(self, dependencies, digest=None):
+        wait_future = WaitFuture(dependencies, digest)
+        before = set(dependencies)
+        self._register(wait_future, before)
+        for future in before:
+            future.add_done_callback(self._handle_done_waiting)
+        return wait_future
+
+    def _unregister(self, future):
+        lock, after = self._stripes[hash(future) % NUM_STRIPES]
+        with lock:
+            wait_futures = after.pop(future, None)
+        if wait_futures is None:
+            return []
+        return [wait_future for wait_future in wait_futures if wait_future._countdown.pop()]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Peak resident memory of many pending internal futures.
+
+Each measurement runs in a fresh subprocess, which creates a number of pending futures
+and reports its peak resident set size (RSS), minus that of the same process
+before creating the futures.
+The following cases are considered:
+
+- ``Future``: plain ``concurrent.futures.Future`` instances.
+- ``LightFuture``: the lightweight futures used internally by Parman.
+- ``WaitGraph``: wait futures, each depending on one of a few unfinished futures.
+- ``Scheduler``: scheduled futures, each depending on one of a few unfinished futures.
+  (This includes the wait futures created by the scheduler.)
+
+Run the script with an older version of Parman on the ``PYTHONPATH``
+to compare the last two cases before and after a change.
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+from concurrent.futures import Future
+
+CASES = ["Future", "LightFuture", "WaitGraph", "Scheduler"]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    if args.child is not None:
+        print(measure(args.child, args.size))
+        return
+    print(f"{'case':>12s} {'RSS':>10s} {'per future':>10s}")
+    print(f"{'':>12s} {'[MB]':>10s} {'[bytes]':>10s}")
+    for case in CASES:
+        output = subprocess.run(
+            [sys.executable, __file__, str(args.size), "--child", case],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        rss = int(output)
+        print(f"{case:>12s} {rss / 1e6:10.1f} {rss / args.size:10.0f}")
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark the memory of pending futures")
+    parser.add_argument(
+        "size", nargs="?", default=1000000, type=int, help="Number of pending futures."
+    )
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def measure(case: str, size: int) -> int:
+    """Create size pending futures and return the increase of the peak RSS in bytes."""
+    # Imports are done before the first measurement.
+    from parman.scheduler import Scheduler
+    from parman.waitfuture import WaitGraph
+
+    try:
+        from parman.lightfuture import LightFuture
+    except ImportError:
+        # Older versions of Parman, for comparison.
+        from concurrent.futures import Future as LightFuture
+
+    shared = [Future() for _ in range(10)]
+    batch = [[shared[i % len(shared)]] for i in range(size)]
+    rss0 = _peak_rss()
+    if case == "Future":
+        futures = [Future() for _ in range(size)]
+    elif case == "LightFuture":
+        futures = [LightFuture() for _ in range(size)]
+    elif case == "WaitGraph":
+        wait_graph = WaitGraph()
+        futures = [wait_graph.submit(dependencies) for dependencies in batch]
+    elif case == "Scheduler":
+        scheduler = Scheduler(_submit)
+        futures = [scheduler.submit((), {}, dependencies) for dependencies in batch]
+    rss1 = _peak_rss()
+    assert not any(future.done() for future in futures)
+    for future in shared:
+        future.set_result(None)
+    if case == "Scheduler":
+        scheduler.shutdown()
+    return rss1 - rss0
+
+
+def _peak_rss() -> int:
+    """Return the peak RSS of the current process in bytes."""
+    # On Linux, ru_maxrss is expressed in kilobytes, on macOS in bytes.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _submit() -> Future:
+    """Return a finished future, without any actual execution."""
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+"""Memory of a long loop of generations, e.g. in active learning.
+
+In every generation, the driver submits a closure that receives a large result
+of the previous generation and returns a new one, together with a small score.
+The driver waits for the score before it starts the next generation.
+Each case runs in a fresh subprocess, which reports the increase of the peak
+resident set size (RSS) and the wall time.
+
+The following cases are considered:
+
+- ``latest``: the driver only keeps the result of the latest generation.
+- ``latest-schedule``: the same with ``schedule=True``.
+- ``history``: the driver keeps the results of all generations.
+- ``history-spill``: the same, with a ``SpillStore`` writing large results to disk.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+
+CASES = ["latest", "latest-schedule", "history", "history-spill"]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args)))
+        return
+    print(f"{'case':>16s} {'RSS':>10s} {'wall':>8s}")
+    print(f"{'':>16s} {'[MB]':>10s} {'[s]':>8s}")
+    for case in CASES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                str(args.size),
+                f"--nbytes={args.nbytes}",
+                "--child",
+                case,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        print(f"{case:>16s} {result['rss'] / 1e6:10.1f} {result['wall']:8.2f}")
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark the memory of a long loop of generations")
+    parser.add_argument("size", nargs="?", default=1000, type=int, help="Number of generations.")
+    parser.add_argument(
+        "--nbytes", default=1000000, type=int, help="Size of the result of each generation."
+    )
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def measure(case: str, args: argparse.Namespace) -> dict:
+    """Run all generations and return the RSS increase and the wall time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from parman.closure import Closure
+    from parman.metafunc import MinimalMetaFunc
+    from parman.runners.concurrent import ConcurrentRunner
+    from parman.spill import SpillStore
+
+    metafunc = MinimalMetaFunc(_generation, _generation_mock)
+    rss0 = _peak_rss()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        runner = ConcurrentRunner(
+            executor=ThreadPoolExecutor(max_workers=2),
+            schedule=case.endswith("schedule"),
+            spill=SpillStore(min_nbytes=args.nbytes) if case.endswith("spill") else None,
+        )
+        history = []
+        result = {"data": bytes(args.nbytes), "score": 0.0}
+        for index in range(args.size):
+            result = runner(Closure(metafunc, [result["data"], index]))
+            # The driver needs the score to set up the next generation.
+            result["score"].result()
+            if case.startswith("history"):
+                history.append(result)
+        runner.shutdown()
+    wall = time.perf_counter() - start
+    return {"rss": _peak_rss() - rss0, "wall": wall}
+
+
+def _generation(data: bytes, index: int) -> dict:
+    """Compute a new large result and its score from that of the previous generation."""
+    return {"data": bytes([index % 256]) * len(data), "score": float(index)}
+
+
+def _generation_mock(data: bytes, index: int) -> dict:
+    """Mock result of _generation."""
+    return {"data": b"", "score": 0.0}
+
+
+def _peak_rss() -> int:
+    """Return the peak RSS of the current process in bytes."""
+    # On Linux, ru_maxrss is expressed in kilobytes, on macOS in bytes.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Makespan of synthetic workflows with a limited number of workers.
+
+Every task sleeps for a given duration in a ``ThreadPoolExecutor``,
+and is scheduled with a ``Scheduler`` after its dependencies.
+All tasks are scheduled before the first one can start.
+The following strategies are compared:
+
+- ``fifo``: tasks are submitted to the executor as soon as they are ready,
+  so they start in the order their dependencies happened to finish.
+- ``fifo-limit``: the same, but the executor never has more tasks than workers.
+- ``critical``: the executor never has more tasks than workers
+  and ready tasks with a longer chain of tasks downstream are submitted first.
+- ``priority``: like ``critical``, but using an explicit priority,
+  the total duration of the longest path downstream (including the task itself).
+
+Two kinds of workflows are generated:
+
+- ``chain``: one long chain of tasks, next to many independent short tasks
+  scheduled before the chain.
+- ``layered``: random layers of tasks, each depending on a few tasks of the previous layer.
+
+The makespan is reported relative to a lower bound:
+the maximum of the longest path and the total duration divided by the number of workers.
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+
+from parman.scheduler import Scheduler
+
+STRATEGIES = {
+    "fifo": {},
+    "fifo-limit": {"max_submitted": True},
+    "critical": {"max_submitted": True, "critical_path": True},
+    "priority": {"max_submitted": True},
+}
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'workflow':>10s} {'strategy':>12s} {'makespan':>10s} {'bound':>10s} {'ratio':>8s}")
+    print(f"{'':>10s} {'':>12s} {'[s]':>10s} {'[s]':>10s} {'':>8s}")
+    rng = random.Random(args.seed)
+    for name, make_workflow in ("chain", make_chain), ("layered", make_layered):
+        durations, dependencies = make_workflow(rng, args.unit)
+        bound = max(*longest_paths(durations, dependencies), sum(durations) / args.workers)
+        for strategy in STRATEGIES:
+            makespan = run(strategy, durations, dependencies, args.workers)
+            print(
+                f"{name:>10s} {strategy:>12s} {makespan:10.3f} {bound:10.3f}"
+                f" {makespan / bound:8.2f}"
+            )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark the makespan of scheduled workflows")
+    parser.add_argument("-w", "--workers", default=4, type=int, help="Number of workers.")
+    parser.add_argument(
+        "-u", "--unit", default=0.01, type=float, help="Duration of the shortest tasks [s]."
+    )
+    parser.add_argument("-s", "--seed", default=1, type=int, help="Random seed.")
+    return parser.parse_args()
+
+
+def make_chain(rng: random.Random, unit: float) -> tuple[list[float], list[list[int]]]:
+    """Make a chain of 20 tasks after 80 independent tasks."""
+    durations = [unit * rng.uniform(1, 2) for _ in range(100)]
+    dependencies = [[] for _ in range(80)] + [[80 + i - 1] if i > 0 else [] for i in range(20)]
+    return durations, dependencies
+
+
+def make_layered(rng: random.Random, unit: float) -> tuple[list[float], list[list[int]]]:
+    """Make 10 layers of random width, each task depending on up to three earlier ones."""
+    durations = []
+    dependencies = []
+    previous = []
+    for _ in range(10):
+        layer = []
+        for _ in range(rng.randrange(1, 20)):
+            layer.append(len(durations))
+            durations.append(unit * rng.choice([1, 1, 1, 5]))
+            dependencies.append(rng.sample(previous, min(len(previous), rng.randrange(1, 4))))
+        previous = layer
+    return durations, dependencies
+
+
+def longest_paths(durations: list[float], dependencies: list[list[int]]) -> list[float]:
+    """Return the duration of the longest path downstream, starting with each task."""
+    paths = list(durations)
+    # Tasks only depend on tasks with a lower index.
+    for index in reversed(range(len(durations))):
+        for other in dependencies[index]:
+            paths[other] = max(paths[other], durations[other] + paths[index])
+    return paths
+
+
+def run(strategy: str, durations: list[float], dependencies: list[list[int]], workers: int):
+    """Execute a workflow and return the makespan."""
+    kwargs = dict(STRATEGIES[strategy])
+    if kwargs.get("max_submitted"):
+        kwargs["max_submitted"] = workers
+    priorities = (
+        longest_paths(durations, dependencies) if strategy == "priority" else [0] * len(durations)
+    )
+    start = Future()
+    with (
+        ThreadPoolExecutor(max_workers=workers) as pool,
+        Scheduler(partial(pool.submit, time.sleep), **kwargs) as scheduler,
+    ):
+        futures = []
+        for duration, task_dependencies, priority in zip(
+            durations, dependencies, priorities, strict=True
+        ):
+            task_dependencies = [futures[other] for other in task_dependencies]
+            futures.append(scheduler.submit([duration], {}, task_dependencies or [start], priority))
+        time0 = time.perf_counter()
+        start.set_result(None)
+        wait(futures)
+        return time.perf_counter() - time0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Cost of pickling and unpickling closures, as done for every task sent to a worker process.
+
+Two approaches are compared:
+
+- ``plain``: the metafunc is pickled together with the arguments
+  and it is restored (e.g. ``Job`` executes ``jobinfo.py``) for every unpickled closure.
+  (This was the implementation before metafuncs were registered in worker processes.)
+- ``registry``: the current ``Closure`` pickling, where the metafunc is pickled only once
+  and a worker process unpickles each distinct metafunc only once,
+  looking it up by its pickled form afterwards.
+"""
+
+import argparse
+import pickle
+import timeit
+from functools import partial
+from pathlib import Path
+
+from parman.closure import Closure
+from parman.job import JobFactory
+from parman.metafunc import MinimalMetaFunc
+
+TEMPLATE = Path(__file__).parent.parent / "demos" / "jobdemo" / "templates" / "compute"
+
+
+def add(first: int, second: int = 2) -> int:
+    """Add two numbers."""
+    return first + second
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    cases = {
+        "minimal": Closure(MinimalMetaFunc(add), [1, 2]),
+        "job": JobFactory()(TEMPLATE, "compute", config=Path("config.json")),
+    }
+    print(f"{'case':>8s} {'method':>10s} {'size':>8s} {'dumps':>8s} {'loads':>8s}")
+    print(f"{'':>8s} {'':>10s} {'[B]':>8s} {'[µs]':>8s} {'[µs]':>8s}")
+    for name, closure in cases.items():
+        methods = {
+            "plain": (dumps_plain, loads_plain),
+            "registry": (pickle.dumps, pickle.loads),
+        }
+        for method, (dumps, loads) in methods.items():
+            data = dumps(closure)
+            time_dumps = min(
+                timeit.repeat(partial(dumps, closure), number=args.number, repeat=args.repeat)
+            )
+            time_loads = min(
+                timeit.repeat(partial(loads, data), number=args.number, repeat=args.repeat)
+            )
+            print(
+                f"{name:>8s} {method:>10s} {len(data):8d}",
+                f"{time_dumps / args.number * 1e6:8.1f}",
+                f"{time_loads / args.number * 1e6:8.1f}",
+            )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark pickling of closures")
+    parser.add_argument(
+        "-n", "--number", default=1000, type=int, help="Number of closures per repetition."
+    )
+    parser.add_argument("-r", "--repeat", default=5, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def dumps_plain(closure: Closure) -> bytes:
+    """Pickle the metafunc together with the arguments."""
+    return pickle.dumps((closure.metafunc, closure.args, closure.kwargs))
+
+
+def loads_plain(data: bytes) -> Closure:
+    """Unpickle a closure, including its metafunc."""
+    return Closure._from_snapshot(*pickle.loads(data))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Cost of promising futures for all leafs of a closure result.
+
+A work future is created and the futures for the leafs of its result are set up
+before the work future finishes, as done by ``FutureRunnerBase``.
+Three approaches are compared:
+
+- ``waitgraph``: one WaitFuture per leaf, each with its own callback on the work future.
+  (This was the approach before ``scatter`` was introduced.)
+- ``scatter``: all leaf futures are created up front and filled from a single callback.
+- ``lazy``: the current ``_promise_data``, returning a promised tree whose leaf futures
+  are only created when they are accessed.
+  The ``lazy-all`` variant accesses all leafs before the work finishes.
+
+The ``promise`` column measures the set up of the leaf futures.
+The ``complete`` column measures the time needed to set the result of the work future,
+which includes filling in all leaf futures created so far.
+The ``memory`` column is the memory allocated for setting up the leaf futures.
+"""
+
+import argparse
+import time
+import tracemalloc
+from concurrent.futures import Future
+from functools import partial
+
+from parman.runners.future import _promise_data
+from parman.treeleaf import flatten, get_tree, iterate_tree
+from parman.waitfuture import WaitGraph, scatter
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'method':>10s} {'leafs':>8s} {'promise':>12s} {'complete':>12s} {'memory':>12s}")
+    print(f"{'':>10s} {'':>8s} {'[us/leaf]':>12s} {'[us/leaf]':>12s} {'[B/leaf]':>12s}")
+    for nleaf in args.nleafs:
+        result = {"paths": [f"path{i}" for i in range(nleaf)], "energy": 1.0}
+        result_api = {"paths": [str] * nleaf, "energy": float}
+        for method, promise in PROMISES.items():
+            time_promise, time_complete = benchmark(promise, result, result_api, args.repeat)
+            memory = measure_memory(promise, result_api)
+            print(
+                f"{method:>10s} {nleaf:8d} {time_promise / nleaf * 1e6:12.3f} "
+                f"{time_complete / nleaf * 1e6:12.3f} {memory / nleaf:12.1f}"
+            )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark result promises")
+    parser.add_argument(
+        "nleafs",
+        nargs="*",
+        default=[10, 100, 1000, 10000, 100000],
+        type=int,
+        help="Numbers of leafs in the result.",
+    )
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def promise_waitgraph(future, data_api):
+    """Create one WaitFuture per leaf of the result."""
+    wait_graph = WaitGraph()
+    _, spec = flatten(data_api)
+    return spec.unflatten(
+        [wait_graph.submit([future], partial(get_tree, mulidx=mulidx)) for mulidx in spec.mulidxs]
+    )
+
+
+def promise_scatter(future, data_api):
+    """Create all leaf futures up front and fill them with a single callback."""
+    _, spec = flatten(data_api)
+    return spec.unflatten(scatter(future, spec.flatten_up_to, spec.num_leafs))
+
+
+def promise_lazy_all(future, data_api):
+    """Create a promised tree and access all its leafs."""
+    promised = _promise_data(future, data_api)
+    for _ in iterate_tree(promised):
+        pass
+    return promised
+
+
+PROMISES = {
+    "waitgraph": promise_waitgraph,
+    "scatter": promise_scatter,
+    "lazy": _promise_data,
+    "lazy-all": promise_lazy_all,
+}
+
+
+def measure_memory(promise, result_api) -> int:
+    """Return the memory allocated while setting up the promises."""
+    future = Future()
+    tracemalloc.start()
+    promised = promise(future, result_api)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del promised
+    return memory
+
+
+def benchmark(promise, result, result_api, repeat):
+    """Return the best times for setting up the promises and completing the work."""
+    best_promise = float("inf")
+    best_complete = float("inf")
+    for _ in range(repeat):
+        future = Future()
+        time0 = time.perf_counter()
+        promised = promise(future, result_api)
+        time1 = time.perf_counter()
+        future.set_result(result)
+        time2 = time.perf_counter()
+        if promised["paths"][-1].result(timeout=0) != result["paths"][-1]:
+            raise AssertionError("Incorrect result")
+        best_promise = min(best_promise, time1 - time0)
+        best_complete = min(best_complete, time2 - time1)
+    return best_promise, best_complete
+
+
+if __name__ == "__main__":
+    main()
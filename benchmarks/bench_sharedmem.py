@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+"""Large NumPy arrays passed between closures in worker processes.
+
+All closures run in a ``ProcessPoolExecutor``.
+The following workflows are considered:
+
+- ``fanout``: one closure creates a large array, which is the argument of many closures
+  that each compute its sum.
+- ``chain``: a chain of closures, each adding one to the array of the previous one.
+
+Each workflow is executed with the default transport (pickling)
+and with a ``SharedMemoryTransport``.
+The script reports the wall time and the throughput,
+i.e. the number of array bytes received by all closures per second.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc
+from parman.runners.concurrent import ConcurrentRunner
+from parman.sharedmem import SharedMemoryTransport
+
+WORKFLOWS = ["fanout", "chain"]
+TRANSPORTS = ["pickle", "sharedmem"]
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"Array size: {args.size} MB, {args.count} closures, {args.workers} workers")
+    print(f"{'workflow':>10s} {'transport':>10s} {'wall':>8s} {'throughput':>11s}")
+    print(f"{'':>10s} {'':>10s} {'[s]':>8s} {'[GB/s]':>11s}")
+    for workflow in WORKFLOWS:
+        for transport in TRANSPORTS:
+            wall = measure(workflow, transport, args)
+            throughput = args.count * args.size / 1000 / wall
+            print(f"{workflow:>10s} {transport:>10s} {wall:8.2f} {throughput:11.2f}")
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark the transport of large arrays between processes")
+    parser.add_argument("size", nargs="?", default=100, type=int, help="Array size in MB.")
+    parser.add_argument(
+        "--count", default=20, type=int, help="Number of closures receiving the array."
+    )
+    parser.add_argument("--workers", default=4, type=int, help="Number of worker processes.")
+    return parser.parse_args()
+
+
+def measure(workflow: str, transport: str, args: argparse.Namespace) -> float:
+    """Run one workflow and return the wall time."""
+    size = args.size * 10**6 // 8
+    # The transport must be created before the worker processes are started.
+    shared = SharedMemoryTransport() if transport == "sharedmem" else None
+    executor = ProcessPoolExecutor(max_workers=args.workers)
+    # Start the workers in advance, not to measure their startup time.
+    list(executor.map(abs, range(args.workers)))
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        runner = ConcurrentRunner(executor=executor, transport=shared)
+        data = runner(Closure(MinimalMetaFunc(_create, _create_mock), [size]))
+        results = []
+        for _ in range(args.count):
+            if workflow == "fanout":
+                results.append(runner(Closure(MinimalMetaFunc(_sum, _sum_mock), [data])))
+            else:
+                data = runner(Closure(MinimalMetaFunc(_increment, _increment_mock), [data]))
+        runner.shutdown()
+    wall = time.perf_counter() - start
+    if workflow == "fanout":
+        assert all(result.result() == size for result in results)
+    else:
+        assert data.result()[0] == 1 + args.count
+    return wall
+
+
+def _create(size: int) -> np.ndarray:
+    """Create a large array."""
+    return np.ones(size)
+
+
+def _create_mock(size: int) -> np.ndarray:
+    """Mock result of _create."""
+    return np.zeros(0)
+
+
+def _sum(array: np.ndarray) -> float:
+    """Compute the sum of an array."""
+    return float(array.sum())
+
+
+def _sum_mock(array: np.ndarray) -> float:
+    """Mock result of _sum."""
+    return 0.0
+
+
+def _increment(array: np.ndarray) -> np.ndarray:
+    """Return a new array with all values increased by one."""
+    return array + 1
+
+
+def _increment_mock(array: np.ndarray) -> np.ndarray:
+    """Mock result of _increment."""
+    return array
+
+
+if __name__ == "__main__":
+    main()
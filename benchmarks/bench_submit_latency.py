@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Latency from dependency completion to submission with slow user_submit calls.
+
+Each scheduled future depends on one future, and these dependencies are finished
+at a fixed rate by the main thread.
+The ``user_submit`` function records the time since its dependency finished and then
+sleeps, to mimic the preparation and submission of a closure (e.g. ``dfk.submit`` in Parsl).
+A small fraction of the submissions is much slower than the others.
+The latency is reported for several numbers of submit_loop threads (``num_submitters``).
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import Future, wait
+
+from parman.scheduler import Scheduler
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'submitters':>10s} {'mean':>10s} {'median':>10s} {'p95':>10s} {'max':>10s}")
+    print(f"{'':>10s} {'[ms]':>10s} {'[ms]':>10s} {'[ms]':>10s} {'[ms]':>10s}")
+    for num_submitters in args.submitters:
+        latencies = run(num_submitters, args)
+        latencies.sort()
+        print(
+            f"{num_submitters:10d}",
+            *(
+                f"{latency * 1e3:10.2f}"
+                for latency in [
+                    statistics.mean(latencies),
+                    statistics.median(latencies),
+                    latencies[int(0.95 * len(latencies))],
+                    latencies[-1],
+                ]
+            ),
+        )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark the latency of scheduled submissions")
+    parser.add_argument(
+        "submitters", nargs="*", default=[1, 2, 4, 8], type=int, help="Numbers of submitters."
+    )
+    parser.add_argument("-n", "--num", default=1000, type=int, help="Number of tasks.")
+    parser.add_argument(
+        "-i", "--interval", default=0.001, type=float, help="Time between dependencies [s]."
+    )
+    parser.add_argument(
+        "-f", "--fast", default=0.0005, type=float, help="Duration of most submissions [s]."
+    )
+    parser.add_argument(
+        "-s", "--slow", default=0.05, type=float, help="Duration of slow submissions [s]."
+    )
+    parser.add_argument(
+        "-p", "--probability", default=0.02, type=float, help="Fraction of slow submissions."
+    )
+    return parser.parse_args()
+
+
+def run(num_submitters: int, args: argparse.Namespace) -> list[float]:
+    """Schedule tasks, finish their dependencies, and return the latencies."""
+    rng = random.Random(1)
+    durations = [
+        args.slow if rng.random() < args.probability else args.fast for _ in range(args.num)
+    ]
+    finished = [None] * args.num
+    latencies = [None] * args.num
+
+    def user_submit(index: int) -> Future:
+        latencies[index] = time.perf_counter() - finished[index]
+        time.sleep(durations[index])
+        future = Future()
+        future.set_result(None)
+        return future
+
+    dependencies = [Future() for _ in range(args.num)]
+    with Scheduler(user_submit, num_submitters=num_submitters) as scheduler:
+        futures = [
+            scheduler.submit([index], {}, [dependency])
+            for index, dependency in enumerate(dependencies)
+        ]
+        for index, dependency in enumerate(dependencies):
+            finished[index] = time.perf_counter()
+            dependency.set_result(None)
+            time.sleep(args.interval)
+        wait(futures)
+    return latencies
+
+
+if __name__ == "__main__":
+    main()
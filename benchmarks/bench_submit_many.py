@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Throughput of submitting many scheduled futures one by one or in batches.
+
+A number of futures is scheduled, each depending on one of a few unfinished futures.
+The time to submit all of them is reported as the number of submissions per second,
+for ``Scheduler.submit`` and ``Scheduler.submit_many``, and likewise for
+``WaitGraph.submit`` and ``WaitGraph.submit_many``.
+"""
+
+import argparse
+import time
+from concurrent.futures import Future
+
+from parman.scheduler import Scheduler
+from parman.waitfuture import WaitGraph
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'size':>8s} {'object':>10s} {'single':>12s} {'many':>12s}")
+    print(f"{'':>8s} {'':>10s} {'[1/s]':>12s} {'[1/s]':>12s}")
+    for size in args.sizes:
+        for label, run in ("WaitGraph", run_wait_graph), ("Scheduler", run_scheduler):
+            rates = [
+                size / min(run(size, args.shared, many) for _ in range(args.repeat))
+                for many in (False, True)
+            ]
+            print(f"{size:8d} {label:>10s}", *(f"{rate:12.0f}" for rate in rates))
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark batched submission")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        default=[1000, 10000, 100000],
+        type=int,
+        help="Numbers of futures to submit.",
+    )
+    parser.add_argument(
+        "-s", "--shared", default=10, type=int, help="Number of unfinished dependencies."
+    )
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def run_wait_graph(size: int, num_shared: int, many: bool) -> float:
+    """Return the time needed to submit size wait_futures."""
+    wait_graph = WaitGraph()
+    shared = [Future() for _ in range(num_shared)]
+    batch = [([shared[i % num_shared]], None) for i in range(size)]
+    time0 = time.perf_counter()
+    if many:
+        wait_graph.submit_many(batch)
+    else:
+        for dependencies, digest in batch:
+            wait_graph.submit(dependencies, digest)
+    time1 = time.perf_counter()
+    for future in shared:
+        future.set_result(None)
+    return time1 - time0
+
+
+def run_scheduler(size: int, num_shared: int, many: bool) -> float:
+    """Return the time needed to schedule size futures."""
+    shared = [Future() for _ in range(num_shared)]
+    batch = [((i,), {}, [shared[i % num_shared]]) for i in range(size)]
+    with Scheduler(_submit) as scheduler:
+        time0 = time.perf_counter()
+        if many:
+            scheduler.submit_many(batch)
+        else:
+            for args, kwargs, dependencies in batch:
+                scheduler.submit(args, kwargs, dependencies)
+        time1 = time.perf_counter()
+        for future in shared:
+            future.set_result(None)
+    return time1 - time0
+
+
+def _submit(value: int) -> Future:
+    """Return a finished future, without any actual execution."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Scaling of the treeleaf functions with the width and depth of a tree.
+
+Trees are built by nesting a list (or dictionary) of ``width`` items ``depth`` times.
+The number of leafs is ``width**depth``.
+Timings are reported per leaf, which should be roughly constant.
+"""
+
+import argparse
+import timeit
+
+from parman.treeleaf import flatten, iterate_tree, transform_tree
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    columns = ["iterate", "transform", "flatten", "unflatten"]
+    print(
+        f"{'kind':>5s} {'width':>7s} {'depth':>6s} {'leafs':>8s}", *(f"{c:>12s}" for c in columns)
+    )
+    print(f"{'':>5s} {'':>7s} {'':>6s} {'':>8s}", *(f"{'[ns/leaf]':>12s}" for c in columns))
+    for kind in "list", "dict":
+        for width, depth in [
+            (args.nleaf, 1),
+            (int(round(args.nleaf**0.5)), 2),
+            (int(round(args.nleaf ** (1 / 3))), 3),
+            (10, 5),
+            (2, 16),
+            (1, args.deep),
+        ]:
+            tree = build_tree(kind, width, depth)
+            nleaf = width**depth
+            leafs, spec = flatten(tree)
+            times = [
+                benchmark(lambda tree=tree: sum(1 for _ in iterate_tree(tree)), args),
+                benchmark(lambda tree=tree: transform_tree(lambda _, leaf: leaf, tree), args),
+                benchmark(lambda tree=tree: flatten(tree), args),
+                benchmark(lambda spec=spec, leafs=leafs: spec.unflatten(leafs), args),
+            ]
+            print(
+                f"{kind:>5s} {width:7d} {depth:6d} {nleaf:8d}",
+                *(f"{time / nleaf * 1e9:12.1f}" for time in times),
+            )
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark treeleaf")
+    parser.add_argument("-n", "--nleaf", default=100000, type=int, help="Number of leafs.")
+    parser.add_argument(
+        "-d", "--deep", default=10000, type=int, help="Depth of a tree with a single leaf."
+    )
+    parser.add_argument("-r", "--repeat", default=5, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def build_tree(kind: str, width: int, depth: int):
+    """Build a balanced tree with width**depth integer leafs."""
+    tree = 0
+    for _ in range(depth):
+        tree = [tree] * width if kind == "list" else {f"k{i}": tree for i in range(width)}
+    return tree
+
+
+def benchmark(func, args) -> float:
+    """Return the best wall time of a few calls to func."""
+    return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Time and memory needed to replace futures in closure arguments by large upstream results.
+
+This is the step performed by ``FutureRunnerBase._unpack_data`` before a closure is submitted.
+Three approaches are compared:
+
+- ``recopy``: a new ``Closure`` is created, which copies all arguments again,
+  including the results of upstream futures.
+  (This was the implementation of ``_unpack_data`` before closures could be created
+  from snapshots.)
+- ``threads``: only the results are copied, as needed for a ``ThreadPoolExecutor``.
+- ``processes``: nothing is copied, as for a ``ProcessPoolExecutor``,
+  which serializes the closure anyway.
+
+Memory is the peak of the memory allocated during the step, measured with ``tracemalloc``.
+"""
+
+import argparse
+import time
+import tracemalloc
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc
+from parman.runners.concurrent import ConcurrentRunner
+from parman.runners.future import _wait_for_data
+
+
+def consume(data: object, extra: object) -> int:
+    """Cheap function consuming the results."""
+    return 0
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    size = args.size
+    cases = {
+        "array": (np.ones(size), [np.ones(size // 10) for _ in range(10)]),
+        "tuples": (
+            [(i, float(i)) for i in range(size // 10)],
+            {(i, "a") for i in range(size // 10)},
+        ),
+    }
+    metafunc = MinimalMetaFunc(consume)
+    runners = {
+        "threads": ConcurrentRunner(executor=ThreadPoolExecutor(max_workers=1)),
+        "processes": ConcurrentRunner(executor=ProcessPoolExecutor(max_workers=1)),
+    }
+    print(f"{'case':>8s} {'method':>10s} {'time':>10s} {'memory':>10s}")
+    print(f"{'':>8s} {'':>10s} {'[ms]':>10s} {'[MB]':>10s}")
+    for name, (result, extra) in cases.items():
+        future = Future()
+        future.set_result(result)
+        closure = Closure(metafunc, [future, extra])
+        methods = {
+            "recopy": lambda closure=closure: unpack_recopy(closure),
+            "threads": runners["threads"]._unpack_data,
+            "processes": runners["processes"]._unpack_data,
+        }
+        for method, unpack in methods.items():
+            times = []
+            for _ in range(args.repeat):
+                time0 = time.perf_counter()
+                unpack(closure)
+                times.append(time.perf_counter() - time0)
+            tracemalloc.start()
+            unpacked = unpack(closure)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            del unpacked
+            print(f"{name:>8s} {method:>10s} {min(times) * 1e3:10.2f} {peak / 1e6:10.1f}")
+    for runner in runners.values():
+        runner.shutdown()
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark unpacking of closure arguments")
+    parser.add_argument(
+        "-s", "--size", default=10000000, type=int, help="Number of items in the results."
+    )
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def unpack_recopy(closure: Closure) -> Closure:
+    """Replace futures by results and copy all arguments again."""
+    return Closure(closure.metafunc, _wait_for_data(closure.args), _wait_for_data(closure.kwargs))
+
+
+if __name__ == "__main__":
+    main()
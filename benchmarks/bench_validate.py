@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Overhead of type checking closure arguments with large homogeneous lists.
+
+Two approaches are compared:
+
+- ``uncompiled``: every leaf is checked separately with ``cattrs.structure`` or ``isinstance``.
+  (This was the implementation of ``validate`` before validators were compiled.)
+- ``compiled``: the current ``validate``, using a cached compiled validator.
+"""
+
+import argparse
+import timeit
+from functools import partial
+
+from parman.metafunc import _validate_leaf, validate
+from parman.treeleaf import iterate_tree
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'api':>20s} {'items':>8s} {'uncompiled':>12s} {'compiled':>12s}")
+    print(f"{'':>20s} {'':>8s} {'[ns/item]':>12s} {'[ns/item]':>12s}")
+    for size in args.sizes:
+        cases = {
+            "list[int]": ([1] * size, list[int]),
+            "dict[str, float]": ({f"k{i}": 1.0 for i in range(size)}, dict[str, float]),
+            "list[list[int]]": ([[1] * 10] * (size // 10), list[list[int]]),
+            "[int, ...]": ([1] * size, [int] * size),
+        }
+        for name, (data, type_api) in cases.items():
+            times = [
+                min(
+                    timeit.repeat(
+                        partial(func, "data", data, type_api), number=1, repeat=args.repeat
+                    )
+                )
+                for func in (validate_uncompiled, validate)
+            ]
+            print(f"{name:>20s} {size:8d}", *(f"{time / size * 1e9:12.1f}" for time in times))
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark validate")
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        default=[100, 10000, 100000],
+        type=int,
+        help="Numbers of items in the data.",
+    )
+    parser.add_argument("-r", "--repeat", default=5, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def validate_uncompiled(prefix, data, type_api):
+    """Check every leaf separately."""
+    for mulidx, (leaf, leaf_type) in iterate_tree(data, type_api):
+        _validate_leaf(prefix, mulidx, leaf, leaf_type)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Throughput of WaitGraph when many threads finish dependencies concurrently.
+
+A random graph is created in which every wait_future depends on a few dependency futures.
+The dependencies are then finished by a number of threads, all starting at the same time,
+and the time until all wait_futures are done is measured.
+Two implementations are compared:
+
+- ``global``: a single lock protects two dictionaries with sets of edges.
+  (This was the implementation of ``WaitGraph`` before striped locks were introduced.)
+- ``striped``: the current ``WaitGraph``, with striped locks and lock-free countdowns.
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable, Collection
+from concurrent.futures import Future, wait
+from threading import Barrier, Lock, Thread
+
+import attrs
+
+from parman.waitfuture import WaitFuture, WaitGraph
+
+
+def main():
+    """Main program."""
+    args = parse_args()
+    print(f"{'threads':>8s} {'global':>12s} {'striped':>12s}")
+    print(f"{'':>8s} {'[edges/s]':>12s} {'[edges/s]':>12s}")
+    for num_threads in args.threads:
+        rates = []
+        for graph_class in GlobalLockWaitGraph, WaitGraph:
+            elapsed = min(run(graph_class, num_threads, args) for _ in range(args.repeat))
+            rates.append(args.waiters * args.fanin / elapsed)
+        print(f"{num_threads:8d}", *(f"{rate:12.0f}" for rate in rates))
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser("Benchmark WaitGraph throughput")
+    parser.add_argument(
+        "threads", nargs="*", default=[1, 8, 32], type=int, help="Numbers of completing threads."
+    )
+    parser.add_argument("-d", "--dependencies", default=10000, type=int)
+    parser.add_argument("-w", "--waiters", default=100000, type=int)
+    parser.add_argument("-f", "--fanin", default=4, type=int, help="Dependencies per waiter.")
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of repetitions.")
+    return parser.parse_args()
+
+
+def run(graph_class: type, num_threads: int, args: argparse.Namespace) -> float:
+    """Create a random graph and measure the time to finish it with a number of threads."""
+    rng = random.Random(1)
+    dependencies = [Future() for _ in range(args.dependencies)]
+    wait_graph = graph_class()
+    wait_futures = [
+        wait_graph.submit(rng.sample(dependencies, args.fanin)) for _ in range(args.waiters)
+    ]
+    barrier = Barrier(num_threads + 1)
+
+    def finish(futures):
+        barrier.wait()
+        for future in futures:
+            future.set_result(None)
+
+    threads = [
+        Thread(target=finish, args=(dependencies[ithread::num_threads],))
+        for ithread in range(num_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    time0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wait(wait_futures)
+    return time.perf_counter() - time0
+
+
+@attrs.define
+class GlobalLockWaitGraph:
+    """The original WaitGraph, with one lock for all dependencies."""
+
+    _lock: Lock = attrs.field(init=False, default=attrs.Factory(Lock))
+    _before: dict = attrs.field(init=False, default=attrs.Factory(dict))
+    _after: dict = attrs.field(init=False, default=attrs.Factory(dict))
+
+    def submit(self, dependencies: Collection[Future], digest: Callable | None = None):
+        wait_future = WaitFuture(dependencies, digest)
+        if len(dependencies) == 0:
+            wait_future.set_state()
+        else:
+            with self._lock:
+                before = set(dependencies)
+                self._before[wait_future] = before
+                for future in before:
+                    self._after.setdefault(future, set()).add(wait_future)
+            for future in set(dependencies):
+                future.add_done_callback(self._handle_done_waiting)
+        return wait_future
+
+    def _handle_done_waiting(self, future: Future):
+        done_wait_futures = []
+        with self._lock:
+            wait_futures = self._after.pop(future, None)
+            if wait_futures is not None:
+                for wait_future in wait_futures:
+                    before = self._before[wait_future]
+                    before.remove(future)
+                    if len(before) == 0:
+                        done_wait_futures.append(wait_future)
+                        del self._before[wait_future]
+        for done_wait_future in done_wait_futures:
+            done_wait_future.set_state()
+
+
+if __name__ == "__main__":
+    main()
@@ -32,7 +32,7 @@ from numpy.typing import NDArray
 __all__ = ("LogPosterior", "plot_traj", "analyse_traj")
 
 
-@attrs.define
+@attrs.frozen
 class LogPosterior:
     """Posterior probability (with flat prior) for a linear regression problem."""
 
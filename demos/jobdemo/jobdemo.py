@@ -17,6 +17,7 @@ import parsl
 
 from parman.clerks.localtemp import LocalTempClerk
 from parman.job import job
+from parman.runners.asyncio import AsyncioRunner
 from parman.runners.concurrent import ConcurrentRunner
 from parman.runners.dry import DryRunner
 from parman.runners.parsl import ParslRunner
@@ -42,6 +43,9 @@ def main():
         job.clerk = LocalTempClerk()
     if args.queue:
         job.script = "submit.sh"
+    if args.framework == "asyncio":
+        # Wait for the job scripts on the event loop, without a thread per job.
+        job.run_async = True
     workflow(runner, args.pause)
 
 
@@ -51,7 +55,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "framework",
         help="The framework to execute the workflow",
-        choices=["dry", "serial", "threads", "processes", "parsl-local", "parsl-slurm"],
+        choices=["dry", "serial", "threads", "processes", "asyncio", "parsl-local", "parsl-slurm"],
     )
     parser.add_argument(
         "-s",
@@ -88,6 +92,8 @@ def setup_runner(framework, schedule):
         return SerialRunner()
     if framework == "threads":
         return ConcurrentRunner(schedule=schedule)
+    if framework == "asyncio":
+        return AsyncioRunner(schedule=schedule)
     if framework == "processes":
         return ConcurrentRunner(schedule=schedule, executor=ProcessPoolExecutor(max_workers=8))
     if framework == "parsl-local":
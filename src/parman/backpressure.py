@@ -0,0 +1,117 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Bounded in-flight work, blocking the submitting thread when a limit is reached.
+
+Without a limit, a driver script can submit a large sweep of closures much faster
+than they are executed, which keeps all their arguments and internal futures in memory.
+An ``InflightLimit`` counts the submitted items (and their estimated sizes) that are not
+done yet and blocks new submissions until enough of them have finished.
+"""
+
+from threading import Condition
+
+import attrs
+
+__all__ = ("InflightLimit",)
+
+
+@attrs.define
+class InflightLimit:
+    """Limit the number and total size of items in flight.
+
+    Attributes
+    ----------
+    max_count
+        The maximum number of items in flight. No limit when not given.
+    max_nbytes
+        The maximum total (estimated) size of the items in flight, in bytes.
+        No limit when not given.
+
+    Notes
+    -----
+    When nothing is in flight, a request is always admitted, even when it exceeds the limits.
+    This guarantees progress for large items or batches.
+    """
+
+    max_count: int | None = attrs.field(default=None)
+    max_nbytes: int | None = attrs.field(default=None)
+    _condition: Condition = attrs.field(init=False, default=attrs.Factory(Condition))
+    _count: int = attrs.field(init=False, default=0)
+    _nbytes: int = attrs.field(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        if self.max_count is not None and self.max_count < 1:
+            raise ValueError("The maximum number of items in flight must be at least one.")
+        if self.max_nbytes is not None and self.max_nbytes < 0:
+            raise ValueError("The maximum number of bytes in flight cannot be negative.")
+
+    @property
+    def active(self) -> bool:
+        """True when at least one of the limits is set."""
+        return self.max_count is not None or self.max_nbytes is not None
+
+    @property
+    def count(self) -> int:
+        """The number of items in flight."""
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """The total estimated size of the items in flight."""
+        return self._nbytes
+
+    def acquire(self, count: int = 1, nbytes: int = 0, timeout: float | None = None) -> bool:
+        """Wait until the items fit within the limits and add them.
+
+        Parameters
+        ----------
+        count
+            The number of new items.
+        nbytes
+            The estimated total size of the new items.
+        timeout
+            The maximum time to wait in seconds. No limit when not given.
+
+        Returns
+        -------
+        acquired
+            False when the timeout expired before the items could be added.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._fits(count, nbytes), timeout):
+                return False
+            self._count += count
+            self._nbytes += nbytes
+            return True
+
+    def release(self, count: int = 1, nbytes: int = 0):
+        """Remove finished items and wake up waiting threads."""
+        with self._condition:
+            self._count -= count
+            self._nbytes -= nbytes
+            self._condition.notify_all()
+
+    def _fits(self, count: int, nbytes: int) -> bool:
+        """Return True if new items can be added. (The lock must be held by the caller.)"""
+        if self._count == 0:
+            return True
+        if self.max_count is not None and self._count + count > self.max_count:
+            return False
+        return self.max_nbytes is None or self._nbytes + nbytes <= self.max_nbytes
@@ -17,16 +17,34 @@
 # along with this program; if not, see <http://www.gnu.org/licenses/>
 #
 # --
-"""Bundled information for a function to be submitted."""
+"""Bundled information for a function to be submitted.
 
+The arguments of a closure are snapshotted when it is created, with ``snapshot_leaf``.
+By default, leafs are deep-copied, except for immutable data, which is passed through.
+The copy policy of other types can be customized with ``snapshot_leaf.register``
+or with ``register_immutable``.
+"""
+
+import asyncio
+import inspect
+import os
+import pickle
+import sys
+import weakref
+from collections.abc import Callable
 from concurrent.futures import Future
 from copy import deepcopy
+from functools import singledispatch
+from threading import Lock
+from types import NoneType
 from typing import Any
 
 import attrs
 
-from .metafunc import MetaFuncBase, validate
-from .treeleaf import transform_tree
+from .metafunc import MetaFuncBase, compile_validator, validate
+from .treeleaf import flatten
+
+__all__ = ("Closure", "snapshot_leaf", "register_immutable")
 
 
 @attrs.define
@@ -45,26 +63,58 @@ class Closure:
         self.args = _safe_deepcopy_data(self.args)
         self.kwargs = _safe_deepcopy_data(self.kwargs)
 
+    @classmethod
+    def _from_snapshot(
+        cls, metafunc: MetaFuncBase, args: list, kwargs: dict[str, Any]
+    ) -> "Closure":
+        """Create a closure from arguments that are snapshots already, without copying them.
+
+        This is only used internally, for arguments that cannot be changed by others.
+        """
+        closure = cls.__new__(cls)
+        closure.metafunc = metafunc
+        closure.args = args
+        closure.kwargs = kwargs
+        return closure
+
+    def __reduce__(self):
+        """Pickle the metafunc separately, such that it is unpickled only once per process.
+
+        The pickled form of the metafunc is computed only once per metafunc,
+        so a metafunc should not be changed after it was used in a pickled closure.
+        """
+        return _restore_closure, (_pack_metafunc(self.metafunc), self.args, self.kwargs)
+
     def describe(self) -> str:
         """Describe this closure."""
         return self.metafunc.describe(*self.args, **self.kwargs)
 
     def validated_call(self) -> Any:
-        """Validate the parameters, call the metafunction, validate and return the result."""
-        parameters = self.get_parameters()
-        parameters_api = self.get_parameter_api()
-        validate("parameters", parameters, parameters_api)
-        result = self.metafunc(*self.args, **self.kwargs)
+        """Validate the parameters, call the metafunction, validate and return the result.
+
+        When the metafunction is async, it is run to completion with ``asyncio.run``.
+        """
+        self.validate_parameters()
         result_api = self.get_result_api()
+        result = self.metafunc.call_with_result_api(result_api, *self.args, **self.kwargs)
+        if inspect.isawaitable(result):
+            result = asyncio.run(_await(result))
+        validate("result", result, result_api)
+        return result
+
+    async def async_validated_call(self) -> Any:
+        """Same as ``validated_call``, awaiting the result of an async metafunction."""
+        self.validate_parameters()
+        result_api = self.get_result_api()
+        result = self.metafunc.call_with_result_api(result_api, *self.args, **self.kwargs)
+        if inspect.isawaitable(result):
+            result = await result
         validate("result", result, result_api)
         return result
 
     def get_parameters(self) -> dict[str, Any]:
         """Return a dictionary with all parameters (including positional ones)."""
-        signature = self.metafunc.get_signature()
-        bound_arguments = signature.bind(*self.args, **self.kwargs)
-        bound_arguments.apply_defaults()
-        return dict(bound_arguments.arguments)
+        return _get_call_plan(self.metafunc, self.args, self.kwargs).bind(self.args, self.kwargs)
 
     def get_parameter_api(self) -> dict[str, Any]:
         """Return a type checking API for the parameters."""
@@ -72,9 +122,12 @@ class Closure:
 
     def validate_parameters(self):
         """Validate and return the parameters"""
-        parameters = self.get_parameters()
-        parameters_api = self.get_parameter_api()
-        validate("parameters", parameters, parameters_api)
+        plan = _get_call_plan(self.metafunc, self.args, self.kwargs)
+        parameters = plan.bind(self.args, self.kwargs)
+        validator = plan.parameters_validator
+        if validator is None:
+            validator = compile_validator(self.get_parameter_api())
+        validator("parameters", parameters)
 
     def get_result_mock(self) -> Any:
         """Get the mock result."""
@@ -88,9 +141,36 @@ class Closure:
         """Get the resources dictionary."""
         return self.metafunc.get_resources(*self.args, **self.kwargs)
 
+    def estimate_nbytes(self) -> int:
+        """Estimate the memory held by the arguments, in bytes.
+
+        Arrays count with their ``nbytes`` attribute,
+        other leafs with ``sys.getsizeof`` and futures are not counted.
+        The overhead of lists and dictionaries in the arguments is neglected.
+        """
+        leafs, _ = flatten([self.args, self.kwargs])
+        return sum(_estimate_leaf_nbytes(leaf) for leaf in leafs)
+
+
+def _estimate_leaf_nbytes(leaf: Any) -> int:
+    """Estimate the memory held by a single leaf, in bytes."""
+    if isinstance(leaf, Future):
+        return 0
+    nbytes = getattr(leaf, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(leaf)
+
+
+async def _await(awaitable: Any) -> Any:
+    """Await an awaitable, such that it can be passed to ``asyncio.run``."""
+    return await awaitable
+
 
 def _safe_deepcopy_data(data: Any) -> Any:
-    """Return a deepcopy, except that futures are passed through.
+    """Return a deepcopy, except that futures and immutable leafs are passed through.
+
+    Each leaf is copied with ``snapshot_leaf``.
 
     Futures are only handled correctly when they are list items or dictionary values,
     and only when these lists or dictionaries are list items or dictionary values themselves,
@@ -98,6 +178,255 @@ def _safe_deepcopy_data(data: Any) -> Any:
     In all other cases, the deepcopy of the Future instance may result in an error.
     (Circumventing that error, e.g. with __deepcopy__, will give unpredictable results.)
     """
-    return transform_tree(
-        lambda _, leaf: leaf if isinstance(leaf, Future) else deepcopy(leaf), data
+    leafs, spec = flatten(data)
+    return spec.unflatten([snapshot_leaf(leaf) for leaf in leafs])
+
+
+@attrs.frozen
+class _Frozen:
+    """Reference class to recognize frozen attrs classes."""
+
+
+_FROZEN_SETATTR = _Frozen.__setattr__
+
+
+@singledispatch
+def snapshot_leaf(leaf: Any) -> Any:
+    """Return a copy of a leaf in the arguments of a closure, unaffected by later changes.
+
+    Implementations for other types can be registered with ``snapshot_leaf.register``.
+    The default implementation passes through instances of frozen attrs classes,
+    makes read-only snapshots of NumPy arrays and deep-copies everything else.
+
+    Parameters
+    ----------
+    leaf
+        A leaf in the arguments of a closure.
+
+    Returns
+    -------
+    snapshot
+        The leaf itself, if it is immutable, or a (deep) copy otherwise.
+    """
+    if type(leaf).__setattr__ is _FROZEN_SETATTR:
+        return leaf
+    # NumPy is not imported here, because it is an optional dependency.
+    # If the leaf is an array, NumPy has been imported already.
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(leaf, numpy.ndarray):
+        return _snapshot_array(leaf, numpy)
+    return deepcopy(leaf)
+
+
+def _pass_through(leaf: Any) -> Any:
+    """Return an immutable leaf without copying."""
+    return leaf
+
+
+def register_immutable(cls: type) -> type:
+    """Register a type whose instances are immutable, such that they are never copied.
+
+    This function can also be used as a class decorator.
+    """
+    snapshot_leaf.register(cls, _pass_through)
+    return cls
+
+
+for _cls in NoneType, bool, int, float, complex, str, bytes, range, Future:
+    register_immutable(_cls)
+del _cls
+
+
+def _snapshot_array(array, numpy):
+    """Return a read-only NumPy array, copying the given one only if it is writeable.
+
+    An array is only passed through if it is read-only and if its base arrays
+    (of which it is a view) are also read-only.
+    """
+    base = array
+    while isinstance(base, numpy.ndarray):
+        if base.flags.writeable:
+            result = deepcopy(array) if array.dtype.hasobject else array.copy()
+            result.flags.writeable = False
+            return result
+        base = base.base
+    return array
+
+
+@attrs.frozen
+class _CallPlan:
+    """Argument binding and parameter validator, reusable for calls with the same shape.
+
+    Attributes
+    ----------
+    sources
+        For each parameter, in the order of the signature, a tuple ``(name, kind, key)``.
+        The value is taken from the positional arguments (kind ``"arg"``, key is an index),
+        from the keyword arguments (``"kwarg"``, key is a name),
+        from a slice of positional arguments (``"varargs"``, key is the start),
+        from a subset of keyword arguments (``"varkw"``, key is a tuple of names),
+        or it is a default value (``"default"``, key is the value).
+    parameters_validator
+        The compiled validator of the parameter API,
+        or None when it depends on the values of the arguments.
+    """
+
+    sources: tuple[tuple[str, str, Any], ...] = attrs.field()
+    parameters_validator: Callable | None = attrs.field()
+
+    def bind(self, args: list, kwargs: dict[str, Any]) -> dict[str, Any]:
+        """Return a dictionary with all parameters, as ``inspect.Signature.bind`` would do."""
+        parameters = {}
+        for name, kind, key in self.sources:
+            if kind == "arg":
+                parameters[name] = args[key]
+            elif kind == "kwarg":
+                parameters[name] = kwargs[key]
+            elif kind == "varargs":
+                parameters[name] = tuple(args[key:])
+            elif kind == "varkw":
+                parameters[name] = {kwname: kwargs[kwname] for kwname in key}
+            else:
+                parameters[name] = key
+        return parameters
+
+
+class _Arg:
+    """Placeholder for a positional argument when preparing a call plan."""
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+class _KwArg:
+    """Placeholder for a keyword argument when preparing a call plan."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+def _make_call_plan(
+    metafunc: MetaFuncBase, args: list, kwargs: dict[str, Any], parameters_api_key: Any
+) -> _CallPlan:
+    """Prepare a call plan by binding placeholders to the signature."""
+    signature = metafunc.get_signature()
+    bound_arguments = signature.bind(
+        *[_Arg(index) for index in range(len(args))],
+        **{name: _KwArg(name) for name in kwargs},
     )
+    bound_arguments.apply_defaults()
+    sources = []
+    for name, value in bound_arguments.arguments.items():
+        parameter_kind = signature.parameters[name].kind
+        if parameter_kind == inspect.Parameter.VAR_POSITIONAL:
+            sources.append((name, "varargs", value[0].index if len(value) > 0 else len(args)))
+        elif parameter_kind == inspect.Parameter.VAR_KEYWORD:
+            sources.append((name, "varkw", tuple(value)))
+        elif isinstance(value, _Arg):
+            sources.append((name, "arg", value.index))
+        elif isinstance(value, _KwArg):
+            sources.append((name, "kwarg", value.name))
+        else:
+            sources.append((name, "default", value))
+    if parameters_api_key is None:
+        parameters_validator = None
+    else:
+        parameters_validator = compile_validator(metafunc.get_parameters_api(*args, **kwargs))
+    return _CallPlan(tuple(sources), parameters_validator)
+
+
+# Call plans of each metafunc, stored by id(metafunc) and removed when the metafunc is deleted.
+# This is a process-local cache, which is never pickled together with a metafunc.
+_CALL_PLANS: dict[int, dict[Any, _CallPlan]] = {}
+_CALL_PLANS_LOCK = Lock()
+
+
+# Pickled forms of metafuncs, stored by id(metafunc) and removed when the metafunc is deleted.
+_PAYLOADS: dict[int, bytes] = {}
+_PAYLOADS_LOCK = Lock()
+
+
+# Metafuncs unpickled in this process, stored by their pickled form.
+_METAFUNCS: dict[bytes, MetaFuncBase] = {}
+_METAFUNCS_LOCK = Lock()
+_METAFUNCS_MAXSIZE = 1024
+
+
+def _reset_locks():
+    """Replace the locks in a forked child process, in case they were held by another thread."""
+    global _CALL_PLANS_LOCK, _PAYLOADS_LOCK, _METAFUNCS_LOCK  # noqa: PLW0603
+    _CALL_PLANS_LOCK = Lock()
+    _PAYLOADS_LOCK = Lock()
+    _METAFUNCS_LOCK = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks)
+
+
+def _get_call_plan(metafunc: MetaFuncBase, args: list, kwargs: dict[str, Any]) -> _CallPlan:
+    """Return a cached call plan for the given metafunc and shape of the arguments (thread-safe).
+
+    The cache key consists of the number of positional arguments, the names of the keyword
+    arguments and the result of ``metafunc.get_parameters_api_key``.
+    """
+    parameters_api_key = metafunc.get_parameters_api_key(*args, **kwargs)
+    key = (len(args), tuple(kwargs), parameters_api_key)
+    plans = _CALL_PLANS.get(id(metafunc))
+    if plans is not None:
+        plan = plans.get(key)
+        if plan is not None:
+            return plan
+    plan = _make_call_plan(metafunc, args, kwargs, parameters_api_key)
+    with _CALL_PLANS_LOCK:
+        plans = _CALL_PLANS.get(id(metafunc))
+        if plans is None:
+            try:
+                finalizer = weakref.finalize(metafunc, _CALL_PLANS.pop, id(metafunc), None)
+            except TypeError:
+                # Without weak references, the lifetime of the metafunc cannot be tracked.
+                return plan
+            finalizer.atexit = False
+            plans = {}
+            _CALL_PLANS[id(metafunc)] = plans
+        return plans.setdefault(key, plan)
+
+
+def _pack_metafunc(metafunc: MetaFuncBase) -> bytes:
+    """Return the pickled form of a metafunc, cached for each metafunc (thread-safe)."""
+    payload = _PAYLOADS.get(id(metafunc))
+    if payload is not None:
+        return payload
+    payload = pickle.dumps(metafunc, protocol=pickle.HIGHEST_PROTOCOL)
+    with _PAYLOADS_LOCK:
+        if id(metafunc) not in _PAYLOADS:
+            try:
+                finalizer = weakref.finalize(metafunc, _PAYLOADS.pop, id(metafunc), None)
+            except TypeError:
+                # Without weak references, the lifetime of the metafunc cannot be tracked.
+                return payload
+            finalizer.atexit = False
+            _PAYLOADS[id(metafunc)] = payload
+        return _PAYLOADS[id(metafunc)]
+
+
+def _load_metafunc(payload: bytes) -> MetaFuncBase:
+    """Return the metafunc with the given pickled form, unpickling it only if needed.
+
+    All closures with the same metafunc in one process share one metafunc instance.
+    (This also makes the cached call plans effective in worker processes.)
+    """
+    metafunc = _METAFUNCS.get(payload)
+    if metafunc is None:
+        metafunc = pickle.loads(payload)
+        with _METAFUNCS_LOCK:
+            if len(_METAFUNCS) >= _METAFUNCS_MAXSIZE:
+                # Forget the oldest metafunc.
+                del _METAFUNCS[next(iter(_METAFUNCS))]
+            metafunc = _METAFUNCS.setdefault(payload, metafunc)
+    return metafunc
+
+
+def _restore_closure(payload: bytes, args: list, kwargs: dict[str, Any]) -> Closure:
+    """Restore an unpickled closure, see ``Closure.__reduce__``."""
+    return Closure._from_snapshot(_load_metafunc(payload), args, kwargs)
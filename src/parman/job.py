@@ -41,7 +41,10 @@ The ``jobinfo.py`` can specify three things:
    are only recognized properly when they are ``Path`` instances from the built-in
    Python ``pathlib`` module.
 2) ``resources`` is optional. This is a dictionary specifying resources, which are specific to
-   the runner used. Currently, this is only used by the ParslRunner.
+   the runner used. The ParslRunner uses ``parsl_executors``,
+   and future runners with ``schedule=True`` use ``priority`` to order ready jobs.
+   Future runners with ``capacities`` use the amounts of resources with the same keys,
+   e.g. ``{"cores": 8, "mem_gb": 16}``, to avoid oversubscription.
 3) ``parameters`` is optional.
    This function takes the same arguments as ``mock`` and can be used to return
    a more detailed parameters API than what is possible with type hints.
@@ -56,11 +59,27 @@ Other files in the work directory that may be relevant or useful:
   mentioned in ``result.json``.
 - ``run.out``: the standard output of the run script.
 - ``run.err``: the standard error of the run script.
+
+The compiled code of ``jobinfo.py`` files is cached in memory, keyed by a hash of the source.
+When the environment variable ``PARMAN_JOBINFO_CACHE`` is set to a directory,
+the compiled code is also cached on disk in that directory (in ``marshal`` format),
+such that restarted workflows and worker processes do not need to compile it again.
+Changes to ``jobinfo.py`` result in a different hash, so outdated entries are never used.
+
+By default, the job script is executed with a blocking ``subprocess.run`` call,
+which occupies a thread of the runner until the script has finished.
+Jobs created with ``run_async=True`` are async metafunctions instead:
+the script is started without waiting and its completion is awaited on an event loop,
+e.g. of an ``AsyncioRunner``, without occupying any thread.
+This is useful for thousands of long-running scripts that mostly wait,
+e.g. for jobs submitted with ``parman-sbatch-wait``.
 """
 
+import asyncio
 import hashlib
 import inspect
 import json
+import marshal
 import os
 import re
 import shutil
@@ -68,7 +87,8 @@ import string
 import subprocess
 import sys
 import types
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, Callable
+from contextlib import asynccontextmanager
 from pathlib import Path
 from types import NoneType
 from typing import Any
@@ -85,6 +105,9 @@ from .treeleaf import iterate_tree, transform_tree
 __all__ = ("job", "structure", "unstructure")
 
 
+JOBINFO_CACHE = os.getenv("PARMAN_JOBINFO_CACHE")
+
+
 # Support for None and NoneType can be convenient
 # See https://github.com/python-attrs/cattrs/issues/346
 cattrs.register_structure_hook(NoneType, lambda d, t: None)
@@ -107,10 +130,14 @@ class Job(MetaFuncBase):
         The parameters_api_func defined in ``jobinfo.py``.
     result_mock_func
         The result_mock_func defined in ``jobinfo.py``.
+    run_async
+        When True, calling the job returns a coroutine, which runs the script
+        without blocking a thread while waiting for it.
     """
 
     template: Path = attrs.field()
     jobinfo_source: str = attrs.field()
+    run_async: bool = attrs.field(default=False, kw_only=True)
     resources: dict[str, Any] = attrs.field(init=False)
     can_resume: bool = attrs.field(init=False)
     parameters_func: Callable = attrs.field(init=False)
@@ -118,25 +145,25 @@ class Job(MetaFuncBase):
 
     def __getstate__(self):
         """Return state for pickle"""
-        return self.template, self.jobinfo_source
+        return self.template, self.jobinfo_source, self.run_async
 
     def __setstate__(self, d):
         """State from pickle"""
-        self.template, self.jobinfo_source = d
+        self.template, self.jobinfo_source, self.run_async = d
         self.__attrs_post_init__()
 
     def __attrs_post_init__(self):
         """Finalize the initializations of a Job."""
         # Execute the jobinfo source to fill in the other attributes.
         ns = {}
-        exec(self.jobinfo_source, ns)
+        exec(compile_jobinfo(self.jobinfo_source, str(Path(self.template) / "jobinfo.py")), ns)
         self.resources = ns.get("resources", {})
         self.can_resume = ns.get("can_resume", False)
         self.parameters_func = ns.get("parameters")
         self.mock_func = ns["mock"]
 
     @classmethod
-    def from_template(cls, template: str | Path) -> "Job":
+    def from_template(cls, template: str | Path, run_async: bool = False) -> "Job":
         """Initialize a job script from a template directory.
 
         Parameters
@@ -146,11 +173,17 @@ class Job(MetaFuncBase):
             needed to schedule the job in Parman.
             See module-level docstring for more information on this file.
             When the template is a relative path, it gets converted to an absolute one.
+        run_async
+            When True, the job script is awaited asynchronously, see ``Job.run_async``.
         """
         template = Path(template).absolute()
         with open(template / "jobinfo.py") as f:
             jobinfo_source = f.read()
-        return cls(template, jobinfo_source)
+        return cls(template, jobinfo_source, run_async=run_async)
+
+    def is_async(self) -> bool:
+        """Return True if calling the job returns a coroutine."""
+        return self.run_async
 
     def describe(
         self,
@@ -200,131 +233,209 @@ class Job(MetaFuncBase):
             Output files needed by following jobs must be included here.
         """
         result_api = type_api_from_mock(self.mock_func(**kwargs))
+        return self.call_with_result_api(result_api, clerk, locator, script, kwargs, env)
+
+    def call_with_result_api(
+        self,
+        result_api: Any,
+        clerk: ClerkBase,
+        locator: str | Path,
+        script: str,
+        kwargs: dict[str, Any],
+        env: dict[str, str],
+    ) -> Any:
+        """Execute the job unconditionally, with a result API derived from ``mock_func``.
+
+        See ``__call__`` method for parameter documentation.
+        When ``run_async`` is set, a coroutine is returned, which must be awaited.
+        """
+        if self.run_async:
+            return self._async_call_with_result_api(result_api, clerk, locator, script, kwargs, env)
         with clerk.workdir(locator) as workdir:
-            path_kwargs = workdir / clerk.pull(locator / Path("kwargs.json"), locator, workdir)
-            path_result = workdir / clerk.pull(locator / Path("result.json"), locator, workdir)
-            todo_job = False
-
-            # If kwargs present, we'll assume the job has been started already
-            # (and possibly finished).
-            expected_kwargs = clerk.localize(kwargs, locator, workdir)
-            if path_kwargs.is_file():
-                # If kwargs inconsistent -> refresh or raise exception
-                with open(path_kwargs) as f:
-                    found_kwargs = json.load(f)
-                unstruct_kwargs = unstructure(expected_kwargs)
-                if found_kwargs is None:
-                    # The file kwargs.json contains "null".
-                    # It is assumed that the old kwargs.json is manually flagged as outdated
-                    # and safe to be refreshed.
-                    print(f"Rewriting nullified kwargs.json in {locator}")
-                    with open(workdir / "kwargs.json", "w") as f:
-                        json.dump(unstruct_kwargs, f, indent=2)
-                    clerk.push("kwargs.json", locator, workdir)
-                elif found_kwargs != unstruct_kwargs:
-                    with open(workdir / "kwargs-new.json", "w") as f:
-                        json.dump(unstruct_kwargs, f, indent=2)
-                    clerk.push("kwargs-new.json", locator, workdir)
-                    raise ValueError(
-                        f"Existing kwarg.json in {locator} inconsistent with new kwargs. "
-                        "Added kwargs-new.json for comparison."
-                    )
-                if not path_result.exists() and self.can_resume:
-                    todo_job = True
-            else:
-                # Check for the presence of a result.json file,
-                # If present, this would suggest a broken state of the job
-                if path_result.is_file():
-                    raise ValueError(f"Found result.json in {locator} while kwargs.json is absent.")
-                todo_job = True
+            parman_env = self._prepare(clerk, locator, kwargs, env, workdir)
+            if parman_env is not None:
+                with (
+                    open(workdir / f"{script}.out", "w") as fo,
+                    open(workdir / f"{script}.err", "w") as fe,
+                ):
+                    returncode = subprocess.run(
+                        f"./{script}",
+                        stdin=subprocess.DEVNULL,
+                        stdout=fo,
+                        stderr=fe,
+                        shell=True,
+                        cwd=workdir,
+                        check=False,
+                        env=os.environ | parman_env,
+                    ).returncode
+                self._finish(clerk, locator, script, workdir, returncode)
+            return self._load_result(result_api, clerk, locator, workdir)
+
+    async def _async_call_with_result_api(
+        self,
+        result_api: Any,
+        clerk: ClerkBase,
+        locator: str | Path,
+        script: str,
+        kwargs: dict[str, Any],
+        env: dict[str, str],
+    ) -> Any:
+        """Same as ``call_with_result_api``, awaiting the script without blocking a thread.
+
+        The file I/O before and after the script runs in the default executor of the loop,
+        such that other coroutines are not stalled.
+        """
+        async with _async_workdir(clerk, locator) as workdir:
+            parman_env = await asyncio.to_thread(
+                self._prepare, clerk, locator, kwargs, env, workdir
+            )
+            if parman_env is not None:
+                process = await asyncio.to_thread(_start_script, script, workdir, parman_env)
+                returncode = await wait_process(process)
+                await asyncio.to_thread(self._finish, clerk, locator, script, workdir, returncode)
+            return await asyncio.to_thread(self._load_result, result_api, clerk, locator, workdir)
+
+    def _prepare(
+        self,
+        clerk: ClerkBase,
+        locator: str | Path,
+        kwargs: dict[str, Any],
+        env: dict[str, str],
+        workdir: Path,
+    ) -> dict[str, str] | None:
+        """Check existing inputs and prepare the work directory for running the script.
 
-            # If hashes file is present, even if empty, it should match the computed hashes.
-            # If missing -> recreate.
-            path_sha256 = workdir / clerk.pull(locator / Path("kwargs.sha256"), locator, workdir)
-            expected_hashes = compute_hashes(expected_kwargs, workdir)
-            if path_sha256.is_file():
-                # If files in kwargs have changes hashes -> raise exception
-                found_hashes = load_hashes(path_sha256)
-                if found_hashes != expected_hashes:
-                    dump_hashes(workdir / "kwargs-new.sha256", expected_hashes)
-                    clerk.push("kwargs-new.sha256", locator, workdir)
-                    raise ValueError(
-                        f"Existing kwarg.json in {locator} inconsistent with new hashes. "
-                        "Added kwargs-new.sha256 for comparison."
-                    )
-            else:
-                dump_hashes(workdir / "kwargs.sha256", expected_hashes)
-                clerk.push("kwargs.sha256", locator, workdir)
-
-            if todo_job:
-                if self.can_resume:
-                    print(f"Starting or resuming {locator}")
-                else:
-                    print(f"Starting {locator}")
-
-                # Define useful environment variable
-                parman_env = env | {"PARMAN_WORKDIR": os.getcwd()}
-                write_sh_env(workdir / "jobenv.sh", parman_env)
-
-                # Initialize the work directory
-                shutil.copytree(self.template, workdir, dirs_exist_ok=True)
-                local_kwargs = clerk.localize(kwargs, locator, workdir)
+        Returns
+        -------
+        parman_env
+            The environment variables defined by Parman for the script,
+            or None if the script does not need to be executed.
+        """
+        path_kwargs = workdir / clerk.pull(locator / Path("kwargs.json"), locator, workdir)
+        path_result = workdir / clerk.pull(locator / Path("result.json"), locator, workdir)
+        todo_job = False
+
+        # If kwargs present, we'll assume the job has been started already
+        # (and possibly finished).
+        expected_kwargs = clerk.localize(kwargs, locator, workdir)
+        if path_kwargs.is_file():
+            # If kwargs inconsistent -> refresh or raise exception
+            with open(path_kwargs) as f:
+                found_kwargs = json.load(f)
+            unstruct_kwargs = unstructure(expected_kwargs)
+            if found_kwargs is None:
+                # The file kwargs.json contains "null".
+                # It is assumed that the old kwargs.json is manually flagged as outdated
+                # and safe to be refreshed.
+                print(f"Rewriting nullified kwargs.json in {locator}")
                 with open(workdir / "kwargs.json", "w") as f:
-                    json.dump(unstructure(local_kwargs), f, indent=2)
-                dump_hashes(workdir / "kwargs.sha256", compute_hashes(local_kwargs, workdir))
-
-                # Run the job
-                fn_out = workdir / f"{script}.out"
-                fn_err = workdir / f"{script}.err"
-                try:
-                    with open(fn_out, "w") as fo, open(fn_err, "w") as fe:
-                        subprocess.run(
-                            f"./{script}",
-                            stdin=subprocess.DEVNULL,
-                            stdout=fo,
-                            stderr=fe,
-                            shell=True,
-                            cwd=workdir,
-                            check=True,
-                            env=os.environ | parman_env,
-                        )
-                except subprocess.CalledProcessError as exc:
-                    if fn_err.is_file():
-                        with open(fn_err) as f:
-                            sys.stderr.write(f.read())
-                    raise RuntimeError(f"Script {locator} failed: {script}.") from exc
-
-                # When we got here, the job ran without raising an exception.
+                    json.dump(unstruct_kwargs, f, indent=2)
                 clerk.push("kwargs.json", locator, workdir)
-                clerk.push("kwargs.sha256", locator, workdir)
-                clerk.push(script, locator, workdir)
-                clerk.push(f"{script}.out", locator, workdir)
-                clerk.push(f"{script}.err", locator, workdir)
-
-                # There may be some extra files, not explicitly included in the results,
-                # worth keeping.
-                clerk.push("jobinfo.py", locator, workdir)
-                fn_extra = workdir / "result.extra"
-                if fn_extra.is_file():
-                    with open(fn_extra) as f:
-                        for line in f:
-                            line = strip_line(line)
-                            if len(line) > 0:
-                                clerk.push(line.strip(), locator, workdir)
-                    clerk.push("result.extra", locator, workdir)
-                print(f"Completed {locator}")
-            else:
-                print(f"Not rerunning {locator}")
-
-            if path_result.exists():
-                clerk.push("result.json", locator, workdir)
-                with open(path_result) as f:
-                    result_local = structure("result", json.load(f), result_api)
-                    result = clerk.globalize(result_local, locator, workdir)
-            else:
-                raise OSError(f"No result.json after completion of {locator}")
-
-        return result
+            elif found_kwargs != unstruct_kwargs:
+                with open(workdir / "kwargs-new.json", "w") as f:
+                    json.dump(unstruct_kwargs, f, indent=2)
+                clerk.push("kwargs-new.json", locator, workdir)
+                raise ValueError(
+                    f"Existing kwarg.json in {locator} inconsistent with new kwargs. "
+                    "Added kwargs-new.json for comparison."
+                )
+            if not path_result.exists() and self.can_resume:
+                todo_job = True
+        else:
+            # Check for the presence of a result.json file,
+            # If present, this would suggest a broken state of the job
+            if path_result.is_file():
+                raise ValueError(f"Found result.json in {locator} while kwargs.json is absent.")
+            todo_job = True
+
+        # If hashes file is present, even if empty, it should match the computed hashes.
+        # If missing -> recreate.
+        path_sha256 = workdir / clerk.pull(locator / Path("kwargs.sha256"), locator, workdir)
+        expected_hashes = compute_hashes(expected_kwargs, workdir)
+        if path_sha256.is_file():
+            # If files in kwargs have changes hashes -> raise exception
+            found_hashes = load_hashes(path_sha256)
+            if found_hashes != expected_hashes:
+                dump_hashes(workdir / "kwargs-new.sha256", expected_hashes)
+                clerk.push("kwargs-new.sha256", locator, workdir)
+                raise ValueError(
+                    f"Existing kwarg.json in {locator} inconsistent with new hashes. "
+                    "Added kwargs-new.sha256 for comparison."
+                )
+        else:
+            dump_hashes(workdir / "kwargs.sha256", expected_hashes)
+            clerk.push("kwargs.sha256", locator, workdir)
+
+        if not todo_job:
+            print(f"Not rerunning {locator}")
+            return None
+
+        if self.can_resume:
+            print(f"Starting or resuming {locator}")
+        else:
+            print(f"Starting {locator}")
+
+        # Define useful environment variable
+        parman_env = env | {"PARMAN_WORKDIR": os.getcwd()}
+        write_sh_env(workdir / "jobenv.sh", parman_env)
+
+        # Initialize the work directory
+        shutil.copytree(self.template, workdir, dirs_exist_ok=True)
+        local_kwargs = clerk.localize(kwargs, locator, workdir)
+        with open(workdir / "kwargs.json", "w") as f:
+            json.dump(unstructure(local_kwargs), f, indent=2)
+        dump_hashes(workdir / "kwargs.sha256", compute_hashes(local_kwargs, workdir))
+        return parman_env
+
+    def _finish(
+        self,
+        clerk: ClerkBase,
+        locator: str | Path,
+        script: str,
+        workdir: Path,
+        returncode: int,
+    ):
+        """Check the exit code of the script and keep its output files."""
+        fn_err = workdir / f"{script}.err"
+        if returncode != 0:
+            if fn_err.is_file():
+                with open(fn_err) as f:
+                    sys.stderr.write(f.read())
+            raise RuntimeError(f"Script {locator} failed: {script}.") from (
+                subprocess.CalledProcessError(returncode, f"./{script}")
+            )
+
+        # When we got here, the job ran without raising an exception.
+        clerk.push("kwargs.json", locator, workdir)
+        clerk.push("kwargs.sha256", locator, workdir)
+        clerk.push(script, locator, workdir)
+        clerk.push(f"{script}.out", locator, workdir)
+        clerk.push(f"{script}.err", locator, workdir)
+
+        # There may be some extra files, not explicitly included in the results,
+        # worth keeping.
+        clerk.push("jobinfo.py", locator, workdir)
+        fn_extra = workdir / "result.extra"
+        if fn_extra.is_file():
+            with open(fn_extra) as f:
+                for line in f:
+                    line = strip_line(line)
+                    if len(line) > 0:
+                        clerk.push(line.strip(), locator, workdir)
+            clerk.push("result.extra", locator, workdir)
+        print(f"Completed {locator}")
+
+    def _load_result(
+        self, result_api: Any, clerk: ClerkBase, locator: str | Path, workdir: Path
+    ) -> Any:
+        """Load the result of the job from ``result.json``."""
+        path_result = workdir / clerk.pull(locator / Path("result.json"), locator, workdir)
+        if path_result.exists():
+            clerk.push("result.json", locator, workdir)
+            with open(path_result) as f:
+                result_local = structure("result", json.load(f), result_api)
+                return clerk.globalize(result_local, locator, workdir)
+        raise OSError(f"No result.json after completion of {locator}")
 
     def get_parameters_api(
         self,
@@ -345,6 +456,20 @@ class Job(MetaFuncBase):
             parameters_api["kwargs"] = self.parameters_func(**kwargs)
         return parameters_api
 
+    def get_parameters_api_key(
+        self,
+        clerk: ClerkBase,
+        locator: str | Path,
+        script: str,
+        kwargs: dict[str, Any],
+        env: dict[str, str],
+    ) -> tuple | None:
+        """Return a key for the parameter API, None if ``jobinfo.py`` defines ``parameters``.
+
+        See ``__call__`` method for parameter documentation.
+        """
+        return () if self.parameters_func is None else None
+
     def get_result_mock(
         self,
         clerk: ClerkBase,
@@ -384,6 +509,65 @@ class Job(MetaFuncBase):
         return defaults
 
 
+# Compiled jobinfo.py files, stored by the hash computed in compile_jobinfo.
+_JOBINFO_CODES: dict[str, types.CodeType] = {}
+
+
+def compile_jobinfo(source: str, filename: str) -> types.CodeType:
+    """Compile the source of a ``jobinfo.py`` file, using the caches if possible.
+
+    Parameters
+    ----------
+    source
+        The contents of the ``jobinfo.py`` file.
+    filename
+        The filename to be used in tracebacks.
+
+    Returns
+    -------
+    code
+        The compiled code, to be executed with ``exec``.
+    """
+    key = hashlib.sha256(f"{filename}\0{source}".encode()).hexdigest()
+    code = _JOBINFO_CODES.get(key)
+    if code is None:
+        path_code = None
+        if JOBINFO_CACHE is not None:
+            path_code = Path(JOBINFO_CACHE) / f"{key}.{sys.implementation.cache_tag}.marshal"
+            code = _load_code(path_code)
+        if code is None:
+            code = compile(source, filename, "exec")
+            if path_code is not None:
+                _dump_code(path_code, code)
+        _JOBINFO_CODES[key] = code
+    return code
+
+
+def _load_code(path_code: Path) -> types.CodeType | None:
+    """Load compiled code from the disk cache, or return None if not possible."""
+    try:
+        with open(path_code, "rb") as f:
+            code = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return code if isinstance(code, types.CodeType) else None
+
+
+def _dump_code(path_code: Path, code: types.CodeType):
+    """Write compiled code to the disk cache, ignoring errors.
+
+    The file is written under a temporary name first, so other processes never read it partially.
+    """
+    path_tmp = path_code.parent / f"{path_code.name}.{os.getpid()}.tmp"
+    try:
+        path_code.parent.mkdir(parents=True, exist_ok=True)
+        with open(path_tmp, "wb") as f:
+            marshal.dump(code, f)
+        path_tmp.replace(path_code)
+    except OSError:
+        path_tmp.unlink(missing_ok=True)
+
+
 def structure(prefix: str, json_data: Any, data_api: Any) -> Any:
     """Structure the unstructured data loaded from a JSON file.
 
@@ -477,6 +661,73 @@ def strip_line(line: str):
     return line.strip()
 
 
+@asynccontextmanager
+async def _async_workdir(clerk: ClerkBase, locator: str | Path) -> AsyncGenerator[Path, None]:
+    """Enter and exit ``clerk.workdir`` in a thread, because it may copy or remove files."""
+    context = clerk.workdir(locator)
+    workdir = await asyncio.to_thread(context.__enter__)
+    try:
+        yield workdir
+    except BaseException as exc:
+        if not await asyncio.to_thread(context.__exit__, type(exc), exc, exc.__traceback__):
+            raise
+    else:
+        await asyncio.to_thread(context.__exit__, None, None, None)
+
+
+def _start_script(script: str, workdir: Path, parman_env: dict[str, str]) -> subprocess.Popen:
+    """Start a script in the work directory, writing its output to files."""
+    with (
+        open(workdir / f"{script}.out", "w") as fo,
+        open(workdir / f"{script}.err", "w") as fe,
+    ):
+        return subprocess.Popen(
+            f"./{script}",
+            stdin=subprocess.DEVNULL,
+            stdout=fo,
+            stderr=fe,
+            shell=True,
+            cwd=workdir,
+            env=os.environ | parman_env,
+        )
+
+
+async def wait_process(process: subprocess.Popen, max_delay: float = 1.0) -> int:
+    """Wait for a process to finish without blocking a thread and return its exit code.
+
+    On Linux, the event loop is notified through a process file descriptor (``os.pidfd_open``).
+    Elsewhere, the process is polled with an exponentially increasing delay,
+    up to ``max_delay`` seconds.
+    When the waiting coroutine is cancelled, the process is terminated.
+    """
+    try:
+        pidfd = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    try:
+        if pidfd is None:
+            delay = 0.001
+            while process.poll() is None:
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, max_delay)
+        else:
+            loop = asyncio.get_running_loop()
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+    except asyncio.CancelledError:
+        process.terminate()
+        raise
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+    # The process has exited, so this does not block.
+    return process.wait()
+
+
 def write_sh_env(path_rc: str, env: dict[str, str]):
     """Write a resource configuration file to simulate the environment in which the job runs.
 
@@ -503,14 +754,28 @@ class JobFactory:
     clerk: ClerkBase = attrs.field(default=attrs.Factory(LocalClerk))
     script: str = attrs.field(default="run")
     env: dict[str, str] = attrs.field(default=attrs.Factory(dict))
-    _cache: dict[str, Job] = attrs.field(init=False, default=attrs.Factory(dict))
+    run_async: bool = attrs.field(default=False)
+    # Jobs by template and run_async,
+    # with the modification time and size of ``jobinfo.py`` when loaded.
+    _cache: dict[tuple[str, bool], tuple[tuple[int, int], Job]] = attrs.field(
+        init=False, default=attrs.Factory(dict)
+    )
 
     def __call__(self, template: str, locator: str, **kwargs) -> Closure:
-        """Create a new job with the locator and keyword arguments."""
-        job_obj = self._cache.get(template)
-        if job_obj is None:
-            job_obj = Job.from_template(template)
-            self._cache[template] = job_obj
+        """Create a new job with the locator and keyword arguments.
+
+        Jobs are reused for the same template, unless its ``jobinfo.py`` file has changed.
+        When ``run_async`` is set, the jobs are async metafunctions, see ``Job.run_async``.
+        """
+        stat = (Path(template) / "jobinfo.py").stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (template, self.run_async)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != version:
+            job_obj = Job.from_template(template, self.run_async)
+            self._cache[key] = (version, job_obj)
+        else:
+            job_obj = cached[1]
         all_kwargs = job_obj.get_defaults()
         all_kwargs.update(kwargs)
         return Closure(job_obj, [self.clerk, locator, self.script, all_kwargs, self.env])
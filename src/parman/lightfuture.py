@@ -0,0 +1,223 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Lightweight Future objects for the internals of Parman.
+
+Every ``concurrent.futures.Future`` allocates a ``threading.Condition``,
+a list of waiters and a list of callbacks when it is created.
+Parman creates several internal futures per closure,
+most of which are never waited for directly.
+``LightFuture`` is a drop-in subclass of ``Future`` with ``__slots__``,
+which only allocates these objects when they are needed.
+"""
+
+from concurrent.futures import CancelledError, Future, InvalidStateError
+from concurrent.futures._base import (
+    _STATE_TO_DESCRIPTION_MAP,
+    CANCELLED,
+    CANCELLED_AND_NOTIFIED,
+    FINISHED,
+    LOGGER,
+    PENDING,
+    RUNNING,
+)
+from threading import Condition, RLock
+
+__all__ = ("LightFuture",)
+
+
+class LightFuture(Future):
+    """A Future allocating its condition, waiters and callbacks only when needed.
+
+    The state is protected by a reentrant lock, as in ``Future``.
+    The condition, which wraps the same lock, is only created when a thread blocks
+    in ``result`` or ``exception``, or when the future is passed to
+    ``concurrent.futures.wait`` or ``as_completed``.
+    Done callbacks are released after they have been called.
+    """
+
+    __slots__ = (
+        "_state",
+        "_result",
+        "_exception",
+        "_lock",
+        "_lazy_condition",
+        "_lazy_waiters",
+        "_done_callbacks",
+    )
+
+    def __init__(self):
+        """Initialize a LightFuture. (Do not call ``Future.__init__``.)"""
+        self._state = PENDING
+        self._result = None
+        self._exception = None
+        self._lock = RLock()
+        self._lazy_condition = None
+        self._lazy_waiters = None
+        self._done_callbacks = None
+
+    @property
+    def _condition(self) -> Condition:
+        """The condition of the future, created on first use.
+
+        This is used by the blocking methods of ``Future``
+        and by ``concurrent.futures.wait`` and ``as_completed``.
+        """
+        with self._lock:
+            if self._lazy_condition is None:
+                self._lazy_condition = Condition(self._lock)
+            return self._lazy_condition
+
+    @property
+    def _waiters(self) -> list:
+        """The waiters installed by ``concurrent.futures.wait`` and ``as_completed``.
+
+        These functions only access the list while holding the condition.
+        """
+        with self._lock:
+            if self._lazy_waiters is None:
+                self._lazy_waiters = []
+            return self._lazy_waiters
+
+    def _notify(self, method: str):
+        """Wake up blocked threads and waiters (while holding the lock)."""
+        if self._lazy_waiters is not None:
+            for waiter in self._lazy_waiters:
+                getattr(waiter, method)(self)
+        if self._lazy_condition is not None:
+            self._lazy_condition.notify_all()
+
+    def _invoke_callbacks(self):
+        callbacks = self._done_callbacks
+        self._done_callbacks = None
+        if callbacks is not None:
+            for callback in callbacks:
+                self._call_callback(callback)
+
+    def _call_callback(self, callback):
+        """Call a done callback, logging its exception as in ``Future``."""
+        try:
+            callback(self)
+        # One failing callback may not prevent the others from being called.
+        except Exception:  # noqa: BLE001
+            LOGGER.exception("exception calling callback for %r", self)
+
+    def __repr__(self):
+        with self._lock:
+            text = f"<{self.__class__.__name__} at {id(self):#x}"
+            text += f" state={_STATE_TO_DESCRIPTION_MAP[self._state]}"
+            if self._state == FINISHED:
+                if self._exception is None:
+                    text += f" returned {self._result.__class__.__name__}"
+                else:
+                    text += f" raised {self._exception.__class__.__name__}"
+            return text + ">"
+
+    def cancel(self) -> bool:
+        with self._lock:
+            if self._state in (RUNNING, FINISHED):
+                return False
+            if self._state in (CANCELLED, CANCELLED_AND_NOTIFIED):
+                return True
+            self._state = CANCELLED
+            if self._lazy_condition is not None:
+                self._lazy_condition.notify_all()
+        self._invoke_callbacks()
+        return True
+
+    def cancelled(self) -> bool:
+        with self._lock:
+            return self._state in (CANCELLED, CANCELLED_AND_NOTIFIED)
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._state == RUNNING
+
+    def done(self) -> bool:
+        with self._lock:
+            return self._state in (CANCELLED, CANCELLED_AND_NOTIFIED, FINISHED)
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if self._state not in (CANCELLED, CANCELLED_AND_NOTIFIED, FINISHED):
+                if self._done_callbacks is None:
+                    self._done_callbacks = [fn]
+                else:
+                    self._done_callbacks.append(fn)
+                return
+        self._call_callback(fn)
+
+    def result(self, timeout=None):
+        with self._lock:
+            if self._state == FINISHED:
+                if self._exception is None:
+                    return self._result
+                exc = self._exception
+            elif self._state in (CANCELLED, CANCELLED_AND_NOTIFIED):
+                raise CancelledError
+            else:
+                exc = None
+        if exc is not None:
+            try:
+                raise exc
+            finally:
+                # Break a reference cycle with the traceback of the exception.
+                exc = None
+        # Only block when the future is not done yet, which creates the condition.
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        with self._lock:
+            if self._state == FINISHED:
+                return self._exception
+            if self._state in (CANCELLED, CANCELLED_AND_NOTIFIED):
+                raise CancelledError
+        return super().exception(timeout)
+
+    def set_running_or_notify_cancel(self) -> bool:
+        with self._lock:
+            if self._state == CANCELLED:
+                self._state = CANCELLED_AND_NOTIFIED
+                if self._lazy_waiters is not None:
+                    for waiter in self._lazy_waiters:
+                        waiter.add_cancelled(self)
+                return False
+            if self._state == PENDING:
+                self._state = RUNNING
+                return True
+            LOGGER.critical("Future %s in unexpected state: %s", id(self), self._state)
+            raise RuntimeError("Future in unexpected state")
+
+    def set_result(self, result):
+        with self._lock:
+            if self._state in (CANCELLED, CANCELLED_AND_NOTIFIED, FINISHED):
+                raise InvalidStateError(f"{self._state}: {self!r}")
+            self._result = result
+            self._state = FINISHED
+            self._notify("add_result")
+        self._invoke_callbacks()
+
+    def set_exception(self, exception):
+        with self._lock:
+            if self._state in (CANCELLED, CANCELLED_AND_NOTIFIED, FINISHED):
+                raise InvalidStateError(f"{self._state}: {self!r}")
+            self._exception = exception
+            self._state = FINISHED
+            self._notify("add_exception")
+        self._invoke_callbacks()
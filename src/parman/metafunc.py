@@ -38,21 +38,26 @@ Three kinds of objects can be used as APIs:
 
 By default, the parameter API is inferred from the __call__ signature,
 but this may be overriden for more advanced type checks.
+
+Type APIs are compiled into validator functions by ``compile_validator``,
+which are cached, such that repeated validation against the same API is cheap.
 """
 
 import inspect
 import types
-from collections.abc import Callable
+from collections.abc import Callable, Hashable
+from functools import lru_cache
 from typing import Any
 
 import attrs
 import cattrs
 
-from .treeleaf import iterate_tree, transform_tree
+from .treeleaf import TreeSpec, flatten, iterate_tree, transform_tree
 
 __all__ = (
     "MetaFuncBase",
     "validate",
+    "compile_validator",
     "type_api_from_signature",
     "type_api_from_mock",
     "MinimalMetaFunc",
@@ -71,6 +76,8 @@ class MetaFuncBase:
     - ``get_parameters_api`` (optional)
       The default behavior is to deduce the signature from the __call__ method,
       but this may be modified in subclasses.
+    - ``get_parameters_api_key`` (optional, recommended when overriding ``get_parameters_api``)
+    - ``call_with_result_api`` (optional)
     - ``get_result_api`` (mandatory)
     - ``get_resources`` (optional)
       The default is to return an empty dictionary.
@@ -106,6 +113,37 @@ class MetaFuncBase:
         """
         return type_api_from_signature(self.get_signature())
 
+    def get_parameters_api_key(self, *args, **kwargs) -> Hashable | None:
+        """Return a key identifying the parameter API for the given arguments.
+
+        Calls with the same number of positional arguments, the same keyword arguments
+        and equal keys must have the same parameter API,
+        such that its validator can be reused across calls.
+        None means that the parameter API depends on the values of the arguments.
+        The default is an empty tuple if ``get_parameters_api`` is not overridden.
+        """
+        if type(self).get_parameters_api is MetaFuncBase.get_parameters_api:
+            return ()
+        return None
+
+    def is_async(self) -> bool:
+        """Return True if calling the metafunction returns an awaitable.
+
+        Such metafunctions are awaited on the event loop of an ``AsyncioRunner``,
+        instead of being called in a worker thread.
+        The default is True when ``__call__`` is a coroutine function.
+        """
+        return inspect.iscoroutinefunction(self.__call__)
+
+    def call_with_result_api(self, result_api: Any, *args, **kwargs) -> Any:
+        """Call the metafunction when the result API is known already.
+
+        Subclasses needing the result API inside ``__call__`` may override this method
+        to avoid deriving it twice.
+        The default is to ignore ``result_api``.
+        """
+        return self(*args, **kwargs)
+
     def get_result_mock(self, *args, **kwargs) -> Any:
         """A method returning API of the result, in the form of a mock.
 
@@ -132,6 +170,8 @@ class MetaFuncBase:
         resources
             A dictionary with information that Runners may use decide how and where to
             execute this function.
+            For example, future runners with ``schedule=True`` submit closures
+            with a higher ``priority`` first.
         """
         return {}
 
@@ -153,29 +193,170 @@ def validate(prefix, data, type_api):
     TypeError
         When a type error is encountered in the data.
     """
-    for mulidx, (leaf, leaf_type) in iterate_tree(data, type_api):
-        if isinstance(leaf_type, types.GenericAlias):
-            # Use cattrs magic to check the type.
-            # The GenericAlias types cannot be checked with isinstance.
-            try:
-                cattrs.structure(leaf, leaf_type)
-            except cattrs.IterableValidationError as exc:
-                raise TypeError(
-                    f"{prefix} at {mulidx}: {leaf} does not conform {leaf_type}"
-                ) from exc
-            except cattrs.StructureHandlerNotFoundError as exc:
-                raise TypeError(
-                    f"{prefix} at {mulidx}: type {leaf_type} cannot be instantiated"
-                ) from exc
-        else:
-            # Standard Python type check
-            try:
-                if not isinstance(leaf, leaf_type):
-                    raise TypeError(f"{prefix} at {mulidx} is not of type {leaf_type}")
-            except Exception as exc:
-                raise TypeError(
-                    f"{prefix} at {mulidx}: cannot type-check {leaf} with {leaf_type}"
-                ) from exc
+    compile_validator(type_api)(prefix, data)
+
+
+def compile_validator(type_api) -> Callable:
+    """Compile a type API into a validator function.
+
+    Parameters
+    ----------
+    type_api
+        The API to use for checking, see module docstring for details.
+
+    Returns
+    -------
+    validator
+        A function taking the arguments ``prefix`` and ``data``,
+        which has the same effect as ``validate(prefix, data, type_api)``.
+        Validators of hashable type APIs are cached.
+    """
+    api_leafs, spec = flatten(type_api)
+    try:
+        return _compile_validator(spec, tuple(api_leafs))
+    except TypeError:
+        # Unhashable leafs in the type API cannot be cached.
+        return _compile_validator.__wrapped__(spec, tuple(api_leafs))
+
+
+@lru_cache(maxsize=1024)
+def _compile_validator(spec: TreeSpec, api_leafs: tuple) -> Callable:
+    """Compile a validator for a type API, split into its structure and leafs (cached)."""
+    type_api = spec.unflatten(api_leafs)
+    leaf_checks = [_compile_leaf_check(leaf_type) for leaf_type in api_leafs]
+
+    def validator(prefix, data):
+        """Type check data against a compiled type API."""
+        pairs = spec.flatten(data, type_api)
+        if pairs is None:
+            # The structure of the data differs from the API.
+            for mulidx, (leaf, leaf_type) in iterate_tree(data, type_api):
+                _validate_leaf(prefix, mulidx, leaf, leaf_type)
+            return
+        checked = zip(spec.mulidxs, pairs, leaf_checks, strict=True)
+        for mulidx, (leaf, leaf_type), leaf_check in checked:
+            if not leaf_check(leaf):
+                _validate_leaf(prefix, mulidx, leaf, leaf_type)
+
+    return validator
+
+
+def _validate_leaf(prefix, mulidx, leaf, leaf_type):
+    """Type check a single leaf, raise an exception when it does not conform its type."""
+    if isinstance(leaf_type, types.GenericAlias):
+        # Use cattrs magic to check the type.
+        # The GenericAlias types cannot be checked with isinstance.
+        try:
+            cattrs.structure(leaf, leaf_type)
+        except cattrs.IterableValidationError as exc:
+            raise TypeError(f"{prefix} at {mulidx}: {leaf} does not conform {leaf_type}") from exc
+        except cattrs.StructureHandlerNotFoundError as exc:
+            raise TypeError(
+                f"{prefix} at {mulidx}: type {leaf_type} cannot be instantiated"
+            ) from exc
+    else:
+        # Standard Python type check
+        try:
+            if not isinstance(leaf, leaf_type):
+                raise TypeError(f"{prefix} at {mulidx} is not of type {leaf_type}")
+        except Exception as exc:
+            raise TypeError(
+                f"{prefix} at {mulidx}: cannot type-check {leaf} with {leaf_type}"
+            ) from exc
+
+
+# Types for which cattrs.structure accepts all instances without changing them.
+_PRIMITIVE_TYPES = (bool, bytes, float, int, str)
+
+
+def _compile_leaf_check(leaf_type) -> Callable:
+    """Compile a fast check of a leaf against a type.
+
+    The check returns True when the leaf certainly conforms the type.
+    When it returns False, ``_validate_leaf`` should be used to get the definitive answer
+    and a proper error message.
+    """
+    if isinstance(leaf_type, types.GenericAlias):
+        check = _compile_generic_check(leaf_type)
+        return _never if check is None else check
+    try:
+        isinstance(None, leaf_type)
+    except TypeError:
+        return _never
+
+    def check(leaf):
+        return isinstance(leaf, leaf_type)
+
+    return check
+
+
+def _never(leaf) -> bool:
+    """A fast check that always defers to the full type check."""
+    return False
+
+
+def _compile_generic_check(leaf_type) -> Callable | None:
+    """Generate and compile a check for a GenericAlias, or return None if not supported.
+
+    Checks are only generated for (nested) lists, sets, tuples and dictionaries
+    of primitive types, for which cattrs.structure is guaranteed to succeed.
+    The generated function contains plain loops and isinstance calls,
+    so it does not allocate any objects while checking.
+    """
+    lines = ["def check(v0):"]
+    namespace = {}
+    if not _generate_check_lines(leaf_type, "v0", 1, lines, namespace):
+        return None
+    lines.append("    return True")
+    exec("\n".join(lines), namespace)
+    return namespace["check"]
+
+
+def _generate_check_lines(
+    leaf_type, var: str, indent: int, lines: list[str], namespace: dict[str, Any]
+) -> bool:
+    """Append source lines to check a variable against a type, return False if not supported.
+
+    The generated lines return False from the check function if the variable
+    does not conform the type.
+    """
+    prefix = "    " * indent
+    if leaf_type in _PRIMITIVE_TYPES:
+        namespace[leaf_type.__name__] = leaf_type
+        lines.append(f"{prefix}if not isinstance({var}, {leaf_type.__name__}): return False")
+        return True
+    if not isinstance(leaf_type, types.GenericAlias):
+        return False
+    origin = leaf_type.__origin__
+    args = leaf_type.__args__
+    # A new variable name for items in containers.
+    item = f"v{len(lines)}"
+    if origin in (list, set, frozenset) or (
+        origin is tuple and len(args) == 2 and args[1] is Ellipsis
+    ):
+        if len(args) != (2 if origin is tuple else 1):
+            return False
+        namespace[origin.__name__] = origin
+        lines.append(f"{prefix}if not isinstance({var}, {origin.__name__}): return False")
+        lines.append(f"{prefix}for {item} in {var}:")
+        return _generate_check_lines(args[0], item, indent + 1, lines, namespace)
+    if origin is tuple and len(args) > 0 and Ellipsis not in args:
+        lines.append(f"{prefix}if not isinstance({var}, tuple): return False")
+        lines.append(f"{prefix}if len({var}) != {len(args)}: return False")
+        for i, arg in enumerate(args):
+            item = f"v{len(lines)}"
+            lines.append(f"{prefix}{item} = {var}[{i}]")
+            if not _generate_check_lines(arg, item, indent, lines, namespace):
+                return False
+        return True
+    if origin is dict and len(args) == 2:
+        key = f"v{len(lines)}k"
+        lines.append(f"{prefix}if not isinstance({var}, dict): return False")
+        lines.append(f"{prefix}for {key}, {item} in {var}.items():")
+        return _generate_check_lines(
+            args[0], key, indent + 1, lines, namespace
+        ) and _generate_check_lines(args[1], item, indent + 1, lines, namespace)
+    return False
 
 
 def type_api_from_signature(signature):
@@ -221,6 +402,10 @@ class MinimalMetaFunc(MetaFuncBase):
         """The method to be submitted to an executor."""
         return self.function(*args, **kwargs)
 
+    def is_async(self) -> bool:
+        """Return True if the wrapped function is a coroutine function."""
+        return inspect.iscoroutinefunction(self.function)
+
     def get_signature(self) -> inspect.Signature:
         """Return a signature of __call__, used for type checking."""
         return inspect.signature(self.function)
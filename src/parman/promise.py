@@ -0,0 +1,297 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Lazily materialized result trees of futures.
+
+When a closure is submitted to a future runner, the structure of its result is known
+from the result API, but the result itself is not available yet.
+The runner returns a tree with the same structure, in which every leaf is a future.
+
+To keep this cheap for results with many leafs, the lists and dictionaries in this tree
+are instances of ``PromisedList`` and ``PromisedDict``.
+They behave as ordinary lists and dictionaries, except that the future of a leaf
+is only created when the leaf is accessed for the first time.
+Iterating over a container, comparing it, or passing it to another closure,
+creates the futures of all its leafs.
+"""
+
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any
+
+from .spill import SpilledFuture, SpillStore
+from .treeleaf import flatten
+from .waitfuture import ScatterNode
+
+__all__ = ("PromisedList", "PromisedDict", "promise_tree")
+
+
+class PromisedList(list):
+    """A list in a promised result, whose leaf futures are created on first access.
+
+    Users should not create instances manually.
+    Use ``promise_tree`` instead.
+    """
+
+    __slots__ = ("_node", "_pending")
+
+    def __init__(self, items: list, pending: set[int], node: ScatterNode):
+        """Initialize a PromisedList.
+
+        Parameters
+        ----------
+        items
+            The items of the list.
+            Items whose position is in ``pending`` are leaf indexes in the ScatterNode.
+        pending
+            The positions of the leafs for which no future has been created yet.
+        node
+            The ScatterNode that creates the futures of the leafs.
+        """
+        super().__init__(items)
+        self._pending = pending
+        self._node = node
+
+    def _materialize(self, position: int):
+        """Replace a leaf index by its future, if not done yet."""
+        if position < 0:
+            position += len(self)
+        if position in self._pending:
+            leaf_future = self._node.get_future(list.__getitem__(self, position))
+            list.__setitem__(self, position, leaf_future)
+            self._pending.discard(position)
+
+    def _materialize_all(self):
+        """Replace all leaf indexes by their futures."""
+        for position in sorted(self._pending):
+            self._materialize(position)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            for position in range(*index.indices(len(self))):
+                self._materialize(position)
+        else:
+            self._materialize(index)
+        return list.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._materialize_all()
+        elif index < 0:
+            self._pending.discard(index + len(self))
+        else:
+            self._pending.discard(index)
+        list.__setitem__(self, index, value)
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)
+
+
+class PromisedDict(dict):
+    """A dictionary in a promised result, whose leaf futures are created on first access.
+
+    Users should not create instances manually.
+    Use ``promise_tree`` instead.
+    """
+
+    __slots__ = ("_node", "_pending")
+
+    def __init__(self, items: dict, pending: set, node: ScatterNode):
+        """Initialize a PromisedDict.
+
+        Parameters
+        ----------
+        items
+            The items of the dictionary.
+            Values whose key is in ``pending`` are leaf indexes in the ScatterNode.
+        pending
+            The keys of the leafs for which no future has been created yet.
+        node
+            The ScatterNode that creates the futures of the leafs.
+        """
+        super().__init__(items)
+        self._pending = pending
+        self._node = node
+
+    def _materialize(self, key):
+        """Replace a leaf index by its future, if not done yet."""
+        if key in self._pending:
+            leaf_future = self._node.get_future(dict.__getitem__(self, key))
+            dict.__setitem__(self, key, leaf_future)
+            self._pending.discard(key)
+
+    def _materialize_all(self):
+        """Replace all leaf indexes by their futures."""
+        for key in list(self._pending):
+            self._materialize(key)
+
+    def __getitem__(self, key):
+        self._materialize(key)
+        return dict.__getitem__(self, key)
+
+    def __iter__(self):
+        # Overriding __iter__ prevents the CPython fast path in dict(...) and {**...},
+        # which would read the leaf indexes directly.
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        self._materialize(key)
+        return dict.get(self, key, default)
+
+    def pop(self, key, *args):
+        self._materialize(key)
+        return dict.pop(self, key, *args)
+
+    def setdefault(self, key, default=None):
+        self._materialize(key)
+        return dict.setdefault(self, key, default)
+
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._pending.discard(key)
+        dict.__delitem__(self, key)
+
+    def clear(self):
+        self._pending.clear()
+        dict.clear(self)
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(self),)
+
+
+def _materialize_first(method: Callable) -> Callable:
+    """Wrap a list or dict method, such that all leaf futures are created first."""
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize_all()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# All other methods that read values, or move them to other positions,
+# need all leaf futures to be created first.
+for _name in (
+    "__add__",
+    "__contains__",
+    "__delitem__",
+    "__eq__",
+    "__ge__",
+    "__gt__",
+    "__iadd__",
+    "__imul__",
+    "__iter__",
+    "__le__",
+    "__lt__",
+    "__mul__",
+    "__ne__",
+    "__repr__",
+    "__reversed__",
+    "__rmul__",
+    "clear",
+    "copy",
+    "count",
+    "index",
+    "insert",
+    "pop",
+    "remove",
+    "reverse",
+    "sort",
+):
+    setattr(PromisedList, _name, _materialize_first(getattr(list, _name)))
+for _name in (
+    "__eq__",
+    "__ior__",
+    "__ne__",
+    "__or__",
+    "__repr__",
+    "__ror__",
+    "copy",
+    "items",
+    "popitem",
+    "update",
+    "values",
+):
+    setattr(PromisedDict, _name, _materialize_first(getattr(dict, _name)))
+del _name
+
+
+def promise_tree(future: Future, data_api: Any, spill: SpillStore | None = None) -> Any:
+    """Build a tree of futures for the result of a future.
+
+    Parameters
+    ----------
+    future
+        The future whose result is a tree with the structure of data_api.
+    data_api
+        A tree whose leafs are types (or mocks), defining the structure of the result.
+    spill
+        When given, large leafs of the result are written to disk when the future finishes,
+        and the leaf futures are ``SpilledFuture`` instances, which reload them when needed.
+
+    Returns
+    -------
+    promised
+        A tree with the same structure as data_api.
+        Its lists and dictionaries are ``PromisedList`` and ``PromisedDict`` instances,
+        whose leafs are futures for the corresponding leafs in the result.
+        All leaf futures are finished by a single callback on the given future.
+    """
+    _, spec = flatten(data_api)
+    if spill is None:
+        node = ScatterNode(future, spec.flatten_up_to)
+    else:
+        node = ScatterNode(
+            future, lambda result: spill.spill_leafs(spec.flatten_up_to(result)), SpilledFuture
+        )
+    # Build the tree bottom-up, as in TreeSpec.unflatten.
+    # Each item on the stack is a pair (is_leaf, leaf index or subtree).
+    stack = []
+    ileaf = spec.num_leafs
+    for tree_node in reversed(spec.nodes):
+        if tree_node is None:
+            ileaf -= 1
+            stack.append((True, ileaf))
+            continue
+        kind, arg = tree_node
+        if issubclass(kind, list):
+            items = []
+            pending = set()
+            for position in range(arg):
+                is_leaf, item = stack.pop()
+                if is_leaf:
+                    pending.add(position)
+                items.append(item)
+            stack.append((False, PromisedList(items, pending, node)))
+        else:
+            items = {}
+            pending = set()
+            for key in arg:
+                is_leaf, item = stack.pop()
+                if is_leaf:
+                    pending.add(key)
+                items[key] = item
+            stack.append((False, PromisedDict(items, pending, node)))
+    is_leaf, root = stack[0]
+    return node.get_future(root) if is_leaf else root
@@ -0,0 +1,133 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Asyncio job runner, running coroutine metafunctions on a single event loop.
+
+Async metafunctions (see ``MetaFuncBase.is_async``), e.g. a ``MinimalMetaFunc``
+wrapping an ``async def`` function, are awaited as tasks on an event loop,
+which runs in a background thread.
+This is well suited for a large number of I/O-bound closures (waiting for subprocesses,
+file transfers, polling, ...), which would otherwise each occupy a worker thread.
+Other metafunctions are executed in a thread pool with ``loop.run_in_executor``.
+"""
+
+import asyncio
+import heapq
+import os
+import time
+from concurrent.futures import Executor, Future, wait
+from threading import Thread
+from typing import Any
+
+import attrs
+
+from ..closure import Closure
+from ..treeleaf import flatten
+from .future import FutureRunnerBase
+
+__all__ = ("AsyncioRunner",)
+
+
+# Thread IDs of the virtual tracks of concurrent coroutines in a trace.
+_LANE_TID_OFFSET = 1 << 30
+
+
+@attrs.define
+class AsyncioRunner(FutureRunnerBase):
+    """Run jobs as tasks on an asyncio event loop in a background thread.
+
+    Without ``schedule``, a closure is submitted immediately, without waiting
+    for the futures in its arguments: the task on the event loop awaits them,
+    so the calling thread is not blocked.
+
+    Attributes
+    ----------
+    executor
+        The executor for metafunctions that are not async.
+        When not given, the default executor of the event loop is used.
+    """
+
+    executor: Executor | None = attrs.field(default=None, kw_only=True)
+    _loop: asyncio.AbstractEventLoop = attrs.field(init=False, default=None)
+    _thread: Thread = attrs.field(init=False, default=None)
+    # Free lanes for traced coroutines, each shown as a separate track.
+    _lanes: list[int] = attrs.field(init=False, default=attrs.Factory(list))
+    _num_lanes: int = attrs.field(init=False, default=0)
+
+    def __attrs_post_init__(self):
+        FutureRunnerBase.__attrs_post_init__(self)
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, name="parman-asyncio", daemon=True)
+        self._thread.start()
+
+    def _submit(self, closure: Closure) -> Future:
+        """Submit a closure to the event loop."""
+        print(f"Submitting {closure.describe()}")
+        return asyncio.run_coroutine_threadsafe(self._run(closure), self._loop)
+
+    async def _run(self, closure: Closure) -> Any:
+        """Wait for the futures in the arguments and execute the closure."""
+        leafs, _ = flatten([closure.args, closure.kwargs])
+        dependencies = [asyncio.wrap_future(leaf) for leaf in leafs if isinstance(leaf, Future)]
+        if len(dependencies) > 0:
+            await asyncio.gather(*dependencies)
+        closure = self._unpack_data(closure)
+        if not closure.metafunc.is_async():
+            return await self._loop.run_in_executor(self.executor, self._worker_call, closure)
+        if self.tracer is None:
+            return await closure.async_validated_call()
+        return await self._traced_async_call(closure)
+
+    async def _traced_async_call(self, closure: Closure) -> tuple[bool, object, tuple]:
+        """Same as ``traced_call`` for an async metafunction.
+
+        Concurrent coroutines are recorded on separate virtual tracks (lanes),
+        because their slices would overlap on the track of the event loop thread.
+        """
+        lane = heapq.heappop(self._lanes) if len(self._lanes) > 0 else self._new_lane()
+        start = time.time_ns()
+        try:
+            ok, value = True, await closure.async_validated_call()
+        # The exception is returned, such that Tracer.wrap_future can raise it again.
+        except Exception as exc:  # noqa: BLE001
+            ok, value = False, exc
+        finally:
+            heapq.heappush(self._lanes, lane)
+        track = (os.getpid(), _LANE_TID_OFFSET + lane, f"asyncio lane {lane}")
+        return ok, value, (*track, start, time.time_ns())
+
+    def _new_lane(self) -> int:
+        """Return a new lane number. (Only called in the event loop thread.)"""
+        self._num_lanes += 1
+        return self._num_lanes - 1
+
+    def shutdown(self):
+        """Wait for all futures to complete and stop the event loop."""
+        try:
+            FutureRunnerBase.shutdown(self)
+        finally:
+            # Keep the event loop running until all closures are done,
+            # also when the shutdown is interrupted by an exception.
+            wait(list(self._pending))
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+            if self.executor is not None:
+                self.executor.shutdown()
@@ -19,11 +19,12 @@
 # --
 """Concurrent job runner, wrapper around a standard Executor from concurrent.futures."""
 
-from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 import attrs
 
 from ..closure import Closure
+from ..sharedmem import SharedMemoryTransport
 from .future import FutureRunnerBase
 
 __all__ = ("ConcurrentRunner",)
@@ -31,9 +32,16 @@ __all__ = ("ConcurrentRunner",)
 
 @attrs.define
 class ConcurrentRunner(FutureRunnerBase):
-    """Run jobs asynchronously with an Executor"""
+    """Run jobs asynchronously with an Executor
+
+    With a ``ProcessPoolExecutor``, a ``SharedMemoryTransport`` can be given as ``transport``
+    to pass large NumPy arrays in arguments and results through shared memory
+    instead of pickling them, see ``parman.sharedmem``.
+    The transport must be created before the executor starts its worker processes.
+    """
 
     executor = attrs.field(default=None)
+    transport: SharedMemoryTransport | None = attrs.field(default=None, kw_only=True)
 
     def __attrs_post_init__(self):
         FutureRunnerBase.__attrs_post_init__(self)
@@ -44,8 +52,18 @@ class ConcurrentRunner(FutureRunnerBase):
         """Submit a closure to the executor."""
         closure = self._unpack_data(closure)
         print(f"Submitting {closure.describe()}")
+        if self.transport is None:
+            with self._submit_lock:
+                return self.executor.submit(self._worker_call, closure)
+        closure = self.transport.export_closure(closure)
+        traced = self.tracer is not None
         with self._submit_lock:
-            return self.executor.submit(Closure.validated_call, closure)
+            future = self.executor.submit(self.transport.call, closure, traced)
+        return self.transport.wrap_future(future, closure, traced)
+
+    def _snapshot_results(self) -> bool:
+        """Results are not copied for a ProcessPoolExecutor, because closures are pickled."""
+        return not isinstance(self.executor, ProcessPoolExecutor)
 
     def shutdown(self):
         """Wait for all futures to complete."""
@@ -19,64 +19,329 @@
 # --
 """Abstract future job runner."""
 
-from concurrent.futures import Future, as_completed
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future
+from concurrent.futures._base import LOGGER
 from functools import partial
+from queue import Empty, SimpleQueue
 from threading import Lock
+from time import monotonic
 from typing import Any
 
 import attrs
 
-from ..closure import Closure
+from ..backpressure import InflightLimit
+from ..closure import Closure, _safe_deepcopy_data
+from ..promise import promise_tree
 from ..scheduler import Scheduler
-from ..treeleaf import get_tree, iterate_tree, transform_tree
+from ..spill import SpillStore
+from ..trace import TracedTask, Tracer, traced_call
+from ..treeleaf import flatten, iterate_tree
 from ..waitfuture import WaitGraph
 from .base import RunnerBase
 
-__all__ = ("FutureRunnerBase",)
+__all__ = ("Completion", "FutureRunnerBase")
+
+
+@attrs.frozen
+class Completion:
+    """A closure finished by a future runner, see ``FutureRunnerBase.as_completed``.
+
+    Attributes
+    ----------
+    closure
+        The closure given to the runner.
+    future
+        The future of the closure, which is done.
+    """
+
+    closure: Closure = attrs.field()
+    future: Future = attrs.field(repr=False)
+
+    def result(self) -> Any:
+        """Return the result of the closure, with actual values instead of futures.
+
+        If the closure failed, its exception is raised.
+        """
+        return self.future.result()
+
+    def exception(self) -> BaseException | None:
+        """Return the exception raised by the closure, or None."""
+        return self.future.exception()
 
 
 @attrs.define
 class FutureRunnerBase(RunnerBase):
     """Abstract base classes for running functions with Futures.
 
-    Subclasses must override `_submit`.
+    Subclasses must override `_submit`,
+    in which ``self._worker_call`` is submitted to the executor with the closure as argument.
+
+    When ``schedule`` is True, closures are submitted by a ``Scheduler``
+    after their dependencies have finished.
+    Closures ready for submission are ordered by the ``priority`` item in their resources
+    (higher first, zero by default).
+    When ``capacities`` are given, e.g. ``{"cores": 64, "mem_gb": 256}``,
+    closures are only submitted when the amounts with the same keys in their resources
+    fit in the capacities left by other running closures.
+    See ``Scheduler`` for the meaning of ``max_submitted``, ``critical_path``,
+    ``capacities`` and ``num_submitters``.
+
+    With ``max_inflight`` or ``max_pending_bytes``, calling the runner blocks
+    while too many closures are not done yet, or while the estimated total size
+    of their arguments (``Closure.estimate_nbytes``) is too large.
+    This works with and without ``schedule``.
+
+    When a ``tracer`` is given, the execution of every closure is recorded,
+    see ``parman.trace``.
+
+    The runner only keeps references to futures that are not done yet, or that failed,
+    such that a result is freed as soon as the driver and the closures using it
+    no longer refer to it.
+    (A finished result is also kept while the driver holds on to its closure,
+    such that it can be passed to ``as_completed``.)
+    Results the driver holds on to can be written to disk by giving a ``SpillStore``
+    as ``spill``, see ``parman.spill``.
     """
 
     schedule: bool = attrs.field(default=False)
     wait_graph: WaitGraph = attrs.field(default=attrs.Factory(WaitGraph))
+    max_submitted: int | None = attrs.field(default=None, kw_only=True)
+    critical_path: bool = attrs.field(default=False, kw_only=True)
+    capacities: dict[str, float] | None = attrs.field(default=None, kw_only=True)
+    num_submitters: int = attrs.field(default=1, kw_only=True)
+    max_inflight: int | None = attrs.field(default=None, kw_only=True)
+    max_pending_bytes: int | None = attrs.field(default=None, kw_only=True)
+    tracer: Tracer | None = attrs.field(default=None, kw_only=True)
+    spill: SpillStore | None = attrs.field(default=None, kw_only=True)
     _scheduler: Scheduler = attrs.field(init=False, default=None)
-    _futures: list[Future] = attrs.field(init=False, default=attrs.Factory(list))
+    _pending: dict[Future, Closure] = attrs.field(init=False, default=attrs.Factory(dict))
+    _failed: list[Future] = attrs.field(init=False, default=attrs.Factory(list))
+    _closure_futures: dict[int, tuple[weakref.ref, Future]] = attrs.field(
+        init=False, default=attrs.Factory(dict)
+    )
+    _streams: list[Callable] = attrs.field(init=False, default=attrs.Factory(list))
+    _result_callbacks: tuple[Callable, ...] = attrs.field(init=False, default=())
+    _pending_lock: Lock = attrs.field(init=False, default=attrs.Factory(Lock))
     _submit_lock: Lock = attrs.field(init=False, default=attrs.Factory(Lock))
+    _inflight: InflightLimit = attrs.field(init=False, default=None)
 
     def __attrs_post_init__(self):
+        if self.capacities is not None and not self.schedule:
+            raise ValueError("Capacities can only be used with schedule=True.")
         if self.schedule:
-            self._scheduler = Scheduler(self._submit, self.wait_graph)
+            self._scheduler = Scheduler(
+                self._submit_closure,
+                self.wait_graph,
+                max_submitted=self.max_submitted,
+                critical_path=self.critical_path,
+                capacities=self.capacities,
+                num_submitters=self.num_submitters,
+                max_inflight=self.max_inflight,
+                max_pending_bytes=self.max_pending_bytes,
+                tracer=self.tracer,
+                trace_name=_describe_closure,
+            )
+        else:
+            self._inflight = InflightLimit(self.max_inflight, self.max_pending_bytes)
 
     def __call__(self, closure: Closure) -> Any:
+        nbytes = 0 if self.max_pending_bytes is None else closure.estimate_nbytes()
+        if self.schedule or self.tracer is not None:
+            leafs, _ = flatten([closure.args, closure.kwargs])
+            dependencies = [leaf for leaf in leafs if isinstance(leaf, Future)]
+        task = (
+            None if self.tracer is None else self.tracer.new_task(closure.describe(), dependencies)
+        )
         if self.schedule:
-            dependencies = []
-            for data in closure.args, closure.kwargs:
-                for _, leaf in iterate_tree(data):
-                    if isinstance(leaf, Future):
-                        dependencies.append(leaf)
             print(f"Scheduling {closure.describe()} after {len(dependencies)} futures")
-            future = self._scheduler.submit([closure], {}, dependencies)
+            resources = closure.get_resources()
+            future = self._scheduler.submit(
+                [closure, task], {}, dependencies, resources.get("priority", 0), resources, nbytes
+            )
+        elif self._inflight.active:
+            self._inflight.acquire(1, nbytes)
+            try:
+                future = self._submit_direct(closure, task)
+            except BaseException:
+                self._inflight.release(1, nbytes)
+                raise
+            future.add_done_callback(lambda _: self._inflight.release(1, nbytes))
         else:
-            future = self._submit(closure)
-        self._futures.append(future)
-        return _promise_data(future, self.wait_graph, closure.get_result_api())
+            future = self._submit_direct(closure, task)
+        with self._pending_lock:
+            self._pending[future] = closure
+        future.add_done_callback(self._handle_done)
+        # Remember the future while the closure exists, for as_completed.
+        key = id(closure)
+        closure_futures = self._closure_futures
+        closure_futures[key] = (
+            weakref.ref(closure, lambda _: closure_futures.pop(key, None)),
+            future,
+        )
+        result = _promise_data(future, closure.get_result_api(), self.spill)
+        if task is not None:
+            # All leaf futures are created, such that they can be recognized as dependencies.
+            leafs, _ = flatten(result)
+            self.tracer.add_outputs(
+                task, [future] + [leaf for leaf in leafs if isinstance(leaf, Future)]
+            )
+        return result
+
+    def _handle_done(self, future: Future):
+        """Pass a finished closure to the streams and callbacks, and stop tracking it.
+
+        Futures that failed or were cancelled are kept, to raise their exception in shutdown.
+        Successful ones are forgotten, such that their results can be freed.
+        """
+        with self._pending_lock:
+            closure = self._pending.pop(future)
+            if future.cancelled() or future.exception() is not None:
+                self._failed.append(future)
+            callbacks = self._result_callbacks
+            if len(self._streams) == 0 and len(callbacks) == 0:
+                return
+            completion = Completion(closure, future)
+            # Streams are updated while holding the lock,
+            # such that they can tell when no more closures are pending.
+            for put in self._streams:
+                put(completion)
+        for callback in callbacks:
+            _call_result_callback(callback, completion)
+
+    def on_result(self, callback: Callable[[Completion], Any]) -> Callable:
+        """Register a function to be called with every closure that finishes from now on.
+
+        The callback receives a ``Completion`` and is called in the thread
+        that finished the closure, so it should return quickly.
+        Exceptions raised by the callback are logged and ignored.
+        The callback is returned, such that this method can be used as a decorator.
+        """
+        with self._pending_lock:
+            self._result_callbacks = (*self._result_callbacks, callback)
+        return callback
+
+    def remove_result_callback(self, callback: Callable):
+        """Unregister a function registered with ``on_result``."""
+        with self._pending_lock:
+            callbacks = list(self._result_callbacks)
+            callbacks.remove(callback)
+            self._result_callbacks = tuple(callbacks)
+
+    def as_completed(
+        self, subset: Iterable[Closure] | None = None, timeout: float | None = None
+    ) -> Iterator[Completion]:
+        """Iterate over closures as they finish.
+
+        All finished closures are put in one queue,
+        so no condition needs to be created for each future.
+
+        Parameters
+        ----------
+        subset
+            Closures passed to this runner before.
+            When not given, the iterator yields all closures that are not done yet
+            and all closures passed to the runner while iterating.
+            It stops when no closures of this runner are pending anymore,
+            which makes it suitable for adaptive workflows that keep submitting new work.
+        timeout
+            The maximum number of seconds to wait for all closures.
+            A ``TimeoutError`` is raised when they are not finished in time.
+
+        Yields
+        ------
+        completion
+            A ``Completion`` with the closure and its result.
+        """
+        end = None if timeout is None else monotonic() + timeout
+        queue = SimpleQueue()
+        if subset is None:
+            # The queue is registered before returning, such that no completions are missed
+            # when closures finish before the iteration starts.
+            with self._pending_lock:
+                self._streams.append(queue.put)
+            stream = self._stream_all(queue, end)
+            # A generator that is never started does not run its finally clause.
+            finalizer = weakref.finalize(stream, self._remove_stream, queue.put)
+            finalizer.atexit = False
+            return stream
+        futures = []
+        for closure in subset:
+            item = self._closure_futures.get(id(closure))
+            if item is None or item[0]() is not closure:
+                raise ValueError(f"Closure {closure.describe()} was not passed to this runner.")
+            futures.append((closure, item[1]))
+        for closure, future in futures:
+            future.add_done_callback(partial(_put_completion, queue.put, closure))
+        return (_get_completion(queue, end) for _ in range(len(futures)))
+
+    def _stream_all(self, queue: SimpleQueue, end: float | None) -> Iterator[Completion]:
+        """Yield all pending closures and new ones, until no closures are pending.
+
+        The queue must be registered in ``_streams`` by the caller.
+        """
+        try:
+            while True:
+                with self._pending_lock:
+                    if len(self._pending) == 0 and queue.empty():
+                        return
+                yield _get_completion(queue, end)
+        finally:
+            self._remove_stream(queue.put)
+
+    def _remove_stream(self, put: Callable):
+        """Unregister the queue of an iterator created by ``as_completed``, if not done yet."""
+        with self._pending_lock:
+            if put in self._streams:
+                self._streams.remove(put)
+
+    def _submit_direct(self, closure: Closure, task: TracedTask | None) -> Future:
+        """Submit a closure without scheduler, recording the time spent when tracing."""
+        if task is None:
+            return self._submit(closure)
+        start = self.tracer.now()
+        future = self._submit_closure(closure, task)
+        self.tracer.add_span("submit", "runner", start, self.tracer.now())
+        return future
+
+    def _submit_closure(self, closure: Closure, task: TracedTask | None = None) -> Future:
+        """Submit a closure, unpacking the result of ``traced_call`` when tracing."""
+        future = self._submit(closure)
+        if task is not None:
+            future = self.tracer.wrap_future(future, task)
+        return future
+
+    @property
+    def _worker_call(self) -> Callable:
+        """The function to be submitted to the executor with a closure as argument."""
+        return Closure.validated_call if self.tracer is None else traced_call
 
     def _unpack_data(self, closure):
-        """Recursively transform Futures into actual results."""
+        """Recursively transform Futures into actual results.
+
+        The arguments of the closure are snapshots already, so only the results are copied,
+        and only when ``_snapshot_results`` returns True.
+        """
         if self.schedule:
             _validate_done(closure.describe(), closure.args)
             _validate_done(closure.describe(), closure.kwargs)
-        return Closure(
+        snapshot = self._snapshot_results()
+        return Closure._from_snapshot(
             closure.metafunc,
-            _wait_for_data(closure.args),
-            _wait_for_data(closure.kwargs),
+            _wait_for_data(closure.args, snapshot),
+            _wait_for_data(closure.kwargs, snapshot),
         )
 
+    def _snapshot_results(self) -> bool:
+        """Return True if results of futures must be copied before they are used as arguments.
+
+        This is needed when the executor shares memory with the caller,
+        such that the function may change results of other futures in-place.
+        Subclasses may return False when closures are always serialized before execution.
+        """
+        return True
+
     def _submit(self, closure: Closure) -> Future:
         """Submit a closure to the executor.
 
@@ -92,17 +357,54 @@ class FutureRunnerBase(RunnerBase):
         else:
             print("Waiting for all futures to finish")
         # Manually wait for futures to complete, to make sure exceptions are shown.
-        for future in as_completed(self._futures):
+        for future in list(self._failed):
             future.result()
+        for completion in self.as_completed():
+            completion.result()
         print("Shutting down the executor")
 
 
-def _wait_for_data(data: Any) -> Any:
-    """Recursively replace Futures by actual results, waiting if needed."""
-    return transform_tree(
-        lambda _, leaf: leaf.result() if isinstance(leaf, Future) else leaf,
-        data,
-    )
+def _call_result_callback(callback: Callable, completion: Completion):
+    """Call a callback registered with ``on_result``, logging its exception."""
+    try:
+        callback(completion)
+    # One failing callback may not prevent the others from being called.
+    except Exception:  # noqa: BLE001
+        LOGGER.exception("exception calling result callback for %r", completion.closure)
+
+
+def _put_completion(put: Callable, closure: Closure, future: Future):
+    """Done callback putting a completion in a queue."""
+    put(Completion(closure, future))
+
+
+def _get_completion(queue: SimpleQueue, end: float | None) -> Completion:
+    """Take a completion from a queue, waiting until the end time at most."""
+    try:
+        return queue.get(timeout=None if end is None else max(0.0, end - monotonic()))
+    except Empty:
+        raise TimeoutError("Closures not finished in time.") from None
+
+
+def _describe_closure(args: list, kwargs: dict) -> str:
+    """Return the name of a scheduled closure in the trace."""
+    return args[0].describe()
+
+
+def _wait_for_data(data: Any, snapshot: bool = False) -> Any:
+    """Recursively replace Futures by actual results, waiting if needed.
+
+    When snapshot is True, the results are copied with ``_safe_deepcopy_data``.
+    """
+    leafs, spec = flatten(data)
+    if snapshot:
+        leafs = [
+            _safe_deepcopy_data(leaf.result()) if isinstance(leaf, Future) else leaf
+            for leaf in leafs
+        ]
+    else:
+        leafs = [leaf.result() if isinstance(leaf, Future) else leaf for leaf in leafs]
+    return spec.unflatten(leafs)
 
 
 class FutureNotDoneError(RuntimeError):
@@ -118,9 +420,9 @@ def _validate_done(needed_for: str, data: Any) -> Any:
             )
 
 
-def _promise_data(future: Future, wait_graph: WaitGraph, data_api: Any) -> Any:
-    """Build a result, recursively inserting Futures for all return values."""
-    return transform_tree(
-        lambda mulidx, _: wait_graph.submit([future], partial(get_tree, mulidx=mulidx)),
-        data_api,
-    )
+def _promise_data(future: Future, data_api: Any, spill: SpillStore | None = None) -> Any:
+    """Build a result, recursively inserting Futures for all return values.
+
+    The leaf futures are only created when they are accessed, see ``parman.promise``.
+    """
+    return promise_tree(future, data_api, spill)
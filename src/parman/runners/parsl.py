@@ -53,7 +53,7 @@ class ParslRunner(FutureRunnerBase):
         print(f"Submitting {closure.describe()}")
         with self._submit_lock:
             return self.dfk.submit(
-                func=Closure.validated_call,
+                func=self._worker_call,
                 app_args=[closure],
                 executors=executors,
                 cache=False,
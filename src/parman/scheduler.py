@@ -26,31 +26,59 @@ as a base class.
 As a result, also ScheduledFuture instances can also be used as dependencies.
 """
 
+import heapq
 import weakref
-from collections.abc import Callable, Collection, Mapping
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
 from concurrent.futures import Future
-from queue import SimpleQueue
-from threading import Lock, Thread
+from itertools import count
+from threading import Condition, Lock, Thread
 from types import TracebackType
 
 import attrs
 
-from .waitfuture import WaitFuture, WaitGraph
+from .backpressure import InflightLimit
+from .lightfuture import LightFuture
+from .trace import Tracer
+from .waitfuture import PartFuture, WaitFuture, WaitGraph
 
 __all__ = ("ScheduledFuture", "Scheduler")
 
 
-class ScheduledFuture(Future):
+class ScheduledFuture(LightFuture):
     """A future scheduled to be submitted after its dependencies finish.
 
     Users should not create instances manually.
     Use `Scheduler.submit` instead.
     """
 
+    __slots__ = (
+        "_args",
+        "_kwargs",
+        "_priority",
+        "_demands",
+        "_nbytes",
+        "_rank",
+        "_upstream",
+        "_queued",
+    )
+
     _args: Collection
     _kwargs: Mapping
-
-    def __init__(self, args: Collection, kwargs: Mapping):
+    _priority: float
+    _demands: dict[str, float] | None
+    _nbytes: int
+    _rank: int
+    _upstream: tuple["ScheduledFuture", ...] | None
+    _queued: bool
+
+    def __init__(
+        self,
+        args: Collection,
+        kwargs: Mapping,
+        priority: float = 0,
+        demands: dict[str, float] | None = None,
+        nbytes: int = 0,
+    ):
         """Initialize a ScheduledFuture instance.
 
         Parameters
@@ -59,10 +87,27 @@ class ScheduledFuture(Future):
             Arguments to the user_submit function
         kwargs
             Keyword arguments to the user_submit function
+        priority
+            Scheduled futures with a higher priority are submitted first.
+        demands
+            The amounts of resources used while the submitted future is running.
+        nbytes
+            The estimated size of the arguments, in bytes.
         """
         super().__init__()
         self._args = args
         self._kwargs = kwargs
+        self._priority = priority
+        self._demands = demands
+        self._nbytes = nbytes
+        # Bookkeeping for the critical path, only used by a Scheduler with critical_path=True:
+        # - the length of the longest known path of scheduled futures downstream,
+        # - the scheduled futures upstream that are not submitted yet,
+        #   or None when this one is submitted (or not tracked),
+        # - True when this one is in the todo heap.
+        self._rank = 0
+        self._upstream = None
+        self._queued = False
 
 
 def _submit_loop(scheduler_reference):
@@ -71,14 +116,46 @@ def _submit_loop(scheduler_reference):
     def keep_going() -> bool:
         """Single iteration in the submit loop."""
         scheduler = scheduler_reference()
-        scheduled_future = scheduler._todo_queue.get(block=True)
-        if scheduled_future is None:
-            return False
-        work_future = scheduler.user_submit(*scheduled_future._args, **scheduled_future._kwargs)
-        with scheduler._lock:
-            scheduler._work_map[work_future] = scheduled_future
-            scheduler._back_map[scheduled_future] = work_future
-        work_future.add_done_callback(scheduler._handle_work_done)
+        with scheduler._todo_condition:
+            while not scheduler._can_submit():
+                if scheduler._shutdown and len(scheduler._wait_map) + len(scheduler._todo) == 0:
+                    # Let the other submit_loops stop as well.
+                    scheduler._todo_condition.notify_all()
+                    return False
+                scheduler._todo_condition.wait()
+            scheduled_future = scheduler._pop_todo()
+            scheduler._trace_stage(scheduled_future, "submitting")
+            # (The arguments are released after submission, or when the scheduled_future is done.)
+            args, kwargs = scheduled_future._args, scheduled_future._kwargs
+            # Reserve a slot and resources for the work_future, which is not known yet.
+            scheduler._num_submitting += 1
+            scheduler._use_resources(scheduled_future, 1)
+        submitted = False
+        try:
+            if not scheduled_future.cancelled():
+                if scheduler.tracer is not None:
+                    start = scheduler.tracer.now()
+                work_future = scheduler.user_submit(*args, **kwargs)
+                if scheduler.tracer is not None:
+                    scheduler.tracer.add_span(
+                        "user_submit", "scheduler", start, scheduler.tracer.now()
+                    )
+                with scheduler._lock:
+                    # Release the arguments, e.g. the results of upstream futures.
+                    scheduled_future._args = ()
+                    scheduled_future._kwargs = {}
+                    scheduler._work_map[work_future] = scheduled_future
+                    scheduler._back_map[scheduled_future] = work_future
+                    scheduler._trace_stage(scheduled_future, "executing")
+                submitted = True
+        finally:
+            with scheduler._todo_condition:
+                scheduler._num_submitting -= 1
+                if not submitted:
+                    scheduler._use_resources(scheduled_future, -1)
+                    scheduler._todo_condition.notify()
+        if submitted:
+            work_future.add_done_callback(scheduler._handle_work_done)
         return True
 
     # Loop with a local namespace for each iteration:
@@ -97,9 +174,60 @@ class Scheduler:
     wait_graph
         A WaitGraph needed for scheduling futures.
         When not given, a new one is created.
+    max_submitted
+        The maximum number of futures submitted to the executor that are not done yet.
+        When not given, scheduled futures are submitted as soon as their dependencies finish.
+        Set it to the number of workers of the executor,
+        such that the executor only receives work it can start immediately
+        and the remaining work is kept in the priority queue of the scheduler.
+    critical_path
+        When True, scheduled futures with the same priority are ordered by the length
+        of the longest path of known scheduled futures depending on them.
+        This favors work on the critical path of the workflow.
+    capacities
+        The amounts of resources available to the executor, e.g. ``{"cores": 64, "mem_gb": 256}``.
+        When given, a scheduled future is only submitted when its demands (given to ``submit``)
+        fit in what is left by other submitted futures that are not done yet.
+    num_submitters
+        The number of threads calling ``user_submit`` (the submit_loops).
+        Use more than one when ``user_submit`` can be slow,
+        such that one slow submission does not delay the submission of other ready work.
+    max_inflight
+        The maximum number of scheduled futures that are not done yet,
+        including those waiting for dependencies.
+        When reached, ``submit`` and ``submit_many`` block the calling thread
+        until enough scheduled futures have finished.
+        This bounds the memory used by a driver script submitting a large number of futures.
+    max_pending_bytes
+        The maximum total estimated size of the arguments of scheduled futures
+        that are not done yet, using the ``nbytes`` argument of ``submit``.
+        When reached, the calling thread is blocked as with ``max_inflight``.
+    tracer
+        When given, the stages of every scheduled future and the calls to ``user_submit``
+        are recorded, see ``parman.trace``.
+    trace_name
+        A function taking the ``args`` and ``kwargs`` given to ``submit``
+        and returning the name of the scheduled future in the trace.
 
     Notes
     -----
+    Scheduled futures whose dependencies have finished are submitted in order of
+    decreasing priority (given to ``submit``), then decreasing rank (when ``critical_path``
+    is set), and finally in the order in which their dependencies finished.
+    The rank of a scheduled future is determined when its dependencies finish.
+    It is the number of steps in the longest chain of scheduled futures known
+    at that time, which (indirectly) depend on it.
+    When the demands of the next scheduled future in this order do not fit,
+    the submission of all others is postponed until enough resources are released.
+    This ensures that large demands are not postponed indefinitely by smaller ones.
+
+    With ``max_inflight`` or ``max_pending_bytes``, new work is held back at two levels:
+    ``max_submitted`` keeps ready work inside the scheduler instead of the executor queue,
+    while the in-flight limits block the thread calling ``submit``.
+    A batch is admitted at once when it fits, or when nothing is in flight.
+    Dependencies that are not scheduled futures (e.g. futures set by the thread calling
+    ``submit``) must not be completed by a thread that may block on these limits.
+
     When writing a user_submit function, it should do three things:
 
     1) Get results from dependency futures.
@@ -109,7 +237,12 @@ class Scheduler:
     Do not use Future.result() inside the function submitted to the executor.
     Instead, call the result() method before submitting to the executor.
 
-    The scheduler always calls the `user_submit` function from the same thread (the submit_loop).
+    By default, the scheduler always calls the `user_submit` function from the same thread
+    (the submit_loop).
+    With ``num_submitters > 1``, it is called concurrently from several threads,
+    so it must be thread-safe, e.g. by holding a lock while submitting to the executor.
+    The preparation of the submission (e.g. getting results of dependencies)
+    can then be done in parallel, outside the lock.
     To avoid race conditions:
 
     - Do not call user_submit externally while the scheduler is active.
@@ -123,25 +256,66 @@ class Scheduler:
     user_submit: Callable = attrs.field()
     # wait_graph used wait for multiple dependencies.
     wait_graph: WaitGraph = attrs.field(default=attrs.Factory(WaitGraph))
+    # Limit on the number of futures in the executor.
+    max_submitted: int | None = attrs.field(default=None, kw_only=True)
+    # Order ready work by the longest known downstream path.
+    critical_path: bool = attrs.field(default=False, kw_only=True)
+    # Amounts of resources available to the submitted futures.
+    capacities: dict[str, float] | None = attrs.field(default=None, kw_only=True)
+    # Number of threads submitting scheduled futures.
+    num_submitters: int = attrs.field(default=1, kw_only=True)
+    # Limits on the number and size of scheduled futures that are not done yet.
+    max_inflight: int | None = attrs.field(default=None, kw_only=True)
+    max_pending_bytes: int | None = attrs.field(default=None, kw_only=True)
+    # Optional recording of the stages of the scheduled futures.
+    tracer: Tracer | None = attrs.field(default=None, kw_only=True)
+    trace_name: Callable | None = attrs.field(default=None, kw_only=True)
 
     # Locks for safe manipulation of the queues.
     _lock: Lock = attrs.field(init=False, default=attrs.Factory(Lock))
-    # Background thread submitting scheduled futures
-    _submit_thread: Thread = attrs.field(init=False, default=None)
+    # Notifies the submit_loops of new work, free slots or shutdown.
+    _todo_condition: Condition = attrs.field(init=False)
+    # Background threads submitting scheduled futures
+    _submit_threads: list[Thread] = attrs.field(init=False, default=attrs.Factory(list))
     _shutdown: bool = attrs.field(init=False, default=False)
+    # Blocks submit when too many scheduled futures are not done yet.
+    _inflight: InflightLimit = attrs.field(init=False)
     # Internals nomenclature:
     # - wait = waiting for dependencies to complete with a WaitFuture
     # - todo = scheduled_futures to to be submitted (in a separate thread).
     # - work = submitted, waiting to finish the actual work
     # - back = lookup the wait_future or work_future of a scheduled_future
     _wait_map: dict[Future:ScheduledFuture] = attrs.field(init=False, default=attrs.Factory(dict))
-    _todo_queue: SimpleQueue = attrs.field(init=False, default=attrs.Factory(SimpleQueue))
+    # (The todo heap contains (-priority, -rank, counter, scheduled_future) tuples.)
+    _todo: list[tuple] = attrs.field(init=False, default=attrs.Factory(list))
+    _todo_counter: Iterator[int] = attrs.field(init=False, default=attrs.Factory(count))
+    _num_submitting: int = attrs.field(init=False, default=0)
+    # Resources used by submitted futures that are not done yet.
+    _usage: dict[str, float] = attrs.field(init=False)
     _work_map: dict[Future:ScheduledFuture] = attrs.field(init=False, default=attrs.Factory(dict))
     _back_map: dict[ScheduledFuture:Future] = attrs.field(init=False, default=attrs.Factory(dict))
+    # When tracing: the async slice id, name, start time, current stage and its start time.
+    _trace_map: dict[ScheduledFuture:list] = attrs.field(init=False, default=attrs.Factory(dict))
+
+    @_todo_condition.default
+    def _default_todo_condition(self):
+        return Condition(self._lock)
+
+    @_inflight.default
+    def _default_inflight(self):
+        return InflightLimit(self.max_inflight, self.max_pending_bytes)
+
+    @_usage.default
+    def _default_usage(self):
+        return dict.fromkeys(self.capacities or (), 0)
 
     def __attrs_post_init__(self):
-        self._submit_thread = Thread(target=_submit_loop, args=(weakref.ref(self),))
-        self._submit_thread.start()
+        if self.num_submitters < 1:
+            raise ValueError("The number of submitters must be at least one.")
+        for _ in range(self.num_submitters):
+            submit_thread = Thread(target=_submit_loop, args=(weakref.ref(self),))
+            submit_thread.start()
+            self._submit_threads.append(submit_thread)
 
     def __enter__(self) -> "Scheduler":
         return self
@@ -155,7 +329,13 @@ class Scheduler:
         self.shutdown()
 
     def submit(
-        self, args: Collection, kwargs: Mapping, dependencies: Collection[Future] | None = None
+        self,
+        args: Collection,
+        kwargs: Mapping,
+        dependencies: Collection[Future] | None = None,
+        priority: float = 0,
+        demands: Mapping[str, float] | None = None,
+        nbytes: int = 0,
     ) -> ScheduledFuture:
         """Schedule a future for later submission to an executor.
 
@@ -165,6 +345,14 @@ class Scheduler:
             The `submit` function will be called with *args, **kwargs.
         dependencies
             A list of other Future instances that must finish before the future can be submitted.
+        priority
+            When several scheduled futures are ready for submission,
+            those with the highest priority are submitted first.
+        demands
+            The amounts of resources needed by the submitted future, while it is running.
+            Only the keys in ``capacities`` are used, and missing ones are zero.
+        nbytes
+            The estimated size of the arguments, only used with ``max_pending_bytes``.
 
         Returns
         -------
@@ -174,55 +362,256 @@ class Scheduler:
             It is not possible to get notified when the state of a future changes to RUNNING,
             so the scheduler cannot pass that information through to the returned scheduled_future.
         """
+        return self.submit_many([(args, kwargs, dependencies, priority, demands, nbytes)])[0]
+
+    def submit_many(self, batch: Iterable[tuple]) -> list[ScheduledFuture]:
+        """Schedule a batch of futures for later submission to an executor.
+
+        This has the same effect as calling ``submit`` for every item in the batch,
+        but the internals are updated with a single lock acquisition.
+
+        Parameters
+        ----------
+        batch
+            An iterable of tuples with the arguments of ``submit``:
+            ``(args, kwargs)``, optionally followed by ``dependencies``, ``priority``,
+            ``demands`` and ``nbytes``.
+            With ``max_inflight`` or ``max_pending_bytes``,
+            the call blocks until the whole batch fits.
+
+        Returns
+        -------
+        scheduled_futures
+            A list of futures representing the scheduled function calls,
+            in the same order as the batch.
+        """
+        batch = [self._normalize_item(*item) for item in batch]
         with self._lock:
             if self._shutdown:
                 raise RuntimeError("Cannot submit to the scheduler after shutting down.")
-
-        # Create a wait_future and scheduled_future and hook them up to the internals.
-        wait_future = self.wait_graph.submit(dependencies)
-        scheduled_future = ScheduledFuture(args, kwargs)
+        if self._inflight.active and len(batch) > 0:
+            self._inflight.acquire(len(batch), sum(item[5] for item in batch))
+
+        # Create wait_futures and scheduled_futures and hook them up to the internals.
+        wait_futures = self.wait_graph.submit_many((item[2], None) for item in batch)
+        scheduled_futures = [
+            ScheduledFuture(args, kwargs, priority, demands, nbytes)
+            for args, kwargs, _, priority, demands, nbytes in batch
+        ]
+        trace_records = []
+        if self.tracer is not None:
+            # The first stage of each scheduled future is waiting for its dependencies.
+            begin = self.tracer.now()
+            trace_records = [
+                [
+                    self.tracer.new_id(),
+                    "scheduled" if self.trace_name is None else self.trace_name(*item[:2]),
+                    begin,
+                    "waiting",
+                    begin,
+                ]
+                for item in batch
+            ]
         with self._lock:
-            self._wait_map[wait_future] = scheduled_future
-            self._back_map[scheduled_future] = wait_future
-        scheduled_future.add_done_callback(self._handle_scheduled_done)
-        wait_future.add_done_callback(self._handle_wait_done)
+            for wait_future, scheduled_future in zip(wait_futures, scheduled_futures, strict=True):
+                self._wait_map[wait_future] = scheduled_future
+                self._back_map[scheduled_future] = wait_future
+            if self.critical_path:
+                for item, scheduled_future in zip(batch, scheduled_futures, strict=True):
+                    self._add_upstream(scheduled_future, item[2])
+            for record, scheduled_future in zip(trace_records, scheduled_futures, strict=False):
+                self._trace_map[scheduled_future] = record
+        for wait_future, scheduled_future in zip(wait_futures, scheduled_futures, strict=True):
+            scheduled_future.add_done_callback(self._handle_scheduled_done)
+            wait_future.add_done_callback(self._handle_wait_done)
+        return scheduled_futures
+
+    def _normalize_item(
+        self,
+        args: Collection,
+        kwargs: Mapping,
+        dependencies: Collection[Future] | None = None,
+        priority: float = 0,
+        demands: Mapping[str, float] | None = None,
+        nbytes: int = 0,
+    ) -> tuple:
+        """Fill in defaults of the arguments of ``submit`` and check the demands."""
+        if dependencies is None:
+            dependencies = []
+        if self.capacities is None:
+            demands = None
+        else:
+            demands = {key: (demands or {}).get(key, 0) for key in self.capacities}
+            for key, capacity in self.capacities.items():
+                if demands[key] > capacity:
+                    raise ValueError(
+                        f"The demand for {key} ({demands[key]}) exceeds the capacity ({capacity})."
+                    )
+        return args, kwargs, dependencies, priority, demands, nbytes
+
+    def _add_upstream(self, scheduled_future: ScheduledFuture, dependencies):
+        """Link a new scheduled future to the waiting ones it depends on and update ranks.
+
+        Dependencies that are parts of the result of a scheduled future,
+        e.g. the leafs of results returned by future runners, are linked to that future.
+        (The lock must be held by the caller.)
+        """
+        upstream = set()
+        for future in dependencies or ():
+            while isinstance(future, PartFuture):
+                future = future.source
+            if isinstance(future, ScheduledFuture) and future._upstream is not None:
+                upstream.add(future)
+        upstream = tuple(upstream)
+        scheduled_future._upstream = upstream
+        # Increase the ranks upstream, only as far as needed.
+        stack = [(future, scheduled_future._rank + 1) for future in upstream]
+        while len(stack) > 0:
+            future, rank = stack.pop()
+            if future._upstream is not None and future._rank < rank:
+                future._rank = rank
+                if future._queued:
+                    # The old entry in the todo heap becomes stale.
+                    self._push_todo(future)
+                stack.extend((other, rank + 1) for other in future._upstream)
+
+    def _push_todo(self, scheduled_future: ScheduledFuture):
+        """Add a scheduled future to the todo heap. (The lock must be held by the caller.)"""
+        scheduled_future._queued = True
+        heapq.heappush(
+            self._todo,
+            (
+                -scheduled_future._priority,
+                -scheduled_future._rank,
+                next(self._todo_counter),
+                scheduled_future,
+            ),
+        )
+
+    def _pop_todo(self) -> ScheduledFuture:
+        """Remove the scheduled future with the highest priority from the todo heap.
+
+        (The lock must be held by the caller and the todo heap may not be empty.)
+        """
+        scheduled_future = heapq.heappop(self._todo)[-1]
+        if self.critical_path:
+            scheduled_future._upstream = None
+        scheduled_future._queued = False
         return scheduled_future
 
+    def _discard_stale(self):
+        """Remove outdated entries from the top of the todo heap.
+
+        Entries become stale when the rank of a scheduled future is increased
+        after it was added to the todo heap. (The lock must be held by the caller.)
+        """
+        while len(self._todo) > 0:
+            _, neg_rank, _, scheduled_future = self._todo[0]
+            if scheduled_future._queued and scheduled_future._rank == -neg_rank:
+                break
+            heapq.heappop(self._todo)
+
+    def _use_resources(self, scheduled_future: ScheduledFuture, sign: int):
+        """Add (sign=1) or remove (sign=-1) the demands of a scheduled future to the usage.
+
+        (The lock must be held by the caller.)
+        """
+        if scheduled_future._demands is not None:
+            for key, demand in scheduled_future._demands.items():
+                self._usage[key] += sign * demand
+
+    def _trace_stage(self, scheduled_future: ScheduledFuture, stage: str | None):
+        """Record the end of the current stage of a scheduled future and start a new one.
+
+        When stage is None, the scheduled future is done.
+        (The lock must be held by the caller.)
+        """
+        if self.tracer is None:
+            return
+        record = self._trace_map.get(scheduled_future)
+        if record is None:
+            return
+        now = self.tracer.now()
+        span_id, name, begin, previous, start = record
+        if previous is not None:
+            self.tracer.add_async_span(previous, "scheduler", span_id, start, now)
+        if stage is None:
+            # Stages are nested inside a slice covering the whole life of the scheduled future.
+            self.tracer.add_async_span(name, "scheduler", span_id, begin, now)
+            del self._trace_map[scheduled_future]
+        else:
+            record[3:] = stage, now
+
     def shutdown(self):
         """Wait for the scheduled futures to be submitted to the executor and shut down."""
-        with self._lock:
+        with self._todo_condition:
             self._shutdown = True
-        self._check_stop_submit_loop()
-        self._submit_thread.join()
+            self._todo_condition.notify_all()
+        for submit_thread in self._submit_threads:
+            submit_thread.join()
+
+    def _can_submit(self) -> bool:
+        """Return True if the submit loop can submit a scheduled future.
+
+        (The lock must be held by the caller.)
+        """
+        if self.critical_path:
+            self._discard_stale()
+        if len(self._todo) == 0:
+            return False
+        num_submitted = len(self._work_map) + self._num_submitting
+        if self.max_submitted is not None and num_submitted >= self.max_submitted:
+            return False
+        scheduled_future = self._todo[0][-1]
+        if scheduled_future._demands is None or num_submitted == 0:
+            # (Demands never exceed the capacities, so they always fit when nothing is running.)
+            return True
+        if scheduled_future.cancelled():
+            return True
+        return all(
+            self._usage[key] + demand <= self.capacities[key]
+            for key, demand in scheduled_future._demands.items()
+        )
 
     def _check_stop_submit_loop(self):
-        """Check for shutdown and stop the submit_loop if appropriate."""
-        # If there is nothing scheduled for submission to the executor,
-        # the submit_loop can be instructed to stop.
-        with self._lock:
-            if self._shutdown and len(self._wait_map) == 0:
-                self._todo_queue.put(None)
+        """Wake up a submit_loop, to check for work, free slots or shutdown."""
+        with self._todo_condition:
+            self._todo_condition.notify()
 
     def _handle_wait_done(self, wait_future: WaitFuture):
         """Handle a completed wait_future: submit the corresponding scheduled_future."""
-        with self._lock:
+        ready = not wait_future.cancelled() and wait_future.exception() is None
+        # The scheduled_future is moved from the wait_map to the todo heap in one step,
+        # such that the submit_loops cannot miss it when shutting down.
+        with self._todo_condition:
             scheduled_future = self._wait_map.pop(wait_future, None)
+            if scheduled_future is None:
+                # The scheduled_future was cancelled by the user.
+                return
             del self._back_map[scheduled_future]
+            if ready:
+                if scheduled_future._upstream is not None:
+                    # No upstream scheduled futures are pending anymore.
+                    scheduled_future._upstream = ()
+                self._push_todo(scheduled_future)
+                self._trace_stage(scheduled_future, "queued")
+            else:
+                scheduled_future._upstream = None
+            self._todo_condition.notify()
         if wait_future.cancelled():
             scheduled_future.cancel()
-        elif not scheduled_future.cancelled():
-            exc = wait_future.exception()
-            if exc is None:
-                self._todo_queue.put(scheduled_future)
-            else:
-                scheduled_future.set_exception(exc)
-        self._check_stop_submit_loop()
+        elif not ready and not scheduled_future.cancelled():
+            scheduled_future.set_exception(wait_future.exception())
 
     def _handle_work_done(self, work_future: Future):
         """Handle a completed work_future: assign result to the corresponding scheduled_future."""
         with self._lock:
             scheduled_future = self._work_map.pop(work_future, None)
+            if scheduled_future is None:
+                # The scheduled_future was cancelled by the user.
+                return
             del self._back_map[scheduled_future]
+            self._use_resources(scheduled_future, -1)
         if work_future.cancelled():
             scheduled_future.cancel()
         elif not scheduled_future.cancelled():
@@ -231,15 +620,33 @@ class Scheduler:
                 scheduled_future.set_result(work_future.result())
             else:
                 scheduled_future.set_exception(exc)
+        if self.max_submitted is not None or self.capacities is not None:
+            self._check_stop_submit_loop()
 
     def _handle_scheduled_done(self, scheduled_future: ScheduledFuture):
-        """Handle a completed scheduled_future, only relevant when cancelled by the user."""
+        """Handle a completed scheduled_future: release its arguments and in-flight slot.
+
+        When it was cancelled by the user, the corresponding wait_future or work_future
+        is cancelled as well.
+        """
+        scheduled_future._args = ()
+        scheduled_future._kwargs = {}
+        if self._inflight.active:
+            self._inflight.release(1, scheduled_future._nbytes)
+        if self.tracer is not None:
+            with self._lock:
+                self._trace_stage(scheduled_future, None)
         if scheduled_future.cancelled():
+            # The scheduler acts as the executor of the scheduled_future,
+            # so it notifies threads waiting with concurrent.futures.wait or as_completed.
+            scheduled_future.set_running_or_notify_cancel()
             with self._lock:
                 other_future = self._back_map.pop(scheduled_future, None)
-                if other_future is None:
-                    return
-                self._wait_map.pop(other_future, None)
-                self._work_map.pop(other_future, None)
-            other_future.cancel()
+                if other_future is not None:
+                    scheduled_future._upstream = None
+                    self._wait_map.pop(other_future, None)
+                    if self._work_map.pop(other_future, None) is not None:
+                        self._use_resources(scheduled_future, -1)
+            if other_future is not None:
+                other_future.cancel()
         self._check_stop_submit_loop()
@@ -0,0 +1,346 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Transport of large NumPy arrays between processes through shared memory.
+
+With a ``ProcessPoolExecutor``, the arguments and results of closures are pickled.
+A large array is then copied into a pickle, sent through a pipe and copied again
+when it is unpickled, once for every closure that uses it.
+A ``SharedMemoryTransport`` instead puts large arrays in segments of
+``multiprocessing.shared_memory`` and only sends small ``SharedArray`` handles
+to other processes.
+Arrays received from another process are read-only views of a segment,
+and each segment is mapped only once per process.
+
+The driver process removes a segment when no arrays refer to it anymore,
+i.e. when no results (or the futures holding them) and no running closures use it.
+This relies on the POSIX semantics of shared memory.
+"""
+
+import contextlib
+import os
+import sys
+import weakref
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from threading import RLock
+from typing import Any
+
+import attrs
+
+from .closure import Closure
+from .lightfuture import LightFuture
+from .trace import traced_call
+from .treeleaf import flatten
+
+__all__ = ("SharedArray", "SharedMemoryTransport")
+
+
+@attrs.frozen
+class SharedArray:
+    """Picklable handle of an array in a shared memory segment.
+
+    Attributes
+    ----------
+    name
+        The name of the segment.
+    dtype, shape, strides
+        The layout of the array.
+    offset
+        The position of the first element in the segment, in bytes.
+    """
+
+    name: str = attrs.field()
+    dtype: Any = attrs.field()
+    shape: tuple[int, ...] = attrs.field()
+    strides: tuple[int, ...] = attrs.field()
+    offset: int = attrs.field(default=0)
+    # Keeps the segment alive in the current process, not pickled.
+    _root: Any = attrs.field(default=None, eq=False, repr=False)
+
+    def __reduce__(self):
+        return SharedArray, (self.name, self.dtype, self.shape, self.strides, self.offset)
+
+
+@attrs.frozen
+class SharedMemoryTransport:
+    """Send large NumPy arrays to and from worker processes through shared memory.
+
+    Pass an instance as ``transport`` to a ``ConcurrentRunner``
+    with a ``ProcessPoolExecutor``.
+    Create the transport before the executor starts its worker processes,
+    such that they share the resource tracker of the driver.
+    Only arrays of exactly the type ``numpy.ndarray`` are transported,
+    and only when they are leafs of the arguments or results.
+
+    Attributes
+    ----------
+    min_nbytes
+        Smaller arrays are pickled as usual.
+    """
+
+    min_nbytes: int = attrs.field(default=2**20, validator=attrs.validators.gt(0))
+
+    def __attrs_post_init__(self):
+        # All processes must share one resource tracker, so it is started before
+        # any worker is forked. Otherwise, a worker would start its own tracker,
+        # which removes the segments created by the worker when it exits.
+        resource_tracker.ensure_running()
+
+    def export(self, data: Any, owned: bool = True) -> Any:
+        """Replace large arrays in a tree by handles.
+
+        Parameters
+        ----------
+        data
+            A tree of lists and dictionaries, see ``parman.treeleaf``.
+        owned
+            When True, the current process removes the segments created for the arrays
+            when they are no longer used.
+            Worker processes set this to False, to hand over segments to the driver.
+
+        Returns
+        -------
+        exported
+            A copy of the tree, in which large arrays are replaced by ``SharedArray`` handles.
+            Arrays that are views of a segment are not copied.
+        """
+        numpy = sys.modules.get("numpy")
+        if numpy is None:
+            return data
+        leafs, spec = flatten(data)
+        leafs = [
+            _export_array(leaf, owned)
+            if type(leaf) is numpy.ndarray
+            and leaf.nbytes >= self.min_nbytes
+            and not leaf.dtype.hasobject
+            else leaf
+            for leaf in leafs
+        ]
+        return spec.unflatten(leafs)
+
+    def load(self, data: Any, owned: bool = True) -> Any:
+        """Replace handles in a tree by read-only arrays.
+
+        Parameters
+        ----------
+        data
+            A tree of lists and dictionaries, see ``parman.treeleaf``.
+        owned
+            When True, the current process removes the segments when they are no longer used.
+
+        Returns
+        -------
+        loaded
+            A copy of the tree, in which ``SharedArray`` handles are replaced by arrays.
+        """
+        leafs, spec = flatten(data)
+        leafs = [
+            _load_array(leaf, owned) if isinstance(leaf, SharedArray) else leaf for leaf in leafs
+        ]
+        return spec.unflatten(leafs)
+
+    def export_closure(self, closure: Closure) -> Closure:
+        """Return a closure in which large arrays are replaced by handles."""
+        args, kwargs = self.export([closure.args, closure.kwargs])
+        return Closure._from_snapshot(closure.metafunc, args, kwargs)
+
+    def call(self, closure: Closure, traced: bool = False) -> Any:
+        """Execute a closure from ``export_closure`` in a worker process.
+
+        This method is submitted to the executor instead of ``Closure.validated_call``.
+        Large arrays in the result are replaced by handles.
+        When ``traced`` is True, ``parman.trace.traced_call`` is used to execute the closure.
+        """
+        args, kwargs = self.load([closure.args, closure.kwargs], owned=False)
+        closure = Closure._from_snapshot(closure.metafunc, args, kwargs)
+        if not traced:
+            return self.export(closure.validated_call(), owned=False)
+        ok, value, span = traced_call(closure)
+        return ok, (self.export(value, owned=False) if ok else value), span
+
+    def wrap_future(self, future: Future, closure: Closure, traced: bool = False) -> Future:
+        """Load the arrays in the result of a future returned by ``call``.
+
+        Parameters
+        ----------
+        future
+            A future whose result is the return value of ``call``.
+        closure
+            The closure from ``export_closure``, which holds on to the segments
+            of its arguments until the future is done.
+        traced
+            The same argument as for ``call``.
+
+        Returns
+        -------
+        wrapped_future
+            A future with the result of the closure, containing read-only arrays.
+            When it is cancelled, the given future is cancelled as well.
+        """
+        wrapped_future = LightFuture()
+        wrapped_future.add_done_callback(
+            lambda wrapped: future.cancel() if wrapped.cancelled() else None
+        )
+        future.add_done_callback(
+            lambda _: self._handle_done(future, wrapped_future, closure, traced)
+        )
+        return wrapped_future
+
+    def _handle_done(self, future: Future, wrapped_future: Future, closure: Closure, traced: bool):
+        """Pass the outcome of a future to the wrapped future, loading the arrays."""
+        if future.cancelled():
+            wrapped_future.cancel()
+            wrapped_future.set_running_or_notify_cancel()
+            return
+        exception = future.exception()
+        if exception is None:
+            # Segments created by the worker are always taken over,
+            # also when nobody needs the result, such that they get removed.
+            try:
+                result = future.result()
+                if traced:
+                    ok, value, span = result
+                    result = ok, (self.load(value) if ok else value), span
+                else:
+                    result = self.load(result)
+            except Exception as exc:  # noqa: BLE001
+                exception = exc
+        if not wrapped_future.set_running_or_notify_cancel():
+            return
+        if exception is None:
+            wrapped_future.set_result(result)
+        else:
+            wrapped_future.set_exception(exception)
+
+
+@attrs.define
+class _Segment:
+    """A shared memory segment mapped in the current process."""
+
+    shm: SharedMemory = attrs.field()
+    root_id: int = attrs.field()
+    root_ref: weakref.ref = attrs.field()
+    owned: bool = attrs.field()
+    pid: int = attrs.field(default=attrs.Factory(os.getpid))
+
+
+# Segments mapped in this process, by name.
+# The root of a segment is a flat uint8 array of the whole segment,
+# which is the base of all arrays using it.
+# The segment is closed (and removed when owned) as soon as its root is garbage collected.
+_segments: dict[str, _Segment] = {}
+# The names of the segments by the id of their root.
+_root_names: dict[int, str] = {}
+_lock = RLock()
+
+
+def _reset_lock():
+    """Reset the lock after a fork, in case another thread held it."""
+    global _lock  # noqa: PLW0603
+    _lock = RLock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock)
+
+
+def _register(shm: SharedMemory, owned: bool):
+    """Create the root array of a segment and register it, must be called with _lock held."""
+    numpy = sys.modules["numpy"]
+    root = numpy.ndarray((shm.size,), numpy.uint8, buffer=shm.buf)
+    segment = _Segment(shm, id(root), weakref.ref(root), owned)
+    _segments[shm.name] = segment
+    _root_names[id(root)] = shm.name
+    weakref.finalize(root, _release, segment)
+    return root
+
+
+def _release(segment: _Segment):
+    """Close a segment whose root array is garbage collected, and remove it when owned."""
+    name = segment.shm.name
+    with _lock:
+        del _root_names[segment.root_id]
+        current = _segments.get(name)
+        if current is segment:
+            del _segments[name]
+            # Forked processes inherit the registry,
+            # but must not remove the segments of their parent.
+            unlink = segment.owned and segment.pid == os.getpid()
+        else:
+            # The segment was mapped again after the weak reference to this root was cleared.
+            # The new mapping is left alone and takes over the ownership.
+            if current is not None and segment.owned:
+                current.owned = True
+            unlink = False
+    # The arrays using the mapping are gone, so it can be closed safely.
+    segment.shm.close()
+    if unlink:
+        with contextlib.suppress(FileNotFoundError):
+            segment.shm.unlink()
+
+
+def _map_segment(name: str, owned: bool):
+    """Return the root array of a segment, mapping it when needed."""
+    with _lock:
+        segment = _segments.get(name)
+        root = None if segment is None else segment.root_ref()
+        if root is None:
+            root = _register(SharedMemory(name), owned)
+            root.flags.writeable = False
+        elif owned:
+            segment.owned = True
+        return root
+
+
+def _find_root(array):
+    """Return the root array of the segment containing an array, or None."""
+    numpy = sys.modules["numpy"]
+    base = array
+    while isinstance(base, numpy.ndarray):
+        if id(base) in _root_names:
+            return base
+        base = base.base
+    return None
+
+
+def _export_array(array, owned: bool) -> SharedArray:
+    """Return a handle of an array, copying it into a new segment when needed."""
+    numpy = sys.modules["numpy"]
+    root = _find_root(array)
+    if root is None:
+        with _lock:
+            shm = SharedMemory(create=True, size=array.nbytes)
+            root = _register(shm, owned)
+        copy = numpy.ndarray(array.shape, array.dtype, buffer=root)
+        copy[...] = array
+        root.flags.writeable = False
+        return SharedArray(shm.name, array.dtype, array.shape, copy.strides, 0, root)
+    offset = array.__array_interface__["data"][0] - root.__array_interface__["data"][0]
+    return SharedArray(_root_names[id(root)], array.dtype, array.shape, array.strides, offset, root)
+
+
+def _load_array(handle: SharedArray, owned: bool):
+    """Return a read-only array for a handle."""
+    numpy = sys.modules["numpy"]
+    root = _map_segment(handle.name, owned)
+    return numpy.ndarray(
+        handle.shape, handle.dtype, buffer=root, offset=handle.offset, strides=handle.strides
+    )
@@ -0,0 +1,129 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Spilling of large results to disk, to be reloaded when they are needed.
+
+A driver script that keeps the results of all closures, e.g. the history of
+an active-learning loop, holds all of them in memory.
+When a ``SpillStore`` is passed as ``spill`` to a future runner,
+large leafs of results are pickled to files as soon as a closure finishes.
+The leaf futures of the result then hold a ``SpilledValue`` handle,
+and their ``result`` method reloads the value from disk each time it is called,
+e.g. when the leaf is passed to another closure.
+A file is removed when its handle is garbage collected.
+"""
+
+import contextlib
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from typing import Any
+
+import attrs
+
+from .closure import _estimate_leaf_nbytes
+from .waitfuture import PartFuture
+
+__all__ = ("SpillStore", "SpilledValue", "SpilledFuture")
+
+
+@attrs.define
+class SpillStore:
+    """Write large values to files in a directory.
+
+    Attributes
+    ----------
+    directory
+        The directory for the files.
+        When not given, a temporary directory is created,
+        which is removed when the store and all its handles are garbage collected.
+    min_nbytes
+        Smaller values are kept in memory,
+        using the estimate of ``Closure.estimate_nbytes``.
+    """
+
+    directory: str | None = attrs.field(default=None)
+    min_nbytes: int = attrs.field(default=2**20, kw_only=True)
+    _counter: itertools.count = attrs.field(init=False, default=attrs.Factory(itertools.count))
+
+    def __attrs_post_init__(self):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="parman-spill-")
+            weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def spill(self, value: Any) -> "SpilledValue":
+        """Write a value to a new file and return its handle."""
+        path = os.path.join(self.directory, f"{os.getpid()}-{next(self._counter)}.pickle")
+        with open(path, "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        return SpilledValue(path, self)
+
+    def spill_leafs(self, leafs: list) -> list:
+        """Replace large leafs by handles, see ``parman.treeleaf``."""
+        return [
+            self.spill(leaf) if _estimate_leaf_nbytes(leaf) >= self.min_nbytes else leaf
+            for leaf in leafs
+        ]
+
+
+@attrs.define(eq=False)
+class SpilledValue:
+    """Handle of a value written to a file by a ``SpillStore``.
+
+    The file is removed when the handle is garbage collected.
+    """
+
+    path: str = attrs.field()
+    # Keeps a temporary directory alive.
+    _store: SpillStore = attrs.field(repr=False)
+
+    def __attrs_post_init__(self):
+        weakref.finalize(self, _remove, self.path)
+
+    def load(self) -> Any:
+        """Read the value from the file."""
+        with open(self.path, "rb") as fh:
+            return pickle.load(fh)
+
+
+def _remove(path: str):
+    """Remove a file, if it still exists."""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class SpilledFuture(PartFuture):
+    """A future whose result is reloaded from disk when it is a ``SpilledValue``.
+
+    Users should not create instances manually.
+    Future runners with a ``SpillStore`` return them as leafs of results.
+    """
+
+    __slots__ = ()
+
+    def result(self, timeout=None):
+        result = super().result(timeout)
+        if isinstance(result, SpilledValue):
+            return result.load()
+        return result
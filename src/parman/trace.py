@@ -0,0 +1,319 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Record the execution of a workflow as Chrome trace events.
+
+The trace is written as a JSON file in the
+`Trace Event Format <https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU>`_,
+which can be opened with ``chrome://tracing`` or `Perfetto <https://ui.perfetto.dev>`_.
+
+Tracing is opt-in: pass a ``Tracer`` to a future runner or a ``Scheduler``
+and write it out after the runner has been shut down, e.g.
+
+.. code-block:: python
+
+    tracer = Tracer()
+    runner = ConcurrentRunner(schedule=True, tracer=tracer)
+    ...
+    runner.shutdown()
+    tracer.write("trace.json")
+
+The trace contains:
+
+- one track per worker thread or process, with a slice for the execution of each closure,
+  and flow arrows from the closures producing the arguments of other closures,
+- one track per thread calling the submit function of the executor,
+- on the track of the driver process, a group of async slices for every scheduled closure:
+  ``waiting`` for its dependencies, ``queued`` for a free slot, ``submitting``
+  and ``executing``,
+- slices for the done callbacks of each closure, which scatter its result
+  and release the closures depending on it.
+
+When no tracer is given, nothing is recorded.
+"""
+
+import json
+import os
+import time
+import weakref
+from collections.abc import Iterable
+from concurrent.futures import Future
+from itertools import count
+from threading import Lock, current_thread, get_native_id
+
+import attrs
+
+from .lightfuture import LightFuture
+
+__all__ = ("TracedTask", "Tracer", "traced_call")
+
+
+@attrs.define(eq=False)
+class TracedTask:
+    """The execution of one closure, as recorded by a ``Tracer``.
+
+    Users should not create instances manually.
+    Use ``Tracer.new_task`` instead.
+    """
+
+    name: str = attrs.field()
+    upstream: list["TracedTask"] = attrs.field(factory=list)
+    # (pid, tid, start, end) of the execution in microseconds, or None when not finished.
+    span: tuple[int, int, float, float] | None = attrs.field(default=None)
+
+
+@attrs.define
+class Tracer:
+    """Collect trace events of the execution of a workflow.
+
+    All methods are thread-safe.
+    Timestamps are in microseconds since the creation of the tracer,
+    derived from the wall clock, such that events from worker processes can be included.
+    """
+
+    _events: list[dict] = attrs.field(init=False, factory=list)
+    _origin: int = attrs.field(init=False, factory=time.time_ns)
+    _lock: Lock = attrs.field(init=False, factory=Lock)
+    _ids: count = attrs.field(init=False, factory=lambda: count(1))
+    _named_tracks: set[tuple] = attrs.field(init=False, factory=set)
+    # Futures of (parts of) results, mapped to the task producing them.
+    _producers: weakref.WeakKeyDictionary = attrs.field(
+        init=False, factory=weakref.WeakKeyDictionary
+    )
+
+    @property
+    def events(self) -> list[dict]:
+        """A copy of the trace events recorded so far."""
+        with self._lock:
+            return list(self._events)
+
+    def now(self) -> float:
+        """Return the current time in microseconds since the creation of the tracer."""
+        return self._from_ns(time.time_ns())
+
+    def _from_ns(self, timestamp: int) -> float:
+        """Convert a timestamp from ``time.time_ns`` to microseconds since the origin."""
+        return (timestamp - self._origin) / 1000
+
+    def new_id(self) -> int:
+        """Return a unique identifier for async slices or flow arrows."""
+        return next(self._ids)
+
+    def add_span(
+        self,
+        name: str,
+        cat: str,
+        start: float,
+        end: float,
+        args: dict | None = None,
+        track: tuple[int, int, str] | None = None,
+    ):
+        """Add a slice to the track of a thread.
+
+        Parameters
+        ----------
+        name, cat
+            The name and the category of the slice.
+        start, end
+            Timestamps obtained with ``now``.
+        args
+            Extra information shown with the slice.
+        track
+            A tuple ``(pid, tid, thread_name)``.
+            When not given, the current thread is used.
+        """
+        pid, tid, thread_name = _current_track() if track is None else track
+        event = {"ph": "X", "name": name, "cat": cat, "ts": start, "dur": end - start}
+        event.update(pid=pid, tid=tid)
+        if args is not None:
+            event["args"] = args
+        with self._lock:
+            self._name_track(pid, tid, thread_name)
+            self._events.append(event)
+
+    def add_async_span(self, name: str, cat: str, span_id: int, start: float, end: float):
+        """Add an async slice to the track of the current process.
+
+        Async slices with the same ``span_id`` and ``cat`` are grouped together.
+        """
+        pid = os.getpid()
+        common = {"name": name, "cat": cat, "id": span_id, "pid": pid, "tid": pid}
+        with self._lock:
+            self._events.append({"ph": "b", "ts": start, **common})
+            self._events.append({"ph": "e", "ts": end, **common})
+
+    def _name_track(self, pid: int, tid: int, thread_name: str):
+        """Add metadata events naming a new track. (The lock must be held by the caller.)"""
+        if (pid, tid) in self._named_tracks:
+            return
+        if (pid, None) not in self._named_tracks:
+            self._named_tracks.add((pid, None))
+            process_name = "driver" if pid == os.getpid() else f"worker {pid}"
+            self._events.append(
+                {"ph": "M", "name": "process_name", "pid": pid, "args": {"name": process_name}}
+            )
+        self._named_tracks.add((pid, tid))
+        self._events.append(
+            {
+                "ph": "M",
+                "name": "thread_name",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": thread_name},
+            }
+        )
+
+    def new_task(self, name: str, dependencies: Iterable[Future] = ()) -> TracedTask:
+        """Create a record for the execution of a closure.
+
+        Parameters
+        ----------
+        name
+            A description of the closure.
+        dependencies
+            Futures of results of other tasks, used as arguments of this one.
+        """
+        upstream = []
+        with self._lock:
+            for dependency in dependencies:
+                producer = self._producers.get(dependency)
+                if producer is not None and producer not in upstream:
+                    upstream.append(producer)
+        return TracedTask(name, upstream)
+
+    def add_outputs(self, task: TracedTask, futures: Iterable[Future]):
+        """Register futures of (parts of) the result of a task.
+
+        Tasks receiving these futures as arguments are connected with flow arrows.
+        """
+        with self._lock:
+            for future in futures:
+                self._producers[future] = task
+
+    def wrap_future(self, future: Future, task: TracedTask) -> Future:
+        """Unpack the result of a future from a function submitted with ``traced_call``.
+
+        Parameters
+        ----------
+        future
+            A future whose result is the return value of ``traced_call``.
+        task
+            The record of the execution.
+
+        Returns
+        -------
+        wrapped_future
+            A future with the result of the closure.
+            When it is cancelled, the given future is cancelled as well.
+        """
+        wrapped_future = LightFuture()
+        wrapped_future.add_done_callback(
+            lambda wrapped: future.cancel() if wrapped.cancelled() else None
+        )
+        future.add_done_callback(lambda _: self._handle_traced_done(future, wrapped_future, task))
+        return wrapped_future
+
+    def _handle_traced_done(self, future: Future, wrapped_future: Future, task: TracedTask):
+        """Record the execution of a task and pass its outcome to the wrapped future."""
+        if future.cancelled():
+            wrapped_future.cancel()
+            wrapped_future.set_running_or_notify_cancel()
+            return
+        exception = future.exception()
+        if exception is None:
+            ok, value, (pid, tid, thread_name, start, end) = future.result()
+            start = self._from_ns(start)
+            end = self._from_ns(end)
+            task.span = (pid, tid, start, end)
+            self.add_span(
+                task.name,
+                "run",
+                start,
+                end,
+                None if ok else {"error": repr(value)},
+                (pid, tid, thread_name),
+            )
+            self._add_flows(task)
+        else:
+            # The executor failed, not the closure.
+            ok, value = False, exception
+        if not wrapped_future.set_running_or_notify_cancel():
+            return
+        start = self.now()
+        if ok:
+            wrapped_future.set_result(value)
+        else:
+            wrapped_future.set_exception(value)
+        self.add_span(task.name, "done_callbacks", start, self.now())
+
+    def _add_flows(self, task: TracedTask):
+        """Add flow arrows from the executions of upstream tasks to that of the given one."""
+        pid, tid, start, _ = task.span
+        events = []
+        for producer in task.upstream:
+            if producer.span is None:
+                continue
+            producer_pid, producer_tid, producer_start, producer_end = producer.span
+            # The start of the arrow must lie inside the slice of the producer.
+            ts = max(producer_start, producer_end - min(1.0, (producer_end - producer_start) / 2))
+            common = {"name": "dependency", "cat": "dependency", "id": self.new_id()}
+            events.append({"ph": "s", "ts": ts, "pid": producer_pid, "tid": producer_tid, **common})
+            events.append({"ph": "f", "bp": "e", "ts": start, "pid": pid, "tid": tid, **common})
+        with self._lock:
+            self._events.extend(events)
+
+    def to_dict(self) -> dict:
+        """Return the trace as a dictionary in the Trace Event Format."""
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str):
+        """Write the trace to a JSON file."""
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh)
+
+
+def _current_track() -> tuple[int, int, str]:
+    """Return the process ID, thread ID and thread name of the current thread."""
+    return os.getpid(), get_native_id(), current_thread().name
+
+
+def traced_call(closure) -> tuple[bool, object, tuple]:
+    """Call a closure and record where and when it was executed.
+
+    This function is submitted to executors instead of ``Closure.validated_call``
+    when tracing is enabled.
+    Use ``Tracer.wrap_future`` to unpack the result.
+
+    Returns
+    -------
+    ok
+        False when the closure raised an exception.
+    value
+        The result of the closure or the exception.
+    span
+        A tuple ``(pid, tid, thread_name, start, end)``,
+        with timestamps from ``time.time_ns``.
+    """
+    start = time.time_ns()
+    try:
+        ok, value = True, closure.validated_call()
+    # The exception is returned, such that Tracer.wrap_future can raise it again.
+    except Exception as exc:  # noqa: BLE001
+        ok, value = False, exc
+    return ok, value, (*_current_track(), start, time.time_ns())
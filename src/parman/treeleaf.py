@@ -30,12 +30,22 @@ The name ``leaf`` is used for a list item or dictionary value in a ``tree``
 that is itself not a list or dictionary.
 The functions below treat leafs (including tuples) as opaque objects that cannot
 be recursed into.
+
+The structure of a tree, i.e. everything except its leafs, can be represented by a
+``TreeSpec`` instance.
+The functions ``flatten`` and ``TreeSpec.unflatten`` split a tree into a list of leafs and
+its ``TreeSpec`` and combine the two again, respectively.
+When the same structure is processed several times, the spec can be computed once and reused.
+Each following pass then becomes a simple loop over a list of leafs.
 """
 
-from collections.abc import Callable, Generator, Iterable
+from collections.abc import Callable, Generator, Iterable, Iterator
+from functools import lru_cache
 from typing import Any
 
-__all__ = ("get_tree", "iterate_tree", "transform_tree", "same")
+import attrs
+
+__all__ = ("get_tree", "iterate_tree", "transform_tree", "same", "flatten", "TreeSpec")
 
 
 def get_tree(tree: Any, mulidx: tuple) -> Any:
@@ -53,11 +63,9 @@ def get_tree(tree: Any, mulidx: tuple) -> Any:
     element
         The leaf or subtree corresponding to mulidx.
     """
-    if len(mulidx) == 0:
-        return tree
-    if len(mulidx) > 0:
-        return get_tree(tree[mulidx[0]], mulidx[1:])
-    return None
+    for index in mulidx:
+        tree = tree[index]
+    return tree
 
 
 def same(items: Iterable) -> bool:
@@ -70,7 +78,34 @@ def same(items: Iterable) -> bool:
     return all(first == item for item in iitems)
 
 
-def iterate_tree(*trees: Any) -> Generator[tuple[tuple, Any], None, None]:
+def _get_children(trees: tuple) -> Iterator[tuple[Any, tuple]] | None:
+    """Return an iterator over (index, subtrees) pairs, or None if the trees are leafs.
+
+    The trees can only be recursed into when they all have the same type,
+    and when they are all lists of the same length or all dictionaries with the same keys.
+    """
+    first = trees[0]
+    kind = type(first)
+    if isinstance(first, list):
+        size = len(first)
+        for tree in trees[1:]:
+            if type(tree) is not kind or len(tree) != size:
+                return None
+        return enumerate(zip(*trees, strict=True))
+    if isinstance(first, dict):
+        keys = first.keys()
+        for tree in trees[1:]:
+            if type(tree) is not kind or tree.keys() != keys:
+                return None
+        if len(trees) == 1:
+            return ((key, (value,)) for key, value in first.items())
+        return ((key, tuple(tree[key] for tree in trees)) for key in first)
+    return None
+
+
+def iterate_tree(
+    *trees: Any, spec: "TreeSpec | None" = None
+) -> Generator[tuple[tuple, Any], None, None]:
     """Iterate over the (corresponding) leafs of one or more trees.
 
     Parameters
@@ -81,34 +116,55 @@ def iterate_tree(*trees: Any) -> Generator[tuple[tuple, Any], None, None]:
         the recursion makes sense in all given trees.
         If an inconsistency is encountered, the incompatible lists or dicts are treated
         as leafs instead.
+    spec
+        The (expected) common structure of the trees, e.g. obtained with ``flatten``.
+        When it matches, the leafs are iterated without walking the tree.
+        Otherwise, it is ignored.
+        The result does not depend on this argument.
 
     Yields
     ------
     leafs
         When one tree is given, a sinlge leaf is yielded at a time.
         When multiple trees are given, a tuple of corresponding leafs is yielded.
+
+    Notes
+    -----
+    The traversal is depth-first and uses an explicit stack instead of recursion,
+    so there is no limit on the depth of the trees.
     """
-    handled = False
-    if same(type(tree) for tree in trees):
-        if isinstance(trees[0], list) and same(len(tree) for tree in trees):
-            for intidx, items in enumerate(zip(*trees, strict=True)):
-                for subidx, subtrees in iterate_tree(*items):
-                    yield (intidx, *subidx), subtrees
-            handled = True
-        elif isinstance(trees[0], dict) and same(set(tree.keys()) for tree in trees):
-            for keyidx in trees[0]:
-                items = [tree[keyidx] for tree in trees]
-                for subidx, subtrees in iterate_tree(*items):
-                    yield (keyidx, *subidx), subtrees
-            handled = True
-    if not handled:
-        if len(trees) == 1:
-            yield (), trees[0]
+    single = len(trees) == 1
+    if spec is not None:
+        leafs = spec.flatten(*trees)
+        if leafs is not None:
+            yield from zip(spec.mulidxs, leafs, strict=True)
+            return
+    children = _get_children(trees)
+    if children is None:
+        yield (), trees[0] if single else trees
+        return
+    # The indexes of the branches on the stack are kept in path.
+    # A mulidx tuple is only constructed when a leaf is found.
+    path = []
+    stack = [children]
+    while stack:
+        for index, subtrees in stack[-1]:
+            subchildren = _get_children(subtrees)
+            if subchildren is None:
+                yield (*path, index), subtrees[0] if single else subtrees
+            else:
+                path.append(index)
+                stack.append(subchildren)
+                break
         else:
-            yield (), trees
+            stack.pop()
+            if stack:
+                path.pop()
 
 
-def transform_tree(transform: Callable, *trees: Any, _mulidx: tuple = ()) -> Any:
+def transform_tree(
+    transform: Callable, *trees: Any, spec: "TreeSpec | None" = None, _mulidx: tuple = ()
+) -> Any:
     """Transform one or more trees elementwise into a new one.
 
     Parameters
@@ -120,27 +176,230 @@ def transform_tree(transform: Callable, *trees: Any, _mulidx: tuple = ()) -> Any
         The return value is the leaf on the resulting tree.
     trees
         One or more input trees.
+    spec
+        The (expected) common structure of the trees, see ``iterate_tree``.
     _mulidx
         Users should not provide anything else than the default value.
-        This is the prefix of the mulidx, which is extended as it is passed into
-        recursive calls.
+        This is the prefix of the mulidx of all leafs passed to the transform function.
 
     Returns
     -------
     outtree
         The result of the transformation:
         a new tree whose leaf equal the return values of the transform function calls.
+
+    Notes
+    -----
+    The leafs are visited in the same (depth-first) order as in ``iterate_tree``,
+    using an explicit stack instead of recursion.
     """
-    if same(type(tree) for tree in trees):
-        if isinstance(trees[0], list) and same(len(tree) for tree in trees):
-            result = []
-            for intidx, items in enumerate(zip(*trees, strict=True)):
-                result.append(transform_tree(transform, *items, _mulidx=(*_mulidx, intidx)))
-            return result
-        if isinstance(trees[0], dict) and same(set(tree) for tree in trees):
-            result = {}
-            for keyidx in trees[0]:
-                items = [tree[keyidx] for tree in trees]
-                result[keyidx] = transform_tree(transform, *items, _mulidx=(*_mulidx, keyidx))
-            return result
-    return transform(_mulidx, *trees)
+    if spec is not None and len(_mulidx) == 0:
+        leafs = spec.flatten(*trees)
+        if leafs is not None:
+            pairs = zip(spec.mulidxs, leafs, strict=True)
+            if len(trees) == 1:
+                return spec.unflatten([transform(mulidx, leaf) for mulidx, leaf in pairs])
+            return spec.unflatten([transform(mulidx, *leaf) for mulidx, leaf in pairs])
+    children = _get_children(trees)
+    if children is None:
+        return transform(_mulidx, *trees)
+    result = _new_branch(trees[0])
+    path = list(_mulidx)
+    stack = [(children, result)]
+    while stack:
+        children, branch = stack[-1]
+        for index, subtrees in children:
+            subchildren = _get_children(subtrees)
+            if subchildren is None:
+                branch[index] = transform((*path, index), *subtrees)
+            else:
+                subbranch = _new_branch(subtrees[0])
+                branch[index] = subbranch
+                path.append(index)
+                stack.append((subchildren, subbranch))
+                break
+        else:
+            stack.pop()
+            if stack:
+                path.pop()
+    return result
+
+
+def _new_branch(tree: list | dict) -> list | dict:
+    """Return an empty output branch, in which the transformed children of tree can be stored."""
+    if isinstance(tree, list):
+        return [None] * len(tree)
+    return {}
+
+
+def flatten(tree: Any) -> tuple[list, "TreeSpec"]:
+    """Split a tree into a list of leafs and its structure.
+
+    Parameters
+    ----------
+    tree
+        The tree to be flattened.
+
+    Returns
+    -------
+    leafs
+        A list of leafs, in the same order as they are visited by ``iterate_tree``.
+    spec
+        The structure of the tree, which can be used to reconstruct a tree
+        from (transformed) leafs with ``spec.unflatten``.
+    """
+    nodes = []
+    leafs = []
+    stack = [tree]
+    while stack:
+        subtree = stack.pop()
+        if isinstance(subtree, list):
+            nodes.append((type(subtree), len(subtree)))
+            stack.extend(reversed(subtree))
+        elif isinstance(subtree, dict):
+            keys = tuple(subtree)
+            nodes.append((type(subtree), keys))
+            stack.extend(subtree[key] for key in reversed(keys))
+        else:
+            nodes.append(None)
+            leafs.append(subtree)
+    return leafs, TreeSpec(tuple(nodes), len(leafs))
+
+
+@attrs.frozen(cache_hash=True)
+class TreeSpec:
+    """The structure of a tree, without its leafs.
+
+    Instances are immutable and hashable, so they can be used as keys in caches.
+    Users should not create instances manually.
+    Use ``flatten`` instead.
+
+    Attributes
+    ----------
+    nodes
+        All lists, dictionaries and leafs of the tree, in depth-first order.
+        A list is represented by ``(type, length)``, a dictionary by ``(type, keys)``
+        and a leaf by ``None``.
+    num_leafs
+        The number of leafs in the tree.
+    """
+
+    nodes: tuple = attrs.field()
+    num_leafs: int = attrs.field()
+
+    @property
+    def mulidxs(self) -> tuple[tuple, ...]:
+        """The mulidx of each leaf, in the same order as the leafs returned by ``flatten``."""
+        return _get_mulidxs(self)
+
+    def unflatten(self, leafs: Iterable) -> Any:
+        """Construct a new tree with this structure and the given leafs.
+
+        Parameters
+        ----------
+        leafs
+            An iterable with ``num_leafs`` items.
+
+        Returns
+        -------
+        tree
+            A new tree, consisting of (plain) lists and dictionaries.
+        """
+        leafs = list(leafs)
+        if len(leafs) != self.num_leafs:
+            raise ValueError(f"Expected {self.num_leafs} leafs, got {len(leafs)}.")
+        # Build the tree bottom-up, visiting the nodes in reverse order.
+        # The stack holds the subtrees that still need to be added to their parent.
+        stack = []
+        for node in reversed(self.nodes):
+            if node is None:
+                stack.append(leafs.pop())
+            else:
+                kind, arg = node
+                if issubclass(kind, list):
+                    stack.append([stack.pop() for _ in range(arg)])
+                else:
+                    stack.append({key: stack.pop() for key in arg})
+        return stack[0]
+
+    def flatten_up_to(self, tree: Any) -> list:
+        """Return the subtrees of tree at the positions of the leafs in this spec.
+
+        This is equivalent to ``[get_tree(tree, mulidx) for mulidx in spec.mulidxs]``,
+        but it visits the tree only once.
+        Unlike ``flatten``, the tree may have more structure than this spec.
+
+        Raises
+        ------
+        KeyError, IndexError, TypeError
+            When an element of the spec is not present in the tree.
+        """
+        leafs = []
+        stack = [tree]
+        for node in self.nodes:
+            subtree = stack.pop()
+            if node is None:
+                leafs.append(subtree)
+            else:
+                kind, arg = node
+                if issubclass(kind, list):
+                    stack.extend(subtree[index] for index in reversed(range(arg)))
+                else:
+                    stack.extend(subtree[key] for key in reversed(arg))
+        return leafs
+
+    def flatten(self, *trees: Any) -> list | None:
+        """Return the leafs of one or more trees, or None if their structure is different.
+
+        Parameters
+        ----------
+        trees
+            One or more trees whose common structure, as defined by ``iterate_tree``,
+            is expected to be equal to this spec.
+            The order of the dictionary keys in the first tree must also match.
+
+        Returns
+        -------
+        leafs
+            When one tree is given, a list of leafs.
+            When multiple trees are given, a list with a tuple of corresponding leafs
+            for each leaf position.
+            None is returned when the trees do not match this spec.
+        """
+        leafs = []
+        stack = [trees]
+        for node in self.nodes:
+            subtrees = stack.pop()
+            if node is None:
+                if _get_children(subtrees) is not None:
+                    return None
+                leafs.append(subtrees)
+                continue
+            kind, arg = node
+            first = subtrees[0]
+            if type(first) is not kind:
+                return None
+            if issubclass(kind, list):
+                if len(first) != arg:
+                    return None
+                for subtree in subtrees[1:]:
+                    if type(subtree) is not kind or len(subtree) != arg:
+                        return None
+                stack.extend(reversed(list(zip(*subtrees, strict=True))))
+            else:
+                if tuple(first) != arg:
+                    return None
+                keys = first.keys()
+                for subtree in subtrees[1:]:
+                    if type(subtree) is not kind or subtree.keys() != keys:
+                        return None
+                stack.extend(tuple(subtree[key] for subtree in subtrees) for key in reversed(arg))
+        if len(trees) == 1:
+            return [leaf for (leaf,) in leafs]
+        return leafs
+
+
+@lru_cache(maxsize=256)
+def _get_mulidxs(spec: TreeSpec) -> tuple[tuple, ...]:
+    """Compute the mulidx of each leaf in a spec (cached)."""
+    return tuple(mulidx for mulidx, _ in iterate_tree(spec.unflatten(range(spec.num_leafs))))
@@ -26,24 +26,30 @@ as a base class.
 As a result, WaitFuture instances can also be used as dependencies.
 """
 
-from collections.abc import Callable, Collection
-from concurrent.futures import Future
-from threading import Lock
+import weakref
+from collections import deque
+from collections.abc import Callable, Collection, Iterable
+from concurrent.futures import Executor, Future
+from threading import Lock, local
 
 import attrs
 
-__all__ = ("WaitFuture", "WaitGraph")
+from .lightfuture import LightFuture
 
+__all__ = ("WaitFuture", "WaitGraph", "PartFuture", "ScatterNode", "scatter")
 
-class WaitFuture(Future):
+
+class WaitFuture(LightFuture):
     """A future Waiting for other futures to finish.
 
     Users should not create instances manually.
     Use `WaitGraph.submit` instead.
     """
 
+    __slots__ = ("_digest", "_dependencies", "_countdown")
     _digest: Callable
-    _dependencies: tuple[Future]
+    _dependencies: tuple[Future] | None
+    _countdown: list[bool]
 
     def __init__(self, dependencies: Collection[Future], digest=None):
         """Initialize a WaitFuture.
@@ -61,13 +67,27 @@ class WaitFuture(Future):
             raise TypeError("All dependencies must be Future instances.")
         self._digest = digest
         self._dependencies = tuple(dependencies)
+        self._countdown = []
 
     def set_state(self):
         """Call Future.set_result with the outcome of the digest function.
 
         This should not be called by users.
         It is called by WaitGraph after all dependencies have finished.
+        Nothing happens if the wait_future was cancelled.
+        If the digest function raises an exception, it is set on the wait_future.
+        Afterwards, the references to the dependencies and the digest function are dropped.
         """
+        try:
+            if self.set_running_or_notify_cancel():
+                self._set_outcome()
+        finally:
+            # Release the dependencies, which are no longer needed.
+            self._digest = None
+            self._dependencies = None
+
+    def _set_outcome(self):
+        """Set the result or exception, based on the outcome of the dependencies."""
         results = []
         for future in self._dependencies:
             if future.cancelled():
@@ -80,7 +100,49 @@ class WaitFuture(Future):
                 else:
                     self.set_exception(exc)
                     return
-        self.set_result(None if self._digest is None else self._digest(*results))
+        if self._digest is None:
+            self.set_result(None)
+        else:
+            try:
+                result = self._digest(*results)
+            # Any error raised by the digest function becomes the outcome of the wait future.
+            except Exception as exc:  # noqa: BLE001
+                self.set_exception(exc)
+            else:
+                self.set_result(result)
+
+
+# Wait futures to be finished in the cascade running in the current thread, if any.
+_cascade = local()
+
+
+def _run_cascade(wait_futures: list[WaitFuture]):
+    """Finish wait_futures, and all wait_futures that can be finished as a consequence.
+
+    Finishing a wait_future triggers its done callbacks, which may finish other wait_futures.
+    Instead of recursing, such a nested call appends the wait_futures to the queue
+    of the cascade already running in the same thread.
+    Hence, the stack depth is bounded, no matter how long chains of wait_futures are.
+    """
+    queue = getattr(_cascade, "queue", None)
+    if queue is not None:
+        queue.extend(wait_futures)
+        return
+    queue = deque(wait_futures)
+    _cascade.queue = queue
+    try:
+        while len(queue) > 0:
+            queue.popleft().set_state()
+    finally:
+        _cascade.queue = None
+
+
+NUM_STRIPES = 64
+
+
+def _new_stripes() -> tuple[tuple[Lock, dict], ...]:
+    """Create the locks and dictionaries of a WaitGraph."""
+    return tuple((Lock(), {}) for _ in range(NUM_STRIPES))
 
 
 @attrs.define
@@ -88,25 +150,44 @@ class WaitGraph:
     """A Waiter used to detect when dependencies of one or more wait_futures have finished.
 
     Internally, the directed acyclic graph (DAG) of unfinished wait_futures and their dependencies
-    are represented by two dictionaries. As soon as futures finish, they are removed from the
-    internals to minimize memory consumption.
+    is represented by a map from each dependency to the wait_futures waiting for it,
+    and by a countdown in each wait_future.
+    As soon as futures finish, they are removed from the internals to minimize memory consumption.
+
+    Attributes
+    ----------
+    dispatch
+        An optional executor in which wait_futures are finished (and digest functions executed),
+        to keep cascades of finishing wait_futures off the threads of the dependencies.
+        When not given, wait_futures are finished in the thread of their last dependency.
 
     Internal attributes
     -------------------
-    _lock
-        A lock that is set when modifying the _before and _after attributes.
-    _before
-        A map from a wait_future to a set of dependency futures.
-        (Finished wait_futures are removed.)
-    _after
-        A map from a dependency future to all wait_futures waiting for
-        the dependency to complete.
+    _stripes
+        The map from a dependency future to all wait_futures waiting for the dependency
+        to complete, split into stripes by the hash of the dependency.
+        Each stripe has its own lock, such that threads finishing different dependencies
+        rarely wait for each other.
         (Finished dependencies are removed.)
+
+    Notes
+    -----
+    The countdown of a wait_future is a list with one item per (unique) dependency,
+    of which only the first item is True.
+    Each finished dependency pops one item, which is atomic without locking.
+    The dependency that pops True is the last one and finishes the wait_future.
+
+    Only one done callback is added to each dependency, when it is registered for the first time,
+    no matter how many wait_futures depend on it.
+
+    Finishing a wait_future may finish other wait_futures waiting for it, and so on.
+    Such cascades are executed iteratively, so they are not limited by the recursion depth.
     """
 
-    _lock: Lock = attrs.field(init=False, default=attrs.Factory(Lock))
-    _before: dict[WaitFuture, set[Future]] = attrs.field(init=False, default=attrs.Factory(dict))
-    _after: dict[Future, set[WaitFuture]] = attrs.field(init=False, default=attrs.Factory(dict))
+    dispatch: Executor | None = attrs.field(default=None, kw_only=True)
+    _stripes: tuple[tuple[Lock, dict[Future, list[WaitFuture]]], ...] = attrs.field(
+        init=False, default=attrs.Factory(_new_stripes)
+    )
 
     def submit(
         self, dependencies: Collection[Future], digest: Callable | None = None
@@ -124,7 +205,8 @@ class WaitGraph:
         digest
             A digest function, taking as arguments the results of the dependencies.
             When given, the result of the wait_future is the return value of the digest function.
-            The digest function is executed in the thread of the last finishing dependency.
+            The digest function is executed in the thread of the last finishing dependency,
+            or by the dispatch executor if it is set.
             It is not executed when one of the dependency futures raises and exception.
             When digest is not provided, the result of the wait_future is None.
 
@@ -138,23 +220,81 @@ class WaitGraph:
         if len(dependencies) == 0:
             wait_future.set_state()
         else:
-            self._register(wait_future, dependencies)
-            for future in set(dependencies):
+            for future in self._register(wait_future, set(dependencies)):
                 future.add_done_callback(self._handle_done_waiting)
         return wait_future
 
-    def _handle_done_waiting(self, future: Future):
-        """Update the wait_futures of which all dependencies have finished."""
-        for done_wait_future in self._unregister(future):
-            done_wait_future.set_state()
+    def submit_many(
+        self, batch: Iterable[tuple[Collection[Future], Callable | None]]
+    ) -> list[WaitFuture]:
+        """Create and register a batch of new wait_futures.
 
-    def _register(self, wait_future: WaitFuture, dependencies: Collection[Future]):
-        """Register a new wait_future and its dependencies (thread-safe)."""
-        with self._lock:
+        This has the same effect as calling ``submit`` for every item in the batch,
+        but each stripe lock is acquired only once for the whole batch.
+
+        Parameters
+        ----------
+        batch
+            An iterable of ``(dependencies, digest)`` tuples,
+            see ``submit`` for the meaning of these arguments.
+
+        Returns
+        -------
+        wait_futures
+            A list of WaitFuture instances, in the same order as the batch.
+        """
+        wait_futures = []
+        ready_wait_futures = []
+        stripe_edges = {}
+        for dependencies, digest in batch:
+            wait_future = WaitFuture(dependencies, digest)
+            wait_futures.append(wait_future)
+            if len(dependencies) == 0:
+                ready_wait_futures.append(wait_future)
+                continue
             before = set(dependencies)
-            self._before[wait_future] = before
+            wait_future._countdown = [True] + [False] * (len(before) - 1)
             for future in before:
-                self._after.setdefault(future, set()).add(wait_future)
+                stripe_edges.setdefault(hash(future) % NUM_STRIPES, []).append(
+                    (future, wait_future)
+                )
+        new_futures = []
+        for istripe, edges in stripe_edges.items():
+            lock, after = self._stripes[istripe]
+            with lock:
+                for future, wait_future in edges:
+                    _add_edge(after, future, wait_future, new_futures)
+        for future in new_futures:
+            future.add_done_callback(self._handle_done_waiting)
+        for wait_future in ready_wait_futures:
+            wait_future.set_state()
+        return wait_futures
+
+    def _handle_done_waiting(self, future: Future):
+        """Update the wait_futures of which all dependencies have finished."""
+        done_wait_futures = self._unregister(future)
+        if len(done_wait_futures) > 0:
+            if self.dispatch is None:
+                _run_cascade(done_wait_futures)
+            else:
+                self.dispatch.submit(_run_cascade, done_wait_futures)
+
+    def _register(self, wait_future: WaitFuture, before: set[Future]) -> list[Future]:
+        """Register a new wait_future and its unique dependencies (thread-safe).
+
+        Returns
+        -------
+        new_futures
+            Dependencies that were not registered yet and still need a done callback.
+            There is at most one callback per dependency, which unregisters it.
+        """
+        wait_future._countdown = [True] + [False] * (len(before) - 1)
+        new_futures = []
+        for future in before:
+            lock, after = self._stripes[hash(future) % NUM_STRIPES]
+            with lock:
+                _add_edge(after, future, wait_future, new_futures)
+        return new_futures
 
     def _unregister(self, future: Future):
         """Unregister a (finished) future (thread-safe).
@@ -169,18 +309,169 @@ class WaitGraph:
         done_wait_futures
             A list of wait_futures whose dependencies have all finished.
         """
-        done_wait_futures = []
+        lock, after = self._stripes[hash(future) % NUM_STRIPES]
+        with lock:
+            wait_futures = after.pop(future)
+        return [wait_future for wait_future in wait_futures if wait_future._countdown.pop()]
+
+
+def _add_edge(
+    after: dict[Future, list[WaitFuture]],
+    future: Future,
+    wait_future: WaitFuture,
+    new_futures: list[Future],
+):
+    """Add a wait_future to those waiting for a future, in a stripe of a WaitGraph.
+
+    The future is appended to new_futures if it had no waiting wait_futures yet.
+    (The lock of the stripe must be held by the caller.)
+    """
+    wait_futures = after.get(future)
+    if wait_futures is None:
+        after[future] = [wait_future]
+        new_futures.append(future)
+    else:
+        wait_futures.append(wait_future)
+
+
+# Marker for parts that were handed over to a part future that no longer exists.
+_RELEASED = object()
+
+
+class PartFuture(LightFuture):
+    """A future for one part of the result of another future, created by a ``ScatterNode``.
+
+    Users should not create instances manually.
+    """
+
+    __slots__ = ("_node",)
+
+    def __init__(self, node: "ScatterNode | None" = None):
+        super().__init__()
+        self._node = node
+
+    @property
+    def source(self) -> Future | None:
+        """The future whose result contains this part, or None when it has finished."""
+        node = self._node
+        return None if node is None else node.source
+
+
+class ScatterNode:
+    """Distribute the result of one future over part futures, which are created on demand.
+
+    Only one callback is added to the given future, no matter how many parts are requested.
+    When it finishes, the result is split in a single call and all part futures created
+    so far are set at once.
+    Part futures requested afterwards are finished immediately.
+    Until then, the original future is available as the ``source`` attribute.
+
+    Each part is handed over to its future and is no longer kept by the node.
+    After the split, the node only holds weak references to the part futures,
+    such that parts are freed as soon as their futures are no longer used.
+    Requesting a part again after its future was discarded gives a future
+    with a ``RuntimeError``.
+    """
+
+    def __init__(self, future: Future, split: Callable, part_class: type = PartFuture):
+        """Initialize a ScatterNode.
+
+        Parameters
+        ----------
+        future
+            The future whose result is to be split.
+        split
+            A function taking the result of the future and returning a list of parts.
+            If it raises an exception, all part futures receive that exception.
+        part_class
+            The class of the part futures, a subclass of ``PartFuture``.
+        """
+        self.source = future
+        self._split = split
+        self._part_class = part_class
+        self._lock = Lock()
+        self._part_futures = {}
+        self._done = False
+        self._cancelled = False
+        self._exception = None
+        self._parts = None
+        future.add_done_callback(self._handle_done)
+
+    def get_future(self, index: int) -> Future:
+        """Return the future of one part, creating it if needed (thread-safe).
+
+        When the original future raises an exception, the part future raises it too.
+        When the original future is cancelled, the part future is cancelled as well.
+        """
         with self._lock:
-            wait_futures = self._after.pop(future, None)
-            # This method can be called multiple times for the same future.
-            # When that future is waited for by multiple wait_futures,
-            # the callback is added several times.
-            # Hence, it must be checked if wait_futures is None.
-            if wait_futures is not None:
-                for wait_future in wait_futures:
-                    before = self._before[wait_future]
-                    before.remove(future)
-                    if len(before) == 0:
-                        done_wait_futures.append(wait_future)
-                        del self._before[wait_future]
-        return done_wait_futures
+            part_future = self._part_futures.get(index)
+            if part_future is not None:
+                return part_future
+            part_future = self._part_class(self)
+            self._part_futures[index] = part_future
+            done = self._done
+        if done:
+            self._set_state(index, part_future)
+        return part_future
+
+    def _handle_done(self, future: Future):
+        """Split the result and update all part futures created so far."""
+        self.source = None
+        if future.cancelled():
+            self._cancelled = True
+        else:
+            self._exception = future.exception()
+            if self._exception is None:
+                try:
+                    self._parts = dict(enumerate(self._split(future.result())))
+                # Any error raised by split is passed on to the part futures.
+                except Exception as exc:  # noqa: BLE001
+                    self._exception = exc
+        with self._lock:
+            self._done = True
+            part_futures = list(self._part_futures.items())
+            self._part_futures = weakref.WeakValueDictionary(self._part_futures)
+        for index, part_future in part_futures:
+            self._set_state(index, part_future)
+
+    def _set_state(self, index: int, part_future: Future):
+        """Finish a part future, after the original future has finished."""
+        # The part is released by the node, also when the part future was cancelled.
+        part = None if self._parts is None else self._parts.pop(index, _RELEASED)
+        part_future._node = None
+        if self._cancelled:
+            part_future.cancel()
+        # Parts cancelled by the user are skipped.
+        elif part_future.set_running_or_notify_cancel():
+            if self._exception is not None:
+                part_future.set_exception(self._exception)
+            elif part is _RELEASED:
+                part_future.set_exception(
+                    RuntimeError(f"Part {index} was released together with its previous future.")
+                )
+            else:
+                part_future.set_result(part)
+
+
+def scatter(future: Future, split: Callable, size: int) -> list[Future]:
+    """Create futures that each receive a part of the result of another future.
+
+    See ``ScatterNode`` for details.
+
+    Parameters
+    ----------
+    future
+        The future whose result is to be split.
+    split
+        A function taking the result of the future and returning a list of parts.
+        If it raises an exception, all part futures receive that exception.
+    size
+        The number of parts returned by split.
+
+    Returns
+    -------
+    part_futures
+        A list of futures, one for each part.
+    """
+    node = ScatterNode(future, split)
+    return [node.get_future(index) for index in range(size)]
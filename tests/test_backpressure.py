@@ -0,0 +1,91 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.backpressure."""
+
+from threading import Event, Thread
+
+import pytest
+
+from parman.backpressure import InflightLimit
+
+
+def test_no_limits():
+    limit = InflightLimit()
+    assert not limit.active
+    for _ in range(100):
+        assert limit.acquire(1, 10**9)
+    assert limit.count == 100
+
+
+def test_max_count():
+    limit = InflightLimit(max_count=2)
+    assert limit.active
+    assert limit.acquire()
+    assert limit.acquire()
+    assert not limit.acquire(timeout=0.01)
+    limit.release()
+    assert limit.acquire(timeout=0.01)
+    assert limit.count == 2
+
+
+def test_max_nbytes():
+    limit = InflightLimit(max_nbytes=100)
+    assert limit.acquire(1, 60)
+    assert not limit.acquire(1, 60, timeout=0.01)
+    assert limit.acquire(1, 40)
+    limit.release(1, 60)
+    assert limit.nbytes == 40
+    assert not limit.acquire(1, 61, timeout=0.01)
+    assert limit.acquire(1, 60)
+
+
+def test_oversized():
+    limit = InflightLimit(max_count=2, max_nbytes=100)
+    # Requests are always admitted when nothing is in flight.
+    assert limit.acquire(5, 1000)
+    assert not limit.acquire(timeout=0.01)
+    limit.release(5, 1000)
+    assert limit.count == 0
+    assert limit.nbytes == 0
+
+
+def test_blocking():
+    limit = InflightLimit(max_count=1)
+    limit.acquire()
+    acquired = Event()
+
+    def target():
+        limit.acquire()
+        acquired.set()
+
+    thread = Thread(target=target)
+    thread.start()
+    assert not acquired.wait(0.05)
+    limit.release()
+    assert acquired.wait(5)
+    thread.join()
+    assert limit.count == 1
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        InflightLimit(max_count=0)
+    with pytest.raises(ValueError):
+        InflightLimit(max_nbytes=-1)
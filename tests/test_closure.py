@@ -0,0 +1,223 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.closure."""
+
+import gc
+import inspect
+import pickle
+from concurrent.futures import Future
+
+import attrs
+import numpy as np
+import pytest
+
+from parman.closure import (
+    _CALL_PLANS,
+    _PAYLOADS,
+    Closure,
+    _get_call_plan,
+    _pack_metafunc,
+    register_immutable,
+    snapshot_leaf,
+)
+from parman.metafunc import MinimalMetaFunc
+
+
+def func_simple(a: int, b: int = 2) -> int:
+    return a + b
+
+
+def func_varargs(a: int, *args: tuple, c: int = 3, **kwargs: dict) -> int:
+    return a + sum(args) + c + sum(kwargs.values())
+
+
+def func_kwonly(a: int, /, b: int, *, c: int = 3) -> int:
+    return a + b + c
+
+
+@pytest.mark.parametrize(
+    ("function", "args", "kwargs"),
+    [
+        (func_simple, [1], {}),
+        (func_simple, [1, 5], {}),
+        (func_simple, [], {"b": 5, "a": 1}),
+        (func_varargs, [1], {}),
+        (func_varargs, [1, 2, 3], {"d": 4, "c": 5}),
+        (func_kwonly, [1, 2], {}),
+        (func_kwonly, [1], {"c": 4, "b": 2}),
+    ],
+)
+def test_get_parameters(function, args, kwargs):
+    closure = Closure(MinimalMetaFunc(function), args, kwargs)
+    bound_arguments = inspect.signature(function).bind(*args, **kwargs)
+    bound_arguments.apply_defaults()
+    parameters = closure.get_parameters()
+    assert parameters == bound_arguments.arguments
+    assert list(parameters) == list(bound_arguments.arguments)
+    assert closure.validated_call() == function(*args, **kwargs)
+
+
+def test_get_parameters_invalid():
+    metafunc = MinimalMetaFunc(func_simple)
+    with pytest.raises(TypeError, match="missing a required argument: 'a'"):
+        Closure(metafunc, [], {"b": 1}).get_parameters()
+    with pytest.raises(TypeError, match="too many positional arguments"):
+        Closure(metafunc, [1, 2, 3]).get_parameters()
+    with pytest.raises(TypeError, match="parameters"):
+        Closure(metafunc, ["foo"]).validated_call()
+
+
+def test_call_plan_cache():
+    metafunc = MinimalMetaFunc(func_simple)
+    plan = _get_call_plan(metafunc, [1], {})
+    assert _get_call_plan(metafunc, [3], {}) is plan
+    assert _get_call_plan(metafunc, [3], {"b": 1}) is not plan
+    assert _get_call_plan(MinimalMetaFunc(func_simple), [3], {}) is not plan
+    key = id(metafunc)
+    assert key in _CALL_PLANS
+    del metafunc
+    gc.collect()
+    assert key not in _CALL_PLANS
+
+
+def test_validated_call_single_mock():
+    calls = []
+
+    def mock(a, b=2):
+        calls.append((a, b))
+        return 0
+
+    closure = Closure(MinimalMetaFunc(func_simple, mock), [1], {"b": 5})
+    assert closure.validated_call() == 6
+    assert calls == [(1, 5)]
+
+
+@attrs.frozen
+class FrozenPoint:
+    x: float = attrs.field()
+    y: float = attrs.field()
+
+
+@attrs.define
+class MutablePoint:
+    x: float = attrs.field()
+    y: float = attrs.field()
+
+
+@register_immutable
+class Immutable:
+    pass
+
+
+def test_snapshot_leaf_immutable():
+    for leaf in None, True, 1, 1.5, 1j, "a", b"a", range(3), Future(), FrozenPoint(1, 2):
+        assert snapshot_leaf(leaf) is leaf
+    leaf = Immutable()
+    assert snapshot_leaf(leaf) is leaf
+
+
+def test_snapshot_leaf_mutable():
+    leaf = MutablePoint(1, 2)
+    snapshot = snapshot_leaf(leaf)
+    assert snapshot is not leaf
+    assert snapshot == leaf
+    leaf = (1, [2])
+    snapshot = snapshot_leaf(leaf)
+    assert snapshot == leaf
+    assert snapshot[1] is not leaf[1]
+
+
+def test_snapshot_leaf_array():
+    array = np.arange(5.0)
+    snapshot = snapshot_leaf(array)
+    assert snapshot is not array
+    assert not snapshot.flags.writeable
+    assert array.flags.writeable
+    assert (snapshot == array).all()
+    array[0] = 10.0
+    assert snapshot[0] == 0.0
+    # A read-only snapshot is not copied again.
+    assert snapshot_leaf(snapshot) is snapshot
+    assert snapshot_leaf(snapshot[1:]).base is snapshot
+
+
+def test_snapshot_leaf_array_view():
+    array = np.arange(5.0)
+    view = array[1:]
+    view.flags.writeable = False
+    snapshot = snapshot_leaf(view)
+    assert snapshot is not view
+    array[1] = 10.0
+    assert snapshot[0] == 1.0
+
+
+def test_snapshot_leaf_array_object():
+    array = np.array([[1], [2], None], dtype=object)[:2]
+    snapshot = snapshot_leaf(array)
+    assert not snapshot.flags.writeable
+    array[0].append(3)
+    assert snapshot[0] == [1]
+
+
+def test_closure_snapshot_array():
+    array = np.arange(5.0)
+    point = FrozenPoint(1, 2)
+    closure = Closure(MinimalMetaFunc(np.sum), [[array]], {"initial": point})
+    snapshot = closure.args[0][0]
+    assert snapshot is not array
+    assert not snapshot.flags.writeable
+    assert closure.kwargs["initial"] is point
+    other = Closure(closure.metafunc, closure.args, closure.kwargs)
+    assert other.args[0][0] is snapshot
+
+
+def test_pickle_metafunc_registry():
+    closure = Closure(MinimalMetaFunc(func_simple), [1], {"b": [2]})
+    closure1 = pickle.loads(pickle.dumps(closure))
+    closure2 = pickle.loads(pickle.dumps(closure))
+    assert closure1 == closure
+    assert closure2 == closure
+    assert closure1.metafunc is not closure.metafunc
+    assert closure1.metafunc is closure2.metafunc
+    assert closure1.kwargs["b"] is not closure2.kwargs["b"]
+    other = pickle.loads(pickle.dumps(Closure(MinimalMetaFunc(func_kwonly), [1, 2])))
+    assert other.metafunc is not closure1.metafunc
+    assert other.validated_call() == 6
+
+
+def test_pickle_metafunc_once():
+    metafunc = MinimalMetaFunc(func_simple)
+    payload = _pack_metafunc(metafunc)
+    assert _pack_metafunc(metafunc) is payload
+    # The pickled metafunc is shared by all pickled closures.
+    data = pickle.dumps([Closure(metafunc, [1]), Closure(metafunc, [2])])
+    assert data.count(payload) == 1
+    key = id(metafunc)
+    del metafunc
+    gc.collect()
+    assert key not in _PAYLOADS
+
+
+def test_estimate_nbytes():
+    array = np.zeros(1000)
+    closure = Closure(MinimalMetaFunc(func_simple), [array], {"b": Future()})
+    assert closure.estimate_nbytes() == 8000
+    closure = Closure(MinimalMetaFunc(func_simple), [b"x" * 1000], {"b": [1, 2]})
+    assert closure.estimate_nbytes() > 1000
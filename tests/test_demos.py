@@ -84,6 +84,8 @@ def test_demc_parman(tmp_path: Path):
         ("processes", False, True),
         ("processes", True, False),
         ("processes", True, True),
+        ("asyncio", False, False),
+        ("asyncio", True, True),
         ("parsl-local", False, False),
         ("parsl-local", False, True),
         ("parsl-local", True, False),
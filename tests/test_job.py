@@ -19,13 +19,20 @@
 # --
 """Unit tests for parman.job."""
 
+import asyncio
 import os
+import pickle
 import stat
+import subprocess
+import threading
+import time
 from pathlib import Path
 
 import pytest
 
-from parman.job import JobFactory, strip_line, write_sh_env
+import parman.job
+from parman.job import JobFactory, compile_jobinfo, strip_line, wait_process, write_sh_env
+from parman.runners.asyncio import AsyncioRunner
 
 
 def setup_jobfactory(root: Path, jobinfo: str, run: str) -> JobFactory:
@@ -212,3 +219,139 @@ def test_path(tmp_path: Path):
     closure = job(template_path, "sample", some_input=Path("some_input.txt"))
     result = closure.validated_call()
     assert result == Path("sample/some_output.txt")
+
+
+def test_compile_jobinfo(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(parman.job, "JOBINFO_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(parman.job, "_JOBINFO_CODES", {})
+    code = compile_jobinfo(PATH_JOBINFO, "jobinfo.py")
+    assert compile_jobinfo(PATH_JOBINFO, "jobinfo.py") is code
+    assert compile_jobinfo(PATH_JOBINFO, "other/jobinfo.py") is not code
+    paths = sorted((tmp_path / "cache").iterdir())
+    assert len(paths) == 2
+    assert all(path.suffix == ".marshal" for path in paths)
+    # Load from the disk cache, as in a new process.
+    monkeypatch.setattr(parman.job, "_JOBINFO_CODES", {})
+    assert compile_jobinfo(PATH_JOBINFO, "jobinfo.py") == code
+    # Corrupt files are ignored.
+    for path in paths:
+        path.write_bytes(b"corrupt")
+    monkeypatch.setattr(parman.job, "_JOBINFO_CODES", {})
+    assert compile_jobinfo(PATH_JOBINFO, "jobinfo.py") == code
+
+
+def test_jobfactory_reload(tmp_path: Path):
+    job, template_path = setup_jobfactory(tmp_path, PATH_JOBINFO, PATH_RUN)
+    closure1 = job(template_path, "sample1")
+    assert job(template_path, "sample2").metafunc is closure1.metafunc
+    with open(template_path / "jobinfo.py", "a") as f:
+        f.write("\nresources = {'foo': 'bar'}\n")
+    closure3 = job(template_path, "sample3")
+    assert closure3.metafunc is not closure1.metafunc
+    assert closure3.metafunc.resources == {"foo": "bar"}
+
+
+SLEEP_JOBINFO = """
+def mock(first: int, pause: float = 0.0) -> int:
+    return 42
+"""
+
+SLEEP_RUN = """\
+#!/usr/bin/env bash
+sleep $(python -c "import json; print(json.load(open('kwargs.json'))['pause'])")
+echo "to stdout"
+echo "to stderr" >&2
+python -c "import json; print(json.load(open('kwargs.json'))['first'], \\
+    file=open('result.json', 'w'))"
+"""
+
+FAIL_RUN = """\
+#!/usr/bin/env bash
+echo "failing" >&2
+exit 3
+"""
+
+
+def test_run_async(tmp_path: Path):
+    job, template_path = setup_jobfactory(tmp_path, SLEEP_JOBINFO, SLEEP_RUN)
+    job.run_async = True
+    closure = job(template_path, "sample", first=5)
+    assert closure.metafunc.is_async()
+    assert pickle.loads(pickle.dumps(closure.metafunc)).run_async
+    # Outside an event loop, validated_call runs the coroutine to completion.
+    assert closure.validated_call() == 5
+    workdir = tmp_path / "results" / "sample"
+    assert (workdir / "run.out").read_text() == "to stdout\n"
+    assert (workdir / "run.err").read_text() == "to stderr\n"
+    # The blocking and async jobs are cached separately.
+    job.run_async = False
+    assert not job(template_path, "other", first=5).metafunc.is_async()
+
+
+def test_run_async_failure(tmp_path: Path):
+    job, template_path = setup_jobfactory(tmp_path, SLEEP_JOBINFO, FAIL_RUN)
+    job.run_async = True
+    closure = job(template_path, "sample", first=5)
+    with pytest.raises(RuntimeError) as excinfo:
+        asyncio.run(closure.async_validated_call())
+    assert excinfo.value.__cause__.returncode == 3
+    assert (tmp_path / "results" / "sample" / "run.err").read_text() == "failing\n"
+
+
+def test_run_async_threads(tmp_path: Path):
+    """Waiting for many scripts does not need a thread per script.
+
+    Only the file I/O before and after each script uses the default executor of the loop.
+    """
+    job, template_path = setup_jobfactory(tmp_path, SLEEP_JOBINFO, SLEEP_RUN)
+    job.run_async = True
+    num_threads = threading.active_count()
+    max_io_threads = min(32, (os.cpu_count() or 1) + 4)
+    runner = AsyncioRunner()
+    try:
+        outcomes = [runner(job(template_path, f"sample{i}", first=i, pause=1.0)) for i in range(40)]
+        time.sleep(0.5)
+        assert threading.active_count() <= num_threads + 1 + max_io_threads
+    finally:
+        runner.shutdown()
+    assert [outcome.result() for outcome in outcomes] == list(range(40))
+
+
+@pytest.mark.parametrize("pidfd", [True, False])
+def test_wait_process(pidfd, monkeypatch):
+    if not pidfd:
+        monkeypatch.delattr(os, "pidfd_open", raising=False)
+    process = subprocess.Popen("exit 2", shell=True)
+    assert asyncio.run(wait_process(process)) == 2
+
+
+def test_run_async_io_threads(tmp_path: Path, monkeypatch):
+    """The file I/O of an async job does not run in the thread of the event loop."""
+    job, template_path = setup_jobfactory(tmp_path, SLEEP_JOBINFO, SLEEP_RUN)
+    job.run_async = True
+    closure = job(template_path, "sample", first=5)
+    threads = []
+    prepare = parman.job.Job._prepare
+
+    def recording_prepare(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return prepare(*args, **kwargs)
+
+    monkeypatch.setattr(parman.job.Job, "_prepare", recording_prepare)
+    assert asyncio.run(closure.async_validated_call()) == 5
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+
+
+def test_wait_process_cancel():
+    process = subprocess.Popen(["sleep", "10"])
+
+    async def main():
+        task = asyncio.create_task(wait_process(process))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert process.wait(timeout=5) != 0
@@ -0,0 +1,128 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.lightfuture."""
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Future,
+    InvalidStateError,
+    TimeoutError,
+    as_completed,
+    wait,
+)
+from threading import Timer
+
+import pytest
+
+from parman.lightfuture import LightFuture
+from parman.waitfuture import WaitGraph
+
+
+def test_lazy():
+    future = LightFuture()
+    assert isinstance(future, Future)
+    assert not hasattr(future, "__dict__") or len(future.__dict__) == 0
+    calls = []
+    future.add_done_callback(calls.append)
+    assert not future.done()
+    assert not future.running()
+    assert future.set_running_or_notify_cancel()
+    assert future.running()
+    future.set_result(3)
+    assert future.done()
+    assert future.result() == 3
+    assert future.exception() is None
+    assert calls == [future]
+    assert future._lazy_condition is None
+    assert future._lazy_waiters is None
+    assert future._done_callbacks is None
+    assert repr(future).endswith("state=finished returned int>")
+    with pytest.raises(InvalidStateError):
+        future.set_result(4)
+
+
+def test_add_done_callback_after_done():
+    future = LightFuture()
+    future.set_result(1)
+    calls = []
+    future.add_done_callback(calls.append)
+    assert calls == [future]
+
+
+def test_blocking_result():
+    future = LightFuture()
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0.01)
+    assert future._lazy_condition is not None
+    Timer(0.05, future.set_result, (5,)).start()
+    assert future.result(timeout=5) == 5
+
+
+def test_blocking_exception():
+    future = LightFuture()
+    Timer(0.05, future.set_exception, (ValueError("boom"),)).start()
+    assert isinstance(future.exception(timeout=5), ValueError)
+    with pytest.raises(ValueError):
+        future.result()
+    assert repr(future).endswith("state=finished raised ValueError>")
+
+
+def test_cancel():
+    future = LightFuture()
+    calls = []
+    future.add_done_callback(calls.append)
+    assert future.cancel()
+    assert future.cancel()
+    assert future.cancelled()
+    assert future.done()
+    assert calls == [future]
+    with pytest.raises(CancelledError):
+        future.result()
+    with pytest.raises(CancelledError):
+        future.exception()
+    assert not future.set_running_or_notify_cancel()
+    running = LightFuture()
+    running.set_running_or_notify_cancel()
+    assert not running.cancel()
+
+
+def test_wait_as_completed():
+    futures = [LightFuture() for _ in range(3)]
+    Timer(0.05, futures[1].set_result, (1,)).start()
+    done, not_done = wait(futures, timeout=5, return_when=FIRST_COMPLETED)
+    assert done == {futures[1]}
+    assert not_done == {futures[0], futures[2]}
+    Timer(0.05, futures[0].set_exception, (ValueError(),)).start()
+    futures[2].cancel()
+    Timer(0.1, futures[2].set_running_or_notify_cancel).start()
+    assert set(as_completed(futures, timeout=5)) == set(futures)
+    assert all(len(future._lazy_waiters) == 0 for future in futures)
+
+
+def test_wait_future_drops_dependencies():
+    wait_graph = WaitGraph()
+    f1 = Future()
+    wait_future = wait_graph.submit([f1], lambda x: 2 * x)
+    assert wait_future._dependencies == (f1,)
+    f1.set_result(3)
+    assert wait_future.result() == 6
+    assert wait_future._dependencies is None
+    assert wait_future._digest is None
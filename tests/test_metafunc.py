@@ -20,8 +20,11 @@
 """Unit tests for parman.metafunc."""
 
 import inspect
+from pathlib import Path
 
-from parman.metafunc import MinimalMetaFunc
+import pytest
+
+from parman.metafunc import MinimalMetaFunc, compile_validator, validate
 
 
 def compute_sum(first: int, second: int = 2) -> int:
@@ -41,3 +44,59 @@ def test_basics():
     assert metafunc.get_result_mock(1, 3) == 42
     assert metafunc.get_result_api(1, 3) is int
     assert metafunc.get_resources() == {}
+
+
+@pytest.mark.parametrize(
+    ("data", "type_api"),
+    [
+        (1, int),
+        (True, int),
+        (None, int | None),
+        (Path("a"), Path),
+        ([1, 2], list[int]),
+        (["1", "2"], list[int]),
+        ((1, 2), list[int]),
+        ({"a": 1.0, "b": 2}, dict[str, float]),
+        ((1, "a"), tuple[int, str]),
+        ({"a": [1, 2], "b": {"c": "d"}}, {"a": list[int], "b": {"c": str}}),
+        ({"b": {"c": "d"}, "a": [1, 2]}, {"a": list[int], "b": {"c": str}}),
+        ({"a": [1, 2], "b": {"c": "d"}}, {"a": [int, int], "b": dict[str, str]}),
+        ([[1, 2], {"x": 1.5}], [list[int], dict[str, float]]),
+    ],
+)
+def test_validate_valid(data, type_api):
+    validate("foo", data, type_api)
+
+
+@pytest.mark.parametrize(
+    ("data", "type_api", "message"),
+    [
+        (1, str, "foo at (): cannot type-check 1 with <class 'str'>"),
+        (["a"], list[int], "foo at (): ['a'] does not conform list[int]"),
+        ([1, "a"], [int, int], "foo at (1,): cannot type-check a with <class 'int'>"),
+        (
+            {"a": [1, 2]},
+            {"a": [int]},
+            "foo at ('a',): cannot type-check [1, 2] with [<class 'int'>]",
+        ),
+        ({"a": 1, "b": "c"}, {"a": int, "b": list[complex]}, "foo at ('b',): type list[complex]"),
+        (
+            {"b": "c", "a": 1},
+            {"a": int, "b": int},
+            "foo at ('b',): cannot type-check c with <class 'int'>",
+        ),
+    ],
+)
+def test_validate_invalid(data, type_api, message):
+    with pytest.raises(TypeError) as excinfo:
+        validate("foo", data, type_api)
+    assert str(excinfo.value).startswith(message)
+
+
+def test_compile_validator_cache():
+    validator = compile_validator({"a": list[int], "b": [str, float]})
+    assert compile_validator({"a": list[int], "b": [str, float]}) is validator
+    assert compile_validator({"a": list[int], "b": [str, int]}) is not validator
+    validator("foo", {"a": [1], "b": ["x", 2.0]})
+    with pytest.raises(TypeError):
+        validator("foo", {"a": [1], "b": ["x", "y"]})
@@ -0,0 +1,152 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.promise."""
+
+import pickle
+from concurrent.futures import Future
+
+import pytest
+
+from parman.promise import PromisedDict, PromisedList, promise_tree
+from parman.treeleaf import flatten, iterate_tree
+
+RESULT = {"a": [1, 2, {"b": 3}], "c": 4, "d": {}}
+RESULT_API = {"a": [int, int, {"b": int}], "c": int, "d": {}}
+
+
+def test_leaf():
+    future = Future()
+    promised = promise_tree(future, int)
+    assert isinstance(promised, Future)
+    future.set_result(5)
+    assert promised.result(timeout=1) == 5
+
+
+def test_structure():
+    future = Future()
+    promised = promise_tree(future, RESULT_API)
+    assert isinstance(promised, PromisedDict)
+    assert isinstance(promised["a"], PromisedList)
+    assert isinstance(promised["a"][2], PromisedDict)
+    assert list(promised) == ["a", "c", "d"]
+    assert len(promised["a"]) == 3
+    # No leaf futures are created until leafs are accessed.
+    assert len(promised._node._part_futures) == 0
+    leaf_future = promised["a"][1]
+    assert isinstance(leaf_future, Future)
+    assert promised["a"][1] is leaf_future
+    assert promised["a"][-2] is leaf_future
+    assert len(promised._node._part_futures) == 1
+    future.set_result(RESULT)
+    assert leaf_future.result(timeout=1) == 2
+    # Leafs accessed after completion are finished immediately.
+    assert promised["c"].done()
+    assert promised["c"].result() == 4
+    assert promised.get("c").result() == 4
+    assert promised["a"][2]["b"].result() == 3
+    assert len(promised._node._part_futures) == 3
+
+
+def test_iterate():
+    future = Future()
+    promised = promise_tree(future, RESULT_API)
+    future.set_result(RESULT)
+    leafs, spec = flatten(promised)
+    assert spec.mulidxs == flatten(RESULT)[1].mulidxs
+    assert all(isinstance(leaf, Future) for leaf in leafs)
+    assert [leaf.result() for leaf in leafs] == flatten(RESULT)[0]
+    assert all(isinstance(leaf, Future) for _, leaf in iterate_tree(promised))
+    assert all(isinstance(leaf, Future) for leaf in promised["a"][:2])
+    assert isinstance(list(promised.values())[1], Future)
+    assert all(isinstance(leaf, Future) for leaf in dict(promised["a"][2]).values())
+    assert all(isinstance(leaf, Future) for leaf in {**promised["a"][2]}.values())
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        lambda lst: lst.pop(0),
+        lambda lst: lst.insert(0, "x"),
+        lambda lst: lst.reverse(),
+        lambda lst: lst.__delitem__(0),
+        lambda lst: lst.clear(),
+    ],
+)
+def test_list_modify(operation):
+    future = Future()
+    promised = promise_tree(future, [int, int, int])
+    expected = [0, 1, 2]
+    operation(promised)
+    operation(expected)
+    future.set_result([0, 1, 2])
+    assert [item if isinstance(item, str) else item.result() for item in promised] == expected
+
+
+def test_list_setitem():
+    future = Future()
+    promised = promise_tree(future, [int, int, int])
+    promised[0] = 10
+    promised[-1] = 12
+    promised.append(13)
+    future.set_result([0, 1, 2])
+    assert promised[0] == 10
+    assert promised[1].result() == 1
+    assert promised[2] == 12
+    assert promised[3] == 13
+
+
+def test_dict_modify():
+    future = Future()
+    promised = promise_tree(future, {"a": int, "b": int, "c": int})
+    promised["a"] = 10
+    del promised["b"]
+    assert promised.setdefault("d", 13) == 13
+    future.set_result({"a": 0, "b": 1, "c": 2})
+    assert promised["a"] == 10
+    assert "b" not in promised
+    assert promised.pop("c").result() == 2
+    assert promised == {"a": 10, "d": 13}
+
+
+def test_pickle():
+    future = Future()
+    promised = promise_tree(future, {"a": [int]})
+    future.set_result({"a": [1]})
+    # Futures cannot be pickled, but the containers are reduced to plain lists and dicts.
+    assert promised.__reduce_ex__(pickle.HIGHEST_PROTOCOL)[0] is dict
+    assert promised["a"].__reduce_ex__(pickle.HIGHEST_PROTOCOL)[0] is list
+
+
+def test_exception():
+    future = Future()
+    promised = promise_tree(future, [int, int])
+    leaf_future = promised[0]
+    future.set_exception(ValueError("foo"))
+    assert isinstance(leaf_future.exception(), ValueError)
+    assert isinstance(promised[1].exception(), ValueError)
+
+
+def test_cancel():
+    future = Future()
+    promised = promise_tree(future, [int, int])
+    leaf_future = promised[0]
+    future.cancel()
+    assert leaf_future.cancelled()
+    assert promised[1].cancelled()
@@ -19,12 +19,27 @@
 # --
 """Unit tests for parman.runners."""
 
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gc
+import logging
+import os
+import random
+import threading
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Event, Lock, Thread
 from time import sleep
 
+import pytest
+
 from parman.closure import Closure
-from parman.metafunc import MetaFuncBase
+from parman.metafunc import MetaFuncBase, MinimalMetaFunc
+from parman.runners.asyncio import AsyncioRunner
 from parman.runners.concurrent import ConcurrentRunner
+from parman.runners.future import Completion
+from parman.runners.serial import SerialRunner
+from parman.spill import SpilledFuture, SpillStore
+from parman.trace import Tracer
 
 
 class KeepSleeping:
@@ -65,3 +80,574 @@ def test_result_wait_args():
             keep_sleeping.asleep = False
             runner.shutdown()
         assert outcome.result() == 10
+
+
+def wide_result(size: int) -> dict[str, list]:
+    return {"squares": [i * i for i in range(size)], "size": size}
+
+
+def wide_result_mock(size: int) -> dict[str, list]:
+    return {"squares": [0] * size, "size": 0}
+
+
+def test_wide_result():
+    runner = ConcurrentRunner()
+    try:
+        outcome = runner(Closure(MinimalMetaFunc(wide_result, wide_result_mock), [1000]))
+        assert len(outcome["squares"]) == 1000
+        assert [future.result() for future in outcome["squares"]] == [i * i for i in range(1000)]
+        assert outcome["size"].result() == 1000
+    finally:
+        runner.shutdown()
+
+
+@pytest.mark.parametrize(
+    ("executor_class", "snapshot"), [(ThreadPoolExecutor, True), (ProcessPoolExecutor, False)]
+)
+def test_unpack_data_copies(executor_class, snapshot):
+    future = Future()
+    result = {"a": [1, 2]}
+    future.set_result(result)
+    runner = ConcurrentRunner(executor=executor_class(max_workers=1))
+    try:
+        closure = Closure(MinimalMetaFunc(len), [{1, 2}, future], {"c": {3}})
+        unpacked = runner._unpack_data(closure)
+        # Arguments are snapshotted already and are not copied again.
+        assert unpacked.args[0] is closure.args[0]
+        assert unpacked.kwargs["c"] is closure.kwargs["c"]
+        # Results are only copied when the executor shares memory.
+        assert unpacked.args[1] == result
+        assert (unpacked.args[1]["a"] is not result["a"]) == snapshot
+    finally:
+        runner.shutdown()
+
+
+class PriorityMetaFunc(MetaFuncBase):
+    def __init__(self):
+        self.order = []
+        self.event = Event()
+
+    def __call__(self, name: str, priority: int) -> str:
+        self.order.append(name)
+        if name == "block":
+            self.event.wait()
+        return name
+
+    def get_result_mock(self, name: str, priority: int) -> str:
+        return ""
+
+    def get_resources(self, name: str, priority: int) -> dict:
+        return {"priority": priority}
+
+
+def test_schedule_priority():
+    metafunc = PriorityMetaFunc()
+    runner = ConcurrentRunner(
+        schedule=True,
+        executor=ThreadPoolExecutor(max_workers=1),
+        max_submitted=1,
+        critical_path=True,
+    )
+    try:
+        assert runner._scheduler.max_submitted == 1
+        assert runner._scheduler.critical_path
+        # The first closure occupies the executor, such that the others are queued.
+        outcomes = [runner(Closure(metafunc, ["block", 0]))]
+        while len(metafunc.order) == 0:
+            sleep(0.01)
+        outcomes.extend(
+            runner(Closure(metafunc, [name, priority])) for name, priority in [("a", 0), ("b", 1)]
+        )
+    finally:
+        metafunc.event.set()
+        runner.shutdown()
+    assert [outcome.result() for outcome in outcomes] == ["block", "a", "b"]
+    assert metafunc.order == ["block", "b", "a"]
+
+
+class ChainMetaFunc(MetaFuncBase):
+    def __init__(self):
+        self.order = []
+        self.event = Event()
+
+    def __call__(self, name: str, previous: str = "") -> str:
+        self.order.append(name)
+        if name == "block":
+            self.event.wait()
+        return name
+
+    def get_result_mock(self, name: str, previous: str = "") -> str:
+        return ""
+
+
+def test_schedule_critical_path():
+    metafunc = ChainMetaFunc()
+    runner = ConcurrentRunner(
+        schedule=True,
+        executor=ThreadPoolExecutor(max_workers=1),
+        max_submitted=1,
+        critical_path=True,
+    )
+    try:
+        # The first closure occupies the executor, such that the others are queued.
+        outcomes = [runner(Closure(metafunc, ["block"]))]
+        while len(metafunc.order) == 0:
+            sleep(0.01)
+        outcomes.append(runner(Closure(metafunc, ["leaf"])))
+        previous = ""
+        for index in range(4):
+            previous = runner(Closure(metafunc, [f"chain{index}", previous]))
+            outcomes.append(previous)
+        # The result futures passed as arguments are linked to the closures producing them.
+        ranks = {closure.args[0]: future._rank for future, closure in runner._pending.items()}
+    finally:
+        metafunc.event.set()
+        runner.shutdown()
+    assert ranks == {"block": 0, "leaf": 0, "chain0": 3, "chain1": 2, "chain2": 1, "chain3": 0}
+    assert [outcome.result() for outcome in outcomes[2:]] == [f"chain{i}" for i in range(4)]
+    # The start of the longest chain goes first, although the leaf was submitted earlier.
+    assert metafunc.order[:2] == ["block", "chain0"]
+
+
+class ResourceMetaFunc(MetaFuncBase):
+    def __call__(self, cores: int, mem_gb: int, duration: float, after: int = 0) -> int:
+        sleep(duration)
+        return cores
+
+    def get_result_mock(self, cores: int, mem_gb: int, duration: float, after: int = 0) -> int:
+        return 0
+
+    def get_resources(self, cores: int, mem_gb: int, duration: float, after: int = 0) -> dict:
+        return {"cores": cores, "mem_gb": mem_gb, "parsl_executors": "all"}
+
+
+class MockExecutor:
+    """Executor running every submission immediately in a thread, keeping track of resources."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.usage = {"cores": 0, "mem_gb": 0}
+        self.peak = dict(self.usage)
+        self.threads = []
+
+    def submit(self, func, closure):
+        resources = closure.get_resources()
+        with self.lock:
+            for key in self.usage:
+                self.usage[key] += resources[key]
+                self.peak[key] = max(self.peak[key], self.usage[key])
+        future = Future()
+        thread = Thread(target=self._run, args=(future, func, closure, resources))
+        self.threads.append(thread)
+        thread.start()
+        return future
+
+    def _run(self, future, func, closure, resources):
+        result = func(closure)
+        with self.lock:
+            for key in self.usage:
+                self.usage[key] -= resources[key]
+        future.set_result(result)
+
+    def shutdown(self):
+        for thread in self.threads:
+            thread.join()
+
+
+@pytest.mark.parametrize("num_submitters", [1, 3])
+def test_capacities(num_submitters):
+    rng = random.Random(num_submitters)
+    capacities = {"cores": 8, "mem_gb": 16}
+    executor = MockExecutor()
+    runner = ConcurrentRunner(
+        schedule=True,
+        executor=executor,
+        capacities=capacities,
+        num_submitters=num_submitters,
+    )
+    try:
+        metafunc = ResourceMetaFunc()
+        outcomes = []
+        for _ in range(50):
+            cores = rng.randrange(1, 9)
+            mem_gb = rng.randrange(0, 17)
+            duration = rng.uniform(0.001, 0.01)
+            args = [cores, mem_gb, duration]
+            # Some closures depend on earlier results.
+            if len(outcomes) > 0 and rng.random() < 0.3:
+                args.append(rng.choice(outcomes))
+            outcomes.append(runner(Closure(metafunc, args)))
+        with pytest.raises(ValueError):
+            runner(Closure(metafunc, [9, 0, 0.0]))
+    finally:
+        runner.shutdown()
+    assert all(outcome.done() for outcome in outcomes)
+    assert executor.peak["cores"] <= capacities["cores"]
+    assert executor.peak["mem_gb"] <= capacities["mem_gb"]
+    assert executor.peak["cores"] > 1
+    assert executor.usage == {"cores": 0, "mem_gb": 0}
+
+
+def test_capacities_without_schedule():
+    with pytest.raises(ValueError):
+        ConcurrentRunner(capacities={"cores": 1})
+
+
+class CountingMetaFunc(MetaFuncBase):
+    def __init__(self):
+        self.lock = Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, x: int, data: bytes) -> int:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        sleep(0.002)
+        with self.lock:
+            self.running -= 1
+        return x
+
+    def get_result_mock(self, x: int, data: bytes) -> int:
+        return 0
+
+
+@pytest.mark.parametrize("schedule", [True, False])
+@pytest.mark.parametrize("limits", [{"max_inflight": 4}, {"max_pending_bytes": 4000}])
+def test_max_inflight(schedule, limits):
+    executor = ThreadPoolExecutor(max_workers=8)
+    runner = ConcurrentRunner(schedule=schedule, executor=executor, **limits)
+    inflight = runner._scheduler._inflight if schedule else runner._inflight
+    metafunc = CountingMetaFunc()
+    peak = 0
+    try:
+        outcomes = []
+        for i in range(40):
+            outcomes.append(runner(Closure(metafunc, [i, b"x" * 900])))
+            peak = max(peak, inflight.count)
+            assert inflight.count <= 4
+            assert inflight.nbytes <= 4000
+    finally:
+        runner.shutdown()
+    assert [outcome.result() for outcome in outcomes] == list(range(40))
+    assert metafunc.peak <= 4
+    assert peak > 1
+    assert inflight.count == 0
+
+
+async def async_add(a: int, b: int) -> int:
+    await asyncio.sleep(0.01)
+    if a < 0:
+        raise ValueError("negative")
+    return a + b
+
+
+def sync_add(a: int, b: int) -> int:
+    sleep(0.01)
+    return a + b
+
+
+def add_mock(a: int, b: int) -> int:
+    return 0
+
+
+class AsyncMetaFunc(MetaFuncBase):
+    async def __call__(self, a: int) -> dict[str, int]:
+        await asyncio.sleep(0.01)
+        return {"a": a, "b": 2 * a}
+
+    def get_result_mock(self, a: int) -> dict[str, int]:
+        return {"a": 0, "b": 0}
+
+
+def test_is_async():
+    assert MinimalMetaFunc(async_add).is_async()
+    assert not MinimalMetaFunc(sync_add).is_async()
+    assert AsyncMetaFunc().is_async()
+    assert not MockMetaFunc().is_async()
+
+
+def test_serial_async():
+    runner = SerialRunner()
+    assert runner(Closure(MinimalMetaFunc(async_add, add_mock), [1, 2])) == 3
+    assert runner(Closure(AsyncMetaFunc(), [3])) == {"a": 3, "b": 6}
+
+
+@pytest.mark.parametrize("schedule", [True, False])
+@pytest.mark.parametrize("trace", [True, False])
+def test_asyncio_runner(schedule, trace):
+    tracer = Tracer() if trace else None
+    runner = AsyncioRunner(schedule=schedule, tracer=tracer)
+    async_metafunc = MinimalMetaFunc(async_add, add_mock)
+    sync_metafunc = MinimalMetaFunc(sync_add, add_mock)
+    try:
+        x = runner(Closure(async_metafunc, [1, 2]))
+        y = runner(Closure(sync_metafunc, [x, 3]))
+        z = runner(Closure(AsyncMetaFunc(), [y]))
+        w = runner(Closure(async_metafunc, [z["a"], z["b"]]))
+        error = runner(Closure(async_metafunc, [-1, 2]))
+        after_error = runner(Closure(async_metafunc, [error, 2]))
+    finally:
+        with pytest.raises(ValueError):
+            runner.shutdown()
+    assert w.result() == 18
+    assert isinstance(error.exception(), ValueError)
+    assert isinstance(after_error.exception(), ValueError)
+    assert runner._loop.is_closed()
+    if trace:
+        runs = [event for event in tracer.events if event.get("cat") == "run"]
+        assert len(runs) == 5
+        # x -> y -> z -> w (after_error is not executed)
+        assert sum(event["ph"] == "f" for event in tracer.events) == 3
+
+
+def test_asyncio_runner_concurrency():
+    """Many sleeping coroutines only need the thread of the event loop."""
+    num_threads = threading.active_count()
+    runner = AsyncioRunner()
+    metafunc = MinimalMetaFunc(async_add, add_mock)
+    try:
+        outcomes = [runner(Closure(metafunc, [i, 1])) for i in range(2000)]
+        assert threading.active_count() == num_threads + 1
+    finally:
+        runner.shutdown()
+    assert [outcome.result() for outcome in outcomes] == list(range(1, 2001))
+
+
+def test_asyncio_runner_no_blocking():
+    """Without scheduler, submitting a closure does not wait for its dependencies."""
+    runner = AsyncioRunner()
+    first = Future()
+    try:
+        second = runner(Closure(MinimalMetaFunc(async_add, add_mock), [first, 1]))
+        assert not second.done()
+        first.set_result(1)
+        assert second.result(timeout=5) == 2
+    finally:
+        runner.shutdown()
+
+
+class Blob:
+    """A result that supports weak references."""
+
+    def __init__(self, size: int):
+        self.data = b"x" * size
+
+
+def make_blob(size: int) -> Blob:
+    return Blob(size)
+
+
+def make_blob_mock(size: int) -> Blob:
+    return Blob(0)
+
+
+def blob_size(blob: Blob) -> int:
+    return len(blob.data)
+
+
+def blob_size_mock(blob: Blob) -> int:
+    return 0
+
+
+def make_bytes(size: int) -> bytes:
+    return b"x" * size
+
+
+def make_bytes_mock(size: int) -> bytes:
+    return b""
+
+
+def bytes_size(data: bytes) -> int:
+    return len(data)
+
+
+def bytes_size_mock(data: bytes) -> int:
+    return 0
+
+
+@pytest.mark.parametrize("schedule", [False, True])
+def test_release_results(schedule):
+    runner = ConcurrentRunner(executor=ThreadPoolExecutor(max_workers=2), schedule=schedule)
+    try:
+        blob = runner(Closure(MinimalMetaFunc(make_blob, make_blob_mock), [10]))
+        size = runner(Closure(MinimalMetaFunc(blob_size, blob_size_mock), [blob]))
+        reference = weakref.ref(blob.result())
+        assert size.result() == 10
+        del blob
+        gc.collect()
+        # Neither the runner nor the consumer holds on to the result.
+        assert reference() is None
+        assert len(runner._pending) == 0
+    finally:
+        runner.shutdown()
+
+
+def fail(size: int) -> int:
+    raise ValueError("Failed on purpose")
+
+
+def test_keep_failed_futures():
+    runner = ConcurrentRunner()
+    future = runner(Closure(MinimalMetaFunc(fail, blob_size_mock), [1]))
+    del future
+    # The exception is raised, even when the driver no longer holds the future.
+    with pytest.raises(ValueError):
+        runner.shutdown()
+
+
+@pytest.mark.parametrize("schedule", [False, True])
+def test_spill(tmp_path, schedule):
+    store = SpillStore(str(tmp_path), min_nbytes=1000)
+    runner = ConcurrentRunner(
+        executor=ThreadPoolExecutor(max_workers=2), schedule=schedule, spill=store
+    )
+    try:
+        data = runner(Closure(MinimalMetaFunc(make_bytes, make_bytes_mock), [2000]))
+        small = runner(Closure(MinimalMetaFunc(make_bytes, make_bytes_mock), [10]))
+        size = runner(Closure(MinimalMetaFunc(bytes_size, bytes_size_mock), [data]))
+        assert isinstance(data, SpilledFuture)
+        assert size.result() == 2000
+        assert data.result() == b"x" * 2000
+        assert small.result() == b"x" * 10
+    finally:
+        runner.shutdown()
+    assert len(os.listdir(tmp_path)) == 1
+    del data, small, size
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+def delayed(name: str, delay: float) -> dict[str, list]:
+    sleep(delay)
+    if name == "fail":
+        raise ValueError("Failed on purpose")
+    return {name: [1, 2]}
+
+
+def delayed_mock(name: str, delay: float) -> dict[str, list]:
+    return {name: [0, 0]}
+
+
+@pytest.mark.parametrize("schedule", [False, True])
+def test_as_completed_subset(schedule):
+    runner = ConcurrentRunner(executor=ThreadPoolExecutor(max_workers=3), schedule=schedule)
+    try:
+        metafunc = MinimalMetaFunc(delayed, delayed_mock)
+        first = Closure(metafunc, ["first", 0.0])
+        runner(first)
+        closures = [Closure(metafunc, [name, delay]) for name, delay in [("c", 0.3), ("b", 0.1)]]
+        for closure in closures:
+            runner(closure)
+        sleep(0.05)
+        # Closures finished before the call are included.
+        completions = list(runner.as_completed([first, *closures], timeout=5))
+        assert all(isinstance(completion, Completion) for completion in completions)
+        assert [completion.closure for completion in completions] == [first, *closures[::-1]]
+        # The results contain actual values, not futures.
+        assert completions[0].result() == {"first": [1, 2]}
+        assert completions[1].exception() is None
+    finally:
+        runner.shutdown()
+
+
+def test_as_completed_unknown():
+    runner = ConcurrentRunner()
+    closure = Closure(MinimalMetaFunc(delayed, delayed_mock), ["a", 0.0])
+    with pytest.raises(ValueError):
+        runner.as_completed([closure])
+    runner.shutdown()
+
+
+def test_as_completed_timeout():
+    runner = ConcurrentRunner()
+    try:
+        closure = Closure(MinimalMetaFunc(delayed, delayed_mock), ["a", 0.5])
+        runner(closure)
+        with pytest.raises(TimeoutError):
+            next(runner.as_completed([closure], timeout=0.01))
+        with pytest.raises(TimeoutError):
+            next(runner.as_completed(timeout=0.01))
+    finally:
+        runner.shutdown()
+
+
+@pytest.mark.parametrize("schedule", [False, True])
+def test_as_completed_adaptive(schedule):
+    runner = ConcurrentRunner(executor=ThreadPoolExecutor(max_workers=4), schedule=schedule)
+    metafunc = MinimalMetaFunc(delayed, delayed_mock)
+    try:
+        # The first closures are still pending when the iteration starts.
+        for index in range(4):
+            runner(Closure(metafunc, [f"n{index}", 0.3]))
+        names = []
+        # New closures are submitted while iterating, keeping all workers busy.
+        for completion in runner.as_completed(timeout=10):
+            (name,) = completion.result()
+            names.append(name)
+            if len(names) + 4 <= 20:
+                runner(Closure(metafunc, [f"n{len(names) + 3}", random.uniform(0.0, 0.02)]))
+        assert sorted(names) == sorted(f"n{index}" for index in range(20))
+        assert len(runner._streams) == 0
+    finally:
+        runner.shutdown()
+
+
+def test_as_completed_before_iteration():
+    runner = ConcurrentRunner()
+    try:
+        closure = Closure(MinimalMetaFunc(delayed, delayed_mock), ["a", 0.2])
+        runner(closure)
+        completions = runner.as_completed(timeout=5)
+        # The closure finishes before the iteration starts.
+        sleep(0.5)
+        assert [completion.closure for completion in completions] == [closure]
+        # An iterator that is never started is unregistered when it is discarded.
+        unused = runner.as_completed()
+        assert len(runner._streams) == 1
+        del unused
+        gc.collect()
+        assert len(runner._streams) == 0
+    finally:
+        runner.shutdown()
+
+
+def test_as_completed_failure():
+    runner = ConcurrentRunner()
+    closure = Closure(MinimalMetaFunc(delayed, delayed_mock), ["fail", 0.0])
+    runner(closure)
+    (completion,) = runner.as_completed([closure])
+    assert isinstance(completion.exception(), ValueError)
+    with pytest.raises(ValueError):
+        completion.result()
+    with pytest.raises(ValueError):
+        runner.shutdown()
+
+
+def test_on_result(caplog):
+    runner = ConcurrentRunner(executor=ThreadPoolExecutor(max_workers=2))
+    lock = Lock()
+    names = []
+
+    @runner.on_result
+    def record(completion):
+        with lock:
+            names.append(completion.closure.args[0])
+
+    def broken(completion):
+        raise RuntimeError("Broken callback")
+
+    runner.on_result(broken)
+    metafunc = MinimalMetaFunc(delayed, delayed_mock)
+    try:
+        with caplog.at_level(logging.ERROR):
+            for name in "abc":
+                runner(Closure(metafunc, [name, 0.0]))
+            list(runner.as_completed(timeout=5))
+        assert "Broken callback" in caplog.text
+        runner.remove_result_callback(broken)
+        runner.remove_result_callback(record)
+        runner(Closure(metafunc, ["d", 0.0]))
+    finally:
+        runner.shutdown()
+    assert sorted(names) == ["a", "b", "c"]
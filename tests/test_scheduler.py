@@ -20,8 +20,9 @@
 """Unit tests for parman.scheduler."""
 
 import random
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from functools import partial
+from threading import Event, Lock
 from time import sleep
 
 import pytest
@@ -69,6 +70,24 @@ def test_zero(pool):
         assert f.result() == 6
 
 
+def test_submit_many(pool):
+    with Scheduler(partial(pool.submit, func)) as scheduler:
+        f1 = pool.submit(func, 1, 0.1)
+        futures = scheduler.submit_many(
+            [([2, 0.1], {}, [f1]), ([3, 0.0], {}, None), ([4], {"t": 0.1}, [])]
+        )
+        futures.append(scheduler.submit_many([([5, 0.1], {}, [futures[0], f1])])[0])
+        assert [future.result() for future in futures] == [4, 6, 8, 10]
+        assert scheduler.submit_many([]) == []
+
+
+def test_submit_after_shutdown(pool):
+    scheduler = Scheduler(partial(pool.submit, func))
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit_many([([1, 0.1], {}, [])])
+
+
 def test_exception1(pool):
     with Scheduler(pool.submit) as scheduler:
         f1 = pool.submit(error_func, 1, 0.1)
@@ -125,6 +144,60 @@ def test_cancel3(pool):
         assert f1.result() == 2
 
 
+def record_submit(pool, order, name, event=None):
+    order.append(name)
+    if event is None:
+        return pool.submit(sleep, 0.01)
+    return pool.submit(event.wait)
+
+
+def test_priority():
+    event = Event()
+    order = []
+    with (
+        ThreadPoolExecutor(max_workers=1) as pool,
+        Scheduler(partial(record_submit, pool, order), max_submitted=1) as scheduler,
+    ):
+        # The first one occupies the only slot, such that the others are queued.
+        scheduler.submit(["block", event], {})
+        while len(order) == 0:
+            sleep(0.01)
+        futures = [
+            scheduler.submit([name], {}, None, priority)
+            for name, priority in [("a", 0), ("b", 2), ("c", 1), ("d", 2)]
+        ]
+        sleep(0.1)
+        assert order == ["block"]
+        event.set()
+        wait(futures)
+    assert order == ["block", "b", "d", "c", "a"]
+
+
+def test_critical_path():
+    event = Event()
+    order = []
+    with (
+        ThreadPoolExecutor(max_workers=1) as pool,
+        Scheduler(
+            partial(record_submit, pool, order), max_submitted=1, critical_path=True
+        ) as scheduler,
+    ):
+        scheduler.submit(["block", event], {})
+        while len(order) == 0:
+            sleep(0.01)
+        a, b, c = scheduler.submit_many([(["a"], {}, None), (["b"], {}, []), (["c"], {}, None)])
+        # Ranks of queued scheduled futures are updated when new work depends on them.
+        c1 = scheduler.submit(["c1"], {}, [c])
+        b1 = scheduler.submit(["b1"], {}, [b])
+        b2 = scheduler.submit(["b2"], {}, [b1, a])
+        # A higher priority takes precedence over the rank.
+        d = scheduler.submit(["d"], {}, None, 1)
+        assert (a._rank, b._rank, b1._rank, b2._rank, c._rank, c1._rank) == (1, 2, 1, 0, 1, 0)
+        event.set()
+        wait([b2, c1, d])
+    assert order == ["block", "d", "b", "c", "a", "b1", "c1", "b2"]
+
+
 @pytest.mark.parametrize("seed", range(3))
 @pytest.mark.parametrize("max_workers", [15, 45, 150])
 @pytest.mark.parametrize("executor_class", [ThreadPoolExecutor, ProcessPoolExecutor])
@@ -162,3 +235,178 @@ def test_larger(seed, max_workers, executor_class, size, end):
             assert end == "normal"
         for future, result in pairs:
             assert future.result(timeout=5) == result
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"num_submitters": 4},
+        {"max_submitted": 5, "critical_path": True},
+        {"max_submitted": 5, "critical_path": True, "num_submitters": 3},
+    ],
+)
+def test_larger_options(seed, options):
+    """Test designed to trigger potential race conditions, with non-default scheduling."""
+    random.seed(seed)
+    size = 100
+    with ThreadPoolExecutor(15) as pool:
+        futures = [pool.submit(func, i, random.uniform(0.001, 0.010)) for i in range(size)]
+        expected = [2 * i for i in range(size)]
+
+        def user_submit(dependencies, t):
+            x = sum(dependency.result() for dependency in dependencies)
+            return pool.submit(func, x, t)
+
+        with Scheduler(user_submit, **options) as scheduler:
+            for _i in range(size):
+                step = random.randrange(1, 10)
+                offset = random.randrange(size)
+                delay = random.uniform(0.001, 0.010)
+                dependencies = futures[offset::step]
+                futures.append(scheduler.submit([dependencies, delay], {}, dependencies))
+                expected.append(2 * sum(expected[offset::step]))
+        for future, result in zip(futures, expected, strict=True):
+            assert future.result(timeout=5) == result
+
+
+def test_num_submitters():
+    event = Event()
+    order = []
+
+    def user_submit(name):
+        order.append(name)
+        if name == "slow":
+            event.wait()
+        future = Future()
+        future.set_result(name)
+        return future
+
+    with Scheduler(user_submit, num_submitters=2) as scheduler:
+        slow = scheduler.submit(["slow"], {})
+        fast = [scheduler.submit([i], {}) for i in range(5)]
+        # The slow submission does not block the others.
+        assert [future.result(timeout=5) for future in fast] == list(range(5))
+        assert not slow.done()
+        event.set()
+        assert slow.result(timeout=5) == "slow"
+    assert sorted(order, key=str) == [0, 1, 2, 3, 4, "slow"]
+    with pytest.raises(ValueError):
+        Scheduler(user_submit, num_submitters=0)
+
+
+def test_capacities():
+    lock = Lock()
+    usage = [0]
+    peak = [0]
+
+    def run(cores, t):
+        with lock:
+            usage[0] += cores
+            peak[0] = max(peak[0], usage[0])
+        sleep(t)
+        with lock:
+            usage[0] -= cores
+        return cores
+
+    random.seed(1)
+    with (
+        ThreadPoolExecutor(max_workers=20) as pool,
+        Scheduler(partial(pool.submit, run), capacities={"cores": 4}) as scheduler,
+    ):
+        futures = [
+            scheduler.submit([cores, random.uniform(0.001, 0.01)], {}, None, 0, {"cores": cores})
+            for cores in [random.randrange(1, 5) for _ in range(40)]
+        ]
+        # A scheduled future can be cancelled before it is submitted.
+        futures[-1].cancel()
+        # Missing demands are zero and unknown ones are ignored.
+        futures.append(scheduler.submit([0, 0.01], {}, None, 0, {"mem_gb": 5}))
+        with pytest.raises(ValueError):
+            scheduler.submit([5, 0.0], {}, None, 0, {"cores": 5})
+        wait(futures)
+        assert scheduler._usage == {"cores": 0}
+    assert 1 < peak[0] <= 4
+
+
+@pytest.mark.parametrize("limits", [{"max_inflight": 3}, {"max_pending_bytes": 300}])
+def test_max_inflight(limits):
+    lock = Lock()
+    inflight = [0]
+    peak = [0]
+
+    def run(t):
+        sleep(t)
+        return t
+
+    def done(_):
+        with lock:
+            inflight[0] -= 1
+
+    with (
+        ThreadPoolExecutor(max_workers=10) as pool,
+        Scheduler(partial(pool.submit, run), **limits) as scheduler,
+    ):
+        futures = []
+        for i in range(20):
+            deps = futures[-2:] if i % 3 == 0 else None
+            # Count before submitting: done callbacks may run as soon as it is admitted.
+            with lock:
+                inflight[0] += 1
+                peak[0] = max(peak[0], inflight[0])
+            future = scheduler.submit([0.005], {}, deps, nbytes=100)
+            future.add_done_callback(done)
+            futures.append(future)
+        wait(futures)
+        assert scheduler._inflight.count == 0
+        assert scheduler._inflight.nbytes == 0
+    # The counter above may be one ahead of the scheduler.
+    assert peak[0] <= 4
+
+
+def test_max_inflight_batch():
+    first = Future()
+    with (
+        ThreadPoolExecutor(max_workers=2) as pool,
+        Scheduler(partial(pool.submit, func), max_inflight=2) as scheduler,
+    ):
+        # A batch larger than the limit is admitted when nothing is in flight.
+        futures = scheduler.submit_many([([i, 0.0], {}, [first]) for i in range(5)])
+        blocked = Event()
+        submitted = Event()
+
+        def submit_more():
+            blocked.set()
+            futures.append(scheduler.submit([5, 0.0], {}))
+            submitted.set()
+
+        with ThreadPoolExecutor(max_workers=1) as driver:
+            driver.submit(submit_more)
+            blocked.wait()
+            assert not submitted.wait(0.1)
+            first.set_result(None)
+            assert submitted.wait(5)
+        assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8, 10]
+
+
+def test_release_args_after_submit():
+    event = Event()
+
+    def run(data, flag):
+        return event.wait(5) and flag
+
+    with (
+        ThreadPoolExecutor(max_workers=1) as pool,
+        Scheduler(partial(pool.submit, run)) as scheduler,
+    ):
+        future = scheduler.submit([[1, 2, 3]], {"flag": True})
+        # The arguments are no longer needed once the work is submitted.
+        for _ in range(500):
+            if future._args == ():
+                break
+            sleep(0.01)
+        assert future._args == ()
+        assert future._kwargs == {}
+        assert not future.done()
+        event.set()
+        assert future.result(timeout=5)
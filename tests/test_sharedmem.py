@@ -0,0 +1,208 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.sharedmem."""
+
+import gc
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc
+from parman.runners.concurrent import ConcurrentRunner
+from parman.sharedmem import SharedArray, SharedMemoryTransport, _lock, _register, _segments
+from parman.trace import Tracer
+
+
+def segment_exists(name: str) -> bool:
+    try:
+        shm = SharedMemory(name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def test_export_load():
+    transport = SharedMemoryTransport(min_nbytes=100)
+    small = np.arange(5)
+    objects = np.array([None] * 20)
+    data = {"a": [np.arange(50.0), small], "b": objects, "c": "text"}
+    exported = transport.export(data)
+    handle = exported["a"][0]
+    assert isinstance(handle, SharedArray)
+    assert exported["a"][1] is small
+    assert exported["b"] is objects
+    assert exported["c"] == "text"
+    # Only the handle is pickled.
+    assert len(pickle.dumps(handle)) < 500
+    assert pickle.loads(pickle.dumps(handle)) == handle
+    loaded = transport.load(exported)
+    assert (loaded["a"][0] == np.arange(50.0)).all()
+    assert not loaded["a"][0].flags.writeable
+    assert loaded["a"][1] is small
+    assert transport.export(loaded)["a"][0] == handle
+
+
+def test_export_view():
+    transport = SharedMemoryTransport(min_nbytes=8)
+    array = transport.load(transport.export(np.arange(24.0).reshape(4, 6)))
+    view = array[1:, ::-2]
+    handle = transport.export(view)
+    assert handle.name == transport.export(array).name
+    assert handle.offset == 11 * 8
+    assert (transport.load(pickle.loads(pickle.dumps(handle))) == view).all()
+
+
+def test_lifetime():
+    transport = SharedMemoryTransport(min_nbytes=8)
+    handle = transport.export(np.ones(10))
+    name = handle.name
+    array = transport.load(pickle.loads(pickle.dumps(handle)))
+    view = array[2:]
+    del handle, array
+    gc.collect()
+    assert segment_exists(name)
+    assert (view == 1).all()
+    del view
+    gc.collect()
+    assert not segment_exists(name)
+
+
+def test_not_owned():
+    transport = SharedMemoryTransport(min_nbytes=8)
+    handle = transport.export(np.ones(10), owned=False)
+    name = handle.name
+    del handle
+    gc.collect()
+    # Segments are handed over to another process, which must take ownership.
+    assert segment_exists(name)
+    array = transport.load(SharedArray(name, np.dtype(float), (10,), (8,)))
+    assert (array == 1).all()
+    del array
+    gc.collect()
+    assert not segment_exists(name)
+
+
+def test_release_after_remap():
+    transport = SharedMemoryTransport(min_nbytes=8)
+    handle = transport.export(np.ones(10))
+    name = handle.name
+    # Mimic another thread mapping the segment again,
+    # after the weak reference to the old root was cleared but before its release.
+    with _lock:
+        new_root = _register(SharedMemory(name), owned=False)
+    new_segment = _segments[name]
+    del handle
+    gc.collect()
+    # The release of the old root leaves the new mapping intact and hands over the ownership.
+    assert _segments[name] is new_segment
+    assert new_segment.owned
+    assert (new_root[:8].view(float) == 1).all()
+    del new_root
+    gc.collect()
+    assert name not in _segments
+    assert not segment_exists(name)
+
+
+def test_invalid_min_nbytes():
+    with pytest.raises(ValueError):
+        SharedMemoryTransport(min_nbytes=0)
+
+
+def create(size: int) -> np.ndarray:
+    return np.arange(size, dtype=float)
+
+
+def create_mock(size: int) -> np.ndarray:
+    return np.zeros(size)
+
+
+def increment(array: np.ndarray) -> np.ndarray:
+    return array + 1
+
+
+def every_other(array: np.ndarray) -> np.ndarray:
+    return array[::2]
+
+
+def total(array: np.ndarray, offset: float) -> float:
+    return float(array.sum()) + offset
+
+
+def array_mock(array: np.ndarray) -> np.ndarray:
+    return array
+
+
+def total_mock(array: np.ndarray, offset: float) -> float:
+    return 0.0
+
+
+@pytest.mark.parametrize("executor_class", [ProcessPoolExecutor, ThreadPoolExecutor])
+@pytest.mark.parametrize("trace", [False, True])
+def test_concurrent_runner(executor_class, trace):
+    transport = SharedMemoryTransport(min_nbytes=1000)
+    tracer = Tracer() if trace else None
+    runner = ConcurrentRunner(
+        executor=executor_class(max_workers=2), transport=transport, tracer=tracer
+    )
+    try:
+        array = runner(Closure(MinimalMetaFunc(create, create_mock), [1000]))
+        incremented = runner(Closure(MinimalMetaFunc(increment, array_mock), [array]))
+        view = runner(Closure(MinimalMetaFunc(every_other, array_mock), [incremented]))
+        result = runner(Closure(MinimalMetaFunc(total, total_mock), [view], {"offset": 0.5}))
+        argument = runner(Closure(MinimalMetaFunc(increment, array_mock), [np.ones(500)]))
+    finally:
+        runner.shutdown()
+    assert (incremented.result() == np.arange(1, 1001)).all()
+    assert not incremented.result().flags.writeable
+    assert (view.result() == np.arange(1, 1001, 2)).all()
+    assert result.result() == 250000.5
+    assert (argument.result() == 2).all()
+    if trace:
+        assert len([event for event in tracer.events if event.get("cat") == "run"]) == 5
+    # Views of results do not need a new segment.
+    names = {transport.export(future.result()).name for future in [array, incremented, view]}
+    assert len(names) == 2
+    del array, incremented, view, result, argument, runner
+    gc.collect()
+    assert not any(segment_exists(name) for name in names)
+
+
+def test_concurrent_runner_exception():
+    transport = SharedMemoryTransport(min_nbytes=8)
+    runner = ConcurrentRunner(executor=ProcessPoolExecutor(max_workers=1), transport=transport)
+    try:
+        future = runner(Closure(MinimalMetaFunc(total, total_mock), [np.ones(10), "a"]))
+        with pytest.raises(TypeError):
+            future.result()
+    finally:
+        runner.executor.shutdown()
+
+
+def test_wrap_future_cancel():
+    transport = SharedMemoryTransport()
+    future = Future()
+    wrapped = transport.wrap_future(future, None)
+    assert wrapped.cancel()
+    assert future.cancelled()
@@ -0,0 +1,88 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.spill."""
+
+import gc
+import os
+from concurrent.futures import Future
+
+from parman.promise import promise_tree
+from parman.spill import SpilledFuture, SpilledValue, SpillStore
+
+
+def test_spill_value(tmp_path):
+    store = SpillStore(str(tmp_path))
+    handle = store.spill({"a": [1, 2]})
+    assert isinstance(handle, SpilledValue)
+    assert os.path.isfile(handle.path)
+    assert handle.load() == {"a": [1, 2]}
+    assert handle.load() == {"a": [1, 2]}
+    path = handle.path
+    del handle
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_temporary_directory():
+    store = SpillStore()
+    directory = store.directory
+    handle = store.spill("text")
+    del store
+    gc.collect()
+    # The handle keeps the temporary directory alive.
+    assert handle.load() == "text"
+    del handle
+    gc.collect()
+    assert not os.path.exists(directory)
+
+
+def test_spill_leafs(tmp_path):
+    store = SpillStore(str(tmp_path), min_nbytes=1000)
+    big = b"x" * 1000
+    leafs = store.spill_leafs([1, big, "small"])
+    assert leafs[0] == 1
+    assert isinstance(leafs[1], SpilledValue)
+    assert leafs[1].load() == big
+    assert leafs[2] == "small"
+
+
+def test_promise_tree(tmp_path):
+    store = SpillStore(str(tmp_path), min_nbytes=1000)
+    future = Future()
+    promised = promise_tree(future, {"big": bytes, "small": int}, store)
+    big_future = promised["big"]
+    assert isinstance(big_future, SpilledFuture)
+    future.set_result({"big": b"x" * 2000, "small": 3})
+    del future
+    assert len(os.listdir(tmp_path)) == 1
+    assert big_future.result() == b"x" * 2000
+    assert promised["small"].result() == 3
+    # The result is reloaded on every call.
+    assert big_future.result() is not big_future.result()
+    del promised, big_future
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+def test_spilled_future_exception():
+    future = SpilledFuture()
+    future.set_running_or_notify_cancel()
+    future.set_exception(ValueError("boom"))
+    assert isinstance(future.exception(), ValueError)
@@ -0,0 +1,165 @@
+# Parman extends Python concurrent.futures to facilitate parallel workflows.
+# Copyright (C) 2023 Toon Verstraelen
+#
+# This file is part of Parman.
+#
+# Parman is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# Parman is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for parman.trace."""
+
+import json
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import sleep
+
+import pytest
+
+from parman.closure import Closure
+from parman.metafunc import MinimalMetaFunc
+from parman.runners.concurrent import ConcurrentRunner
+from parman.scheduler import Scheduler
+from parman.trace import Tracer, traced_call
+
+
+def add(a: int, b: int) -> int:
+    sleep(0.01)
+    if a < 0:
+        raise ValueError("negative")
+    return a + b
+
+
+def add_mock(a: int, b: int) -> int:
+    return 0
+
+
+def test_add_span():
+    tracer = Tracer()
+    start = tracer.now()
+    tracer.add_span("foo", "test", start, start + 5.0, {"x": 1})
+    tracer.add_span("bar", "test", start + 5.0, start + 6.0, track=(1, 2, "other"))
+    events = tracer.events
+    assert [event["ph"] for event in events] == ["M", "M", "X", "M", "M", "X"]
+    assert events[2]["name"] == "foo"
+    assert events[2]["dur"] == pytest.approx(5.0)
+    assert events[2]["args"] == {"x": 1}
+    assert events[3]["args"] == {"name": "worker 1"}
+    assert events[4]["args"] == {"name": "other"}
+    assert events[5]["tid"] == 2
+
+
+def test_write(tmp_path):
+    tracer = Tracer()
+    tracer.add_async_span("foo", "test", tracer.new_id(), 1.0, 2.0)
+    path = tmp_path / "trace.json"
+    tracer.write(path)
+    with open(path) as fh:
+        data = json.load(fh)
+    assert [event["ph"] for event in data["traceEvents"]] == ["b", "e"]
+
+
+def test_wrap_future():
+    tracer = Tracer()
+    upstream = tracer.new_task("upstream")
+    first = Future()
+    tracer.add_outputs(upstream, [first])
+    task = tracer.new_task("task", [first, Future()])
+    assert task.upstream == [upstream]
+    upstream.span = (1, 2, tracer.now(), tracer.now() + 10.0)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        closure = Closure(MinimalMetaFunc(add, add_mock), [1, 2])
+        future = tracer.wrap_future(pool.submit(traced_call, closure), task)
+        assert future.result(timeout=5) == 3
+        closure = Closure(MinimalMetaFunc(add, add_mock), [-1, 2])
+        error_future = tracer.wrap_future(pool.submit(traced_call, closure), tracer.new_task("x"))
+        with pytest.raises(ValueError):
+            error_future.result(timeout=5)
+    assert task.span is not None
+    # (Done callbacks are recorded after the wrapped future is finished.)
+    phases = Counter((event["ph"], event.get("cat")) for event in tracer.events)
+    assert phases["X", "run"] == 2
+    assert phases["s", "dependency"] == 1
+    assert phases["f", "dependency"] == 1
+    error_spans = [event for event in tracer.events if "error" in event.get("args", {})]
+    assert len(error_spans) == 1
+
+
+def test_wrap_future_cancel():
+    tracer = Tracer()
+    future = Future()
+    wrapped_future = tracer.wrap_future(future, tracer.new_task("task"))
+    assert wrapped_future.cancel()
+    assert future.cancelled()
+    future = Future()
+    wrapped_future = tracer.wrap_future(future, tracer.new_task("task"))
+    assert future.cancel()
+    assert wrapped_future.cancelled()
+
+
+def test_scheduler_stages():
+    tracer = Tracer()
+    with (
+        ThreadPoolExecutor(max_workers=2) as pool,
+        Scheduler(
+            partial(pool.submit, add), tracer=tracer, trace_name=lambda a, k: f"add {a[0]}"
+        ) as s,
+    ):
+        first = s.submit([1, 2], {})
+        second = s.submit([3, 4], {}, [first])
+        assert second.result(timeout=5) == 7
+    events = tracer.events
+    slices = Counter((event["ph"], event["name"]) for event in events)
+    for name in "add 1", "add 3", "waiting", "queued", "submitting", "executing":
+        assert slices["b", name] == slices["e", name] > 0
+    assert slices["X", "user_submit"] == 2
+    assert s._trace_map == {}
+
+
+@pytest.mark.parametrize("schedule", [True, False])
+@pytest.mark.parametrize("executor_class", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_runner(schedule, executor_class):
+    tracer = Tracer()
+    runner = ConcurrentRunner(schedule=schedule, executor=executor_class(2), tracer=tracer)
+    metafunc = MinimalMetaFunc(add, add_mock)
+    try:
+        x = runner(Closure(metafunc, [1, 2]))
+        y = runner(Closure(metafunc, [x, 3]))
+        z = runner(Closure(metafunc, [x, y]))
+        error = runner(Closure(metafunc, [-1, 2]))
+    finally:
+        with pytest.raises(ValueError):
+            runner.shutdown()
+    assert z.result() == 9
+    assert isinstance(error.exception(), ValueError)
+    events = tracer.events
+    runs = [event for event in events if event.get("cat") == "run"]
+    assert len(runs) == 4
+    if executor_class is ProcessPoolExecutor:
+        assert all(event["pid"] != events[0]["pid"] for event in runs)
+    # Flow arrows for x -> y, x -> z and y -> z
+    assert sum(event["ph"] == "s" for event in events) == 3
+    assert sum(event["ph"] == "f" for event in events) == 3
+    assert sum(event["ph"] == "b" for event in events) == (20 if schedule else 0)
+
+
+def test_disabled():
+    runner = ConcurrentRunner(schedule=True, executor=ThreadPoolExecutor(2))
+    try:
+        assert runner._worker_call == Closure.validated_call
+        x = runner(Closure(MinimalMetaFunc(add, add_mock), [1, 2]))
+    finally:
+        runner.shutdown()
+    assert x.result() == 3
+    assert runner._scheduler._trace_map == {}
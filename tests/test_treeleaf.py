@@ -21,7 +21,7 @@
 
 import pytest
 
-from parman.treeleaf import get_tree, iterate_tree, same, transform_tree
+from parman.treeleaf import TreeSpec, flatten, get_tree, iterate_tree, same, transform_tree
 
 
 @pytest.mark.parametrize(
@@ -130,3 +130,127 @@ def test_same():
     assert same([1])
     assert same((1,))
     assert same(item for item in [1])
+
+
+def test_deep_tree():
+    # Deeper than the default recursion limit of Python.
+    depth = 5000
+    tree = "leaf"
+    for i in range(depth):
+        tree = [tree] if i % 2 == 0 else {"x": tree}
+    mulidx = ("x", 0) * (depth // 2)
+    assert list(iterate_tree(tree)) == [(mulidx, "leaf")]
+    assert list(iterate_tree(tree, tree)) == [(mulidx, ("leaf", "leaf"))]
+    assert get_tree(tree, mulidx) == "leaf"
+    # Comparing deep trees with == would hit the recursion limit, so iterate_tree is used.
+    outtree = transform_tree(lambda _, leaf1, leaf2: leaf1 + leaf2, tree, tree)
+    assert list(iterate_tree(outtree)) == [(mulidx, "leafleaf")]
+
+
+def test_transform_tree_key_order():
+    tree1 = {"b": 1, "a": [2, {"d": 3, "c": 4}]}
+    tree2 = {"a": [5, {"c": 6, "d": 7}], "b": 8}
+    calls = []
+
+    def transform(mulidx, leaf1, leaf2):
+        calls.append(mulidx)
+        return leaf1 + leaf2
+
+    result = transform_tree(transform, tree1, tree2)
+    assert result == {"b": 9, "a": [7, {"d": 10, "c": 10}]}
+    assert list(result) == ["b", "a"]
+    assert list(result["a"][1]) == ["d", "c"]
+    assert calls == [("b",), ("a", 0), ("a", 1, "d"), ("a", 1, "c")]
+    assert calls == [mulidx for mulidx, _ in iterate_tree(tree1, tree2)]
+
+
+@pytest.mark.parametrize(
+    "tree",
+    [
+        "aaa",
+        [],
+        {},
+        [3, "b"],
+        [3, [["b"]], ()],
+        {2: "a", "b": [[[3]], 4], "c": {}},
+        [{"s": 25, "e": ["a", "b"]}, {"e": list[str], "s": int}],
+    ],
+)
+def test_flatten_unflatten(tree):
+    leafs, spec = flatten(tree)
+    assert isinstance(spec, TreeSpec)
+    assert leafs == [leaf for _, leaf in iterate_tree(tree)]
+    assert spec.mulidxs == tuple(mulidx for mulidx, _ in iterate_tree(tree))
+    assert spec.num_leafs == len(leafs)
+    assert spec.unflatten(leafs) == tree
+    assert spec.flatten(tree) == leafs
+    assert list(iterate_tree(tree, spec=spec)) == list(iterate_tree(tree))
+    assert transform_tree(lambda *args: str(args), tree, spec=spec) == transform_tree(
+        lambda *args: str(args), tree
+    )
+    # A spec is hashable and equal to the spec of a tree with the same structure.
+    _, spec2 = flatten(transform_tree(lambda _, leaf: 0, tree))
+    assert spec2 == spec
+    assert hash(spec2) == hash(spec)
+    assert len({spec, spec2}) == 1
+
+
+def test_unflatten_wrong_size():
+    _, spec = flatten([1, 2])
+    with pytest.raises(ValueError):
+        spec.unflatten([1])
+    with pytest.raises(ValueError):
+        spec.unflatten([1, 2, 3])
+
+
+@pytest.mark.parametrize(
+    ("spec_tree", "trees"),
+    [
+        # Identical structure
+        ([1, {"a": 2}], [[3, {"a": 4}], [5, {"a": 6}]]),
+        # Spec too shallow for the trees, which have a deeper common structure.
+        ([1, 2], [[[3], 4], [[5], 6]]),
+        # Spec too deep for the trees
+        ([[1], 2], [[[3], 4], [5, 6]]),
+        # Different dictionary keys
+        ({"a": 1}, [{"b": 1}]),
+        # Different order of dictionary keys
+        ({"a": 1, "b": 2}, [{"b": 1, "a": 2}, {"a": 3, "b": 4}]),
+        # Different lengths
+        ([1, 2], [[1, 2], [3]]),
+        # Leafs and trees mixed.
+        ({"a": int, "b": [int]}, [{"a": 1, "b": [1, 2]}, {"a": int, "b": [int]}]),
+    ],
+)
+def test_spec_mismatch(spec_tree, trees):
+    _, spec = flatten(spec_tree)
+
+    def transform(mulidx, *leafs):
+        return str(mulidx) + "".join(str(leaf) for leaf in leafs)
+
+    assert list(iterate_tree(*trees, spec=spec)) == list(iterate_tree(*trees))
+    assert transform_tree(transform, *trees, spec=spec) == transform_tree(transform, *trees)
+
+
+def test_flatten_deep_tree():
+    depth = 5000
+    tree = "leaf"
+    for i in range(depth):
+        tree = [tree] if i % 2 == 0 else {"x": tree}
+    leafs, spec = flatten(tree)
+    assert leafs == ["leaf"]
+    assert spec.mulidxs == (("x", 0) * (depth // 2),)
+    assert len(spec.nodes) == depth + 1
+    hash(spec)
+    assert spec.flatten(spec.unflatten(["other"])) == ["other"]
+
+
+def test_flatten_up_to():
+    _, spec = flatten({"a": [int, int], "b": list, "c": {"d": str}})
+    tree = {"c": {"d": "x", "e": "y"}, "b": [1, 2], "a": [3, 4, 5]}
+    assert spec.flatten_up_to(tree) == [get_tree(tree, mulidx) for mulidx in spec.mulidxs]
+    assert spec.flatten_up_to(tree) == [3, 4, [1, 2], "x"]
+    with pytest.raises(KeyError):
+        spec.flatten_up_to({"a": [1, 2]})
+    with pytest.raises(IndexError):
+        spec.flatten_up_to({"a": [1], "b": 2, "c": {"d": 3}})
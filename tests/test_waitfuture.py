@@ -19,19 +19,24 @@
 # --
 """Unit tests for parman.waitfuture."""
 
+import gc
 import random
+import sys
+import weakref
 from concurrent.futures import (
     FIRST_COMPLETED,
+    Future,
     ProcessPoolExecutor,
     ThreadPoolExecutor,
     as_completed,
     wait,
 )
+from threading import current_thread
 from time import sleep
 
 import pytest
 
-from parman.waitfuture import WaitGraph
+from parman.waitfuture import ScatterNode, WaitGraph, scatter
 
 
 def func(x, t):
@@ -77,6 +82,31 @@ def test_zero():
     assert wf.done()
 
 
+def test_duplicate_dependencies(pool):
+    wait_graph = WaitGraph()
+    f1 = pool.submit(func, 1.0, 0.1)
+    f2 = pool.submit(func, 2.0, 0.05)
+    wf1 = wait_graph.submit([f1, f2, f1], digest_tuple)
+    wf2 = wait_graph.submit([f2, f2], digest_tuple)
+    assert wf1.result(timeout=1) == (2.0, 4.0, 2.0)
+    assert wf2.result(timeout=1) == (4.0, 4.0)
+
+
+def test_submit_many(pool):
+    wait_graph = WaitGraph()
+    f1 = pool.submit(func, 1.0, 0.1)
+    f2 = pool.submit(func, 2.0, 0.05)
+    wf1, wf2, wf3, wf4 = wait_graph.submit_many(
+        [([f1, f2], digest_tuple), ([f2, f2], digest_tuple), ([], None), ([f1], None)]
+    )
+    assert wf3.done()
+    assert wf1.result(timeout=1) == (2.0, 4.0)
+    assert wf2.result(timeout=1) == (4.0, 4.0)
+    assert wf4.result(timeout=1) is None
+    assert len(f1._done_callbacks) == 1
+    assert all(len(after) == 0 for _, after in wait_graph._stripes)
+
+
 def test_two_after_done(pool):
     wait_graph = WaitGraph()
     f1 = pool.submit(func, 1.0, 0.1)
@@ -165,6 +195,86 @@ def test_after_after(pool):
     assert f.result(timeout=1) == 2.0
 
 
+def test_one_callback_per_dependency():
+    wait_graph = WaitGraph()
+    shared = Future()
+    others = [Future() for _ in range(10)]
+    wait_futures = [wait_graph.submit([shared, other]) for other in others]
+    wait_futures.extend(wait_graph.submit_many(([shared], None) for _ in range(10)))
+    assert len(shared._done_callbacks) == 1
+    assert all(len(other._done_callbacks) == 1 for other in others)
+    shared.set_result(1)
+    for other in others:
+        other.set_result(2)
+    assert all(wf.done() for wf in wait_futures)
+
+
+def split_pair(pair):
+    return [pair[0], pair[1]]
+
+
+def test_scatter(pool):
+    f = pool.submit(digest_tuple, 1, 2)
+    part_futures = scatter(f, split_pair, 2)
+    assert [pf.result(timeout=1) for pf in part_futures] == [1, 2]
+    assert part_futures[0].done()
+    assert part_futures[1].done()
+
+
+def test_scatter_exception(pool):
+    f = pool.submit(error_func, 1.0, 0.1)
+    part_futures = scatter(f, split_pair, 2)
+    for pf in part_futures:
+        assert isinstance(pf.exception(timeout=1), ValueError)
+
+
+def test_scatter_split_exception(pool):
+    f = pool.submit(func, 1.0, 0.1)
+    part_futures = scatter(f, split_pair, 2)
+    for pf in part_futures:
+        assert isinstance(pf.exception(timeout=1), TypeError)
+
+
+def test_scatter_cancel():
+    # A ProcessPoolExecutor may start pending work early, so a plain future is cancelled.
+    f = Future()
+    part_futures = scatter(f, split_pair, 2)
+    assert f.cancel()
+    assert all(pf.cancelled() for pf in part_futures)
+
+
+def test_scatter_cancel_part(pool):
+    f = pool.submit(func, 1.0, 0.1)
+    part_futures = scatter(f, lambda x: [x, x + 1], 2)
+    part_futures[0].cancel()
+    assert part_futures[1].result(timeout=1) == 3.0
+    assert part_futures[0].cancelled()
+
+
+class Part:
+    pass
+
+
+def test_scatter_release_parts():
+    f = Future()
+    node = ScatterNode(f, list)
+    pf0 = node.get_future(0)
+    f.set_result([Part(), Part()])
+    del f
+    part0 = weakref.ref(pf0.result())
+    # The node keeps no references to parts that were handed over.
+    del pf0
+    gc.collect()
+    assert part0() is None
+    pf1 = node.get_future(1)
+    part1 = weakref.ref(pf1.result())
+    assert node.get_future(1) is pf1
+    del pf1
+    gc.collect()
+    assert part1() is None
+    assert isinstance(node.get_future(1).exception(), RuntimeError)
+
+
 @pytest.mark.parametrize("seed", range(3))
 @pytest.mark.parametrize("max_workers", [15, 45, 150])
 @pytest.mark.parametrize("executor_class", [ThreadPoolExecutor, ProcessPoolExecutor])
@@ -197,3 +307,52 @@ def test_larger(seed, max_workers, executor_class, size, end):
             assert end == "normal"
         for future, result in pairs:
             assert future.result(timeout=5) == result
+
+
+def test_deep_chain():
+    wait_graph = WaitGraph()
+    first = Future()
+    futures = [first]
+    for _ in range(5 * sys.getrecursionlimit()):
+        futures.append(wait_graph.submit([futures[-1]], lambda x: x + 1))
+    first.set_result(0)
+    assert futures[-1].result(timeout=5) == len(futures) - 1
+
+
+def test_deep_chain_dispatch():
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="dispatch") as dispatch:
+        wait_graph = WaitGraph(dispatch=dispatch)
+        first = Future()
+        futures = [first]
+        for _ in range(5 * sys.getrecursionlimit()):
+            futures.append(wait_graph.submit([futures[-1]], lambda x: x + 1))
+        last = wait_graph.submit([futures[-1]], lambda x: (x, current_thread().name))
+        first.set_result(0)
+        result, name = last.result(timeout=5)
+        assert result == len(futures) - 1
+        assert name.startswith("dispatch")
+
+
+def test_digest_exception():
+    wait_graph = WaitGraph()
+    first = Future()
+    wf1 = wait_graph.submit([first], lambda x: 1 / x)
+    wf2 = wait_graph.submit([wf1])
+    wf3 = wait_graph.submit([first])
+    first.set_result(0)
+    with pytest.raises(ZeroDivisionError):
+        wf1.result(timeout=1)
+    with pytest.raises(ZeroDivisionError):
+        wf2.result(timeout=1)
+    assert wf3.result(timeout=1) is None
+
+
+def test_cancel_wait_future():
+    wait_graph = WaitGraph()
+    first = Future()
+    wf1 = wait_graph.submit([first])
+    wf2 = wait_graph.submit([first])
+    assert wf1.cancel()
+    first.set_result(0)
+    assert wf1.cancelled()
+    assert wf2.result(timeout=1) is None